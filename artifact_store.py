@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import os
+import time
+import uuid
+import hashlib
+import logging
+import tempfile
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Set
+
+from sqlalchemy.orm import Session
+
+from .config import TEXT_REPLACE_ARTIFACT_DIR
+from .models import TextReplaceHistory
+
+# Output archives are stored under their SHA-256 in a directory shared by all
+# workers; TextReplaceHistory maps zip ids to digests, so any process can
+# serve a download. Files only ever appear through os.replace from the tmp/
+# subdirectory, and cleanup never removes a file that a live history row
+# references or that was written within the grace period, so a concurrent
+# store of the same content cannot lose its file.
+
+ARTIFACT_GRACE_SECONDS = 3600
+# Before the store, each archive was its own NamedTemporaryFile in here.
+_LEGACY_DIR = os.path.realpath(tempfile.gettempdir())
+_CHUNK_SIZE = 1024 * 1024
+_RECONCILE_BATCH = 500
+
+def _tmp_dir() -> str:
+    path = os.path.join(TEXT_REPLACE_ARTIFACT_DIR, "tmp")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def new_temp_path(suffix: str = ".zip") -> str:
+    """Scratch path on the store's filesystem, so store() can rename atomically."""
+    return os.path.join(_tmp_dir(), f"{uuid.uuid4().hex}{suffix}")
+
+def artifact_path(digest: str) -> str:
+    return os.path.join(TEXT_REPLACE_ARTIFACT_DIR, digest[:2], f"{digest}.zip")
+
+def store(temp_path: str) -> str:
+    """Move a finished file into the store and return its digest."""
+    h = hashlib.sha256()
+    with open(temp_path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+            h.update(chunk)
+    digest = h.hexdigest()
+    final_path = artifact_path(digest)
+    os.makedirs(os.path.dirname(final_path), exist_ok=True)
+    # Replacing an identical file is harmless and refreshes its mtime, which
+    # keeps a concurrent cleanup from deleting it before our row is committed.
+    os.replace(temp_path, final_path)
+    return digest
+
+def resolve(record: TextReplaceHistory) -> Optional[str]:
+    """Path of a history row's archive; rows older than the store keep zip_path."""
+    if record.artifact_id:
+        return artifact_path(record.artifact_id)
+    return record.zip_path
+
+def _live_digests(db: Session, now: datetime) -> Set[str]:
+    rows = db.query(TextReplaceHistory.artifact_id).filter(
+        TextReplaceHistory.artifact_id.isnot(None),
+        TextReplaceHistory.expires_at > now
+    ).distinct()
+    return {digest for (digest,) in rows}
+
+def _unlink_if_stale(path: str, cutoff: float) -> bool:
+    try:
+        if os.stat(path).st_mtime >= cutoff:
+            return False
+        os.unlink(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+def release(db: Session, digests: Iterable[str]) -> int:
+    """Delete the given artifacts if no live history row still references them."""
+    digests = {d for d in digests if d}
+    if not digests:
+        return 0
+    live = _live_digests(db, datetime.now())
+    cutoff = time.time() - ARTIFACT_GRACE_SECONDS
+    return sum(_unlink_if_stale(artifact_path(d), cutoff) for d in digests - live)
+
+def reconcile_availability(db: Session, now: Optional[datetime] = None) -> int:
+    """Mark unexpired rows whose archive has gone missing as unavailable.
+
+    Walks the rows in id order in batches, stats each file once however many
+    rows share it and flips a whole batch with one UPDATE, so /history can
+    trust zip_available without touching the filesystem.
+    """
+    now = now or datetime.now()
+    exists: Dict[str, bool] = {}
+    changed = 0
+    last_id = 0
+    while True:
+        rows = db.query(
+            TextReplaceHistory.id, TextReplaceHistory.artifact_id, TextReplaceHistory.zip_path
+        ).filter(
+            TextReplaceHistory.expires_at > now,
+            TextReplaceHistory.zip_available == True,
+            TextReplaceHistory.id > last_id
+        ).order_by(TextReplaceHistory.id).limit(_RECONCILE_BATCH).all()
+        if not rows:
+            return changed
+        last_id = rows[-1].id
+        gone = []
+        for row in rows:
+            path = artifact_path(row.artifact_id) if row.artifact_id else row.zip_path
+            if path not in exists:
+                exists[path] = os.path.exists(path)
+            if not exists[path]:
+                gone.append(row.id)
+        if gone:
+            changed += db.query(TextReplaceHistory).filter(
+                TextReplaceHistory.id.in_(gone)
+            ).update({TextReplaceHistory.zip_available: False}, synchronize_session=False)
+            db.commit()
+
+def _remove_legacy_archives(db: Session, now: datetime) -> int:
+    """Delete the archives of expired rows made before the store, and forget their paths.
+
+    Only .zip files directly in the old output directory are deleted; a path
+    anywhere else is forgotten but left on disk.
+    """
+    rows = db.query(TextReplaceHistory.id, TextReplaceHistory.zip_path).filter(
+        TextReplaceHistory.artifact_id.is_(None),
+        TextReplaceHistory.expires_at <= now,
+        TextReplaceHistory.zip_path != ""
+    ).all()
+    removed = 0
+    for row in rows:
+        path = os.path.realpath(row.zip_path)
+        if os.path.dirname(path) == _LEGACY_DIR and path.endswith(".zip"):
+            try:
+                os.unlink(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+    if rows:
+        db.query(TextReplaceHistory).filter(
+            TextReplaceHistory.id.in_([row.id for row in rows])
+        ).update({TextReplaceHistory.zip_path: ""}, synchronize_session=False)
+        db.commit()
+    return removed
+
+def cleanup_artifacts(db: Session) -> Dict[str, int]:
+    """Reconcile zip_available and delete unreferenced or abandoned files.
+
+    Expired rows older than the store have their own archive deleted too.
+    """
+    now = datetime.now()
+    removed = _remove_legacy_archives(db, now)
+    expired = db.query(TextReplaceHistory).filter(
+        TextReplaceHistory.expires_at <= now,
+        TextReplaceHistory.zip_available == True
+    ).update({TextReplaceHistory.zip_available: False}, synchronize_session=False)
+    db.commit()
+    missing = reconcile_availability(db, now)
+
+    live = _live_digests(db, now)
+    cutoff = time.time() - ARTIFACT_GRACE_SECONDS
+    try:
+        buckets = [e for e in os.scandir(TEXT_REPLACE_ARTIFACT_DIR) if e.is_dir()]
+    except FileNotFoundError:
+        buckets = []
+    for bucket in buckets:
+        for entry in os.scandir(bucket.path):
+            if bucket.name == "tmp":
+                # Leftovers of crashed requests.
+                removed += _unlink_if_stale(entry.path, cutoff - 86400)
+            elif entry.name.endswith(".zip") and entry.name[:-4] not in live:
+                removed += _unlink_if_stale(entry.path, cutoff)
+    if removed:
+        logging.warning(f"Removed {removed} text-replace artifacts")
+    return {"expired_records": expired, "missing_files": missing, "removed_files": removed}
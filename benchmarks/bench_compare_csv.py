@@ -0,0 +1,70 @@
+"""Row-text extraction from a large compare CSV, pandas versus pyarrow.
+
+    python benchmarks/bench_compare_csv.py [--rows 1000000] [--encoding cp874]
+
+Writes a synthetic Thai export (circuit code, customer, province, service,
+remarks with empty cells) in the given encoding, then times the old path
+(pandas read_csv with dtype=str and a per-row join) against
+compare_csv.read_compare_text, checks both produce the same text and prints
+the speedup.
+"""
+from __future__ import annotations
+
+import sys
+import time
+import random
+import argparse
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import compare_csv
+
+PROVINCES = ["กรุงเทพมหานคร", "เชียงใหม่", "ขอนแก่น", "ภูเก็ต", "สงขลา"]
+SERVICES = ["Data : MPLS", "Internet", "Broadband", "Leased Line"]
+
+def write_csv(path: Path, rows: int, encoding: str) -> None:
+    rnd = random.Random(45)
+    with open(path, "w", encoding=encoding, newline="") as f:
+        f.write("เลขวงจร,ลูกค้า,จังหวัด,บริการ,หมายเหตุ\r\n")
+        for i in range(rows):
+            remark = rnd.choice(["", "วงจรเก่า 1234X5678", "ย้ายจาก 9999ID123", "NA"])
+            f.write(f"{i % 10000:04d}{rnd.choice('JYX')}{rnd.randrange(10000):04d},"
+                    f"\"บริษัท ลูกค้า {i % 5000}, จำกัด\",{rnd.choice(PROVINCES)},"
+                    f"{rnd.choice(SERVICES)},{remark}\r\n")
+
+def pandas_text(path: Path, encoding: str):
+    df = pd.read_csv(path, dtype=str, encoding=encoding)
+    return list(df.columns), compare_csv.join_row_text(df)
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--encoding", default="cp874", choices=["cp874", "utf-8", "utf-8-sig"])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "compare.csv"
+        write_csv(path, args.rows, args.encoding)
+        size_mb = path.stat().st_size / 1024 / 1024
+        print(f"{args.rows} rows, {size_mb:.1f} MB, {args.encoding}")
+
+        start = time.perf_counter()
+        detected = compare_csv.detect_encoding(str(path))
+        columns, fast = compare_csv.read_compare_text(str(path))
+        fast_s = time.perf_counter() - start
+        print(f"read_compare_text ({'pyarrow' if compare_csv.pa else 'pandas'}, {detected}): {fast_s:.2f}s")
+
+        start = time.perf_counter()
+        slow_columns, slow = pandas_text(path, detected)
+        slow_s = time.perf_counter() - start
+        print(f"pandas read_csv + row join: {slow_s:.2f}s")
+
+        assert columns == slow_columns and fast.tolist() == slow.tolist(), "outputs differ"
+        print(f"speedup: {slow_s / fast_s:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Memory and lookup time of the master index versus the old per-row dicts.
+
+    python benchmarks/bench_master_index.py [--rows 300000] [--lookups 50000]
+
+Builds a synthetic master DataFrame shaped like the read of
+NT.CSOC-MS.xlsx (dtype=str, Thai headers, repeated customers and
+provinces). It measures the allocations (tracemalloc) of
+set_index().to_dict(orient="index"), which run_test_compare used to build,
+against master_index.MasterIndex, and times a batch of lookups done each way.
+"""
+from __future__ import annotations
+
+import sys
+import time
+import random
+import argparse
+import tracemalloc
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from master_index import MasterIndex
+
+PROVINCES = ["กรุงเทพมหานคร", "เชียงใหม่", "ขอนแก่น", "ภูเก็ต", "สงขลา", "นครราชสีมา"]
+SERVICES = ["Data : MPLS", "Internet", "Broadband", "Leased Line", None]
+
+def make_master(rows: int) -> pd.DataFrame:
+    rnd = random.Random(48)
+    keys = [f"{i % 10000:04d}{'JYX'[i % 3]}{i // 10000:04d}" for i in range(rows)]
+    return pd.DataFrame({
+        "__KEY__": keys,
+        "ลูกค้า": [f"บริษัท ลูกค้า {rnd.randrange(rows // 20)} จำกัด" for _ in keys],
+        "ชื่อโครงการ": [f"โครงการ {rnd.randrange(rows // 50)}" for _ in keys],
+        "จังหวัด": [rnd.choice(PROVINCES) for _ in keys],
+        "ประเภท": [rnd.choice(SERVICES) for _ in keys],
+        "SLA": [rnd.choice(["99.5", "99.9", None]) for _ in keys],
+        "สาขา": [f"สาขา {rnd.randrange(200)}" for _ in keys],
+    }, dtype=object)
+
+def measure(build):
+    tracemalloc.start()
+    start = time.perf_counter()
+    obj = build()
+    elapsed = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, size, elapsed
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=300_000)
+    parser.add_argument("--lookups", type=int, default=50_000)
+    args = parser.parse_args()
+
+    mdf = make_master(args.rows)
+    rnd = random.Random(1)
+    probe = [mdf["__KEY__"].iat[rnd.randrange(args.rows)] if rnd.random() < 0.7 else "0000J9999X"
+             for _ in range(args.lookups)]
+
+    rows, dict_bytes, dict_s = measure(lambda: mdf.set_index("__KEY__").to_dict(orient="index"))
+    columns = {"customer": mdf["ลูกค้า"], "project_name": mdf["ชื่อโครงการ"], "province": mdf["จังหวัด"],
+               "service_type": mdf["ประเภท"], "sla": mdf["SLA"], "branch": mdf["สาขา"]}
+    index, index_bytes, index_s = measure(lambda: MasterIndex.build(mdf["__KEY__"].tolist(), columns))
+
+    start = time.perf_counter()
+    dict_customers = [(rows.get(code) or {}).get("ลูกค้า") for code in probe]
+    dict_lookup_s = time.perf_counter() - start
+    start = time.perf_counter()
+    index_customers = index.column("customer", index.lookup(probe)).tolist()
+    index_lookup_s = time.perf_counter() - start
+    assert dict_customers == index_customers, "lookups differ"
+
+    mb = 1024 * 1024
+    print(f"{args.rows} master rows, {args.lookups} lookups")
+    print(f"per-row dicts: {dict_bytes / mb:7.1f} MB allocated, build {dict_s:.2f}s, lookups {dict_lookup_s:.3f}s")
+    print(f"MasterIndex:   {index_bytes / mb:7.1f} MB allocated, build {index_s:.2f}s, lookups {index_lookup_s:.3f}s"
+          f" (nbytes() reports {index.nbytes() / mb:.1f} MB)")
+    print(f"memory: {dict_bytes / index_bytes:.1f}x smaller")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Near-miss suggestions from the deletion index versus a scan of every key.
+
+    python benchmarks/bench_master_suggest.py [--keys 300000] [--queries 50000] [--distance 1]
+
+Builds synthetic master keys shaped like PAT_ALPHA codes (dddd L dddd) and
+unmatched codes made by one typo each: a wrong character, two adjacent
+characters swapped, or one dropped. It times building
+master_suggest.DeletionIndex and suggesting for every query. For a sample
+of queries it also times the O(n*m) baseline, the distance from each query
+to every key, checks both give the same suggestions and extrapolates the
+baseline to all queries.
+"""
+from __future__ import annotations
+
+import sys
+import time
+import random
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from master_suggest import DeletionIndex, _matrix, _osa_distance
+
+def make_keys(count: int) -> np.ndarray:
+    rnd = random.Random(50)
+    keys = {f"{rnd.randrange(10000):04d}{rnd.choice('JYX')}{rnd.randrange(10000):04d}" for _ in range(count)}
+    return np.sort(np.array(sorted(keys), dtype="S"))
+
+def typo(code: str, rnd: random.Random) -> str:
+    i = rnd.randrange(len(code) - 1)
+    kind = rnd.randrange(3)
+    if kind == 0:
+        return code[:i] + rnd.choice("0123456789JYX") + code[i + 1:]
+    if kind == 1:
+        return code[:i] + code[i + 1] + code[i] + code[i + 2:]
+    return code[:i] + code[i + 1:]
+
+def scan(keys: np.ndarray, code: str, limit: int, max_distance: int):
+    """Distance from one code to every key, the approach the index replaces."""
+    query = np.array([code], dtype="S")
+    q = np.repeat(_matrix(query), len(keys), axis=0)
+    lengths = np.char.str_len(keys)
+    dist = _osa_distance(q, np.full(len(keys), len(code)), _matrix(keys), lengths)
+    near = np.flatnonzero((dist >= 1) & (dist <= max_distance))
+    near = near[np.lexsort((near, dist[near]))][:limit]
+    return [(keys[k].decode("ascii"), int(dist[k])) for k in near]
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--keys", type=int, default=300_000)
+    parser.add_argument("--queries", type=int, default=50_000)
+    parser.add_argument("--distance", type=int, default=1, choices=[1, 2])
+    parser.add_argument("--sample", type=int, default=20)
+    args = parser.parse_args()
+
+    keys = make_keys(args.keys)
+    rnd = random.Random(1)
+    queries = [typo(keys[rnd.randrange(len(keys))].decode("ascii"), rnd) for _ in range(args.queries)]
+
+    start = time.perf_counter()
+    index = DeletionIndex(keys, args.distance)
+    build_s = time.perf_counter() - start
+    start = time.perf_counter()
+    found = index.suggest(queries, limit=3, max_distance=args.distance)
+    suggest_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(args.sample):
+        assert scan(keys, queries[i], 3, args.distance) == found[i], f"suggestions differ for {queries[i]}"
+    scan_s = (time.perf_counter() - start) / args.sample * len(queries)
+
+    mb = 1024 * 1024
+    print(f"{len(keys)} master keys, {len(queries)} unmatched codes, distance <= {args.distance}")
+    print(f"deletion index: {len(index)} variants, {index.nbytes / mb:.1f} MB, build {build_s:.2f}s")
+    print(f"suggest: {suggest_s:.2f}s, {sum(1 for f in found if f)} codes with a suggestion")
+    print(f"scan of every key: ~{scan_s:.0f}s (extrapolated from {args.sample} codes)")
+    print(f"speedup: ~{scan_s / suggest_s:.0f}x")
+
+if __name__ == "__main__":
+    main()
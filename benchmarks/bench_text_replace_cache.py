@@ -0,0 +1,73 @@
+"""Wall time of a 50-file text-replace batch, uncached versus fully cached.
+
+    python benchmarks/bench_text_replace_cache.py [--files 50] [--paragraphs 2000]
+
+Generates DOCX files with python-docx, runs the batch through
+text_replace_engine.process_file against an empty result cache, then runs
+the identical batch again so every file is served from the cache. Prints
+wall time per pass and the speedup. Uses a throwaway cache directory.
+Needs DATABASE_URL and ADMIN_TOKEN set like the app, because config is
+imported.
+"""
+from __future__ import annotations
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+_CACHE_DIR = tempfile.mkdtemp(prefix="bench_text_replace_cache_")
+os.environ["TEXT_REPLACE_CACHE_DIR"] = _CACHE_DIR
+
+from docx import Document
+
+import text_replace_engine
+
+def make_docx(path: Path, paragraphs: int) -> None:
+    doc = Document()
+    for i in range(paragraphs):
+        p = doc.add_paragraph()
+        p.add_run(f"บริษัท ABC จำกัด {i} ").bold = True
+        p.add_run("ติดต่อ ABC ")
+        p.add_run("Corp")
+    doc.save(path)
+
+def run_batch(pool, template_dir: Path, work_dir: Path):
+    shutil.rmtree(work_dir, ignore_errors=True)
+    shutil.copytree(template_dir, work_dir)
+    paths = sorted(str(p) for p in work_dir.glob("*.docx"))
+    start = time.perf_counter()
+    outcomes = list(pool.map(text_replace_engine.process_file, paths,
+                             ["docx"] * len(paths), [[("ABC", "XYZ")]] * len(paths)))
+    return time.perf_counter() - start, sum(hit for _, _, hit in outcomes)
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=50)
+    parser.add_argument("--paragraphs", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        template_dir = Path(tmp) / "template"
+        template_dir.mkdir()
+        for i in range(args.files):
+            # Distinct inputs, so the first pass cannot hit on its own outputs.
+            make_docx(template_dir / f"doc_{i:03d}.docx", args.paragraphs + i)
+
+        print(f"{args.files} files x ~{args.paragraphs} paragraphs, {args.workers} workers")
+        print(f"{'pass':>8} {'wall_s':>8} {'hits':>6} {'speedup':>8}")
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            cold, hits = run_batch(pool, template_dir, Path(tmp) / "work")
+            print(f"{'cold':>8} {cold:>8.2f} {hits:>6} {1.0:>8.2f}")
+            warm, hits = run_batch(pool, template_dir, Path(tmp) / "work")
+            print(f"{'cached':>8} {warm:>8.2f} {hits:>6} {cold / warm:>8.2f}")
+    shutil.rmtree(_CACHE_DIR, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Wall time of a text-replace batch versus process pool size.
+
+    python benchmarks/bench_text_replace_parallel.py [--files 50] [--paragraphs 400]
+
+Generates DOCX files with python-docx, then runs the same batch through
+text_replace_engine.process_file with 1, 2, 4, ... workers (up to the CPU
+count) and prints wall time and speedup. Needs DATABASE_URL and ADMIN_TOKEN
+set like the app, because config is imported.
+"""
+from __future__ import annotations
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# Every run rewrites the same inputs; measure the engine, not the result cache.
+os.environ["TEXT_REPLACE_CACHE_MAX_MB"] = "0"
+
+from docx import Document
+
+import text_replace_engine
+
+def make_docx(path: Path, paragraphs: int) -> None:
+    doc = Document()
+    for i in range(paragraphs):
+        p = doc.add_paragraph()
+        p.add_run(f"บริษัท ABC จำกัด {i} ").bold = True
+        p.add_run("ติดต่อ ABC ")
+        p.add_run("Corp")
+    doc.save(path)
+
+def run_batch(template_dir: Path, work_dir: Path, workers: int) -> float:
+    shutil.rmtree(work_dir, ignore_errors=True)
+    shutil.copytree(template_dir, work_dir)
+    paths = sorted(str(p) for p in work_dir.glob("*.docx"))
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(text_replace_engine.process_file, paths,
+                      ["docx"] * len(paths), [[("ABC", "XYZ")]] * len(paths)))
+    return time.perf_counter() - start
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=50)
+    parser.add_argument("--paragraphs", type=int, default=400)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        template_dir = Path(tmp) / "template"
+        template_dir.mkdir()
+        for i in range(args.files):
+            make_docx(template_dir / f"doc_{i:03d}.docx", args.paragraphs)
+
+        counts, n = [], 1
+        while n < (os.cpu_count() or 1):
+            counts.append(n)
+            n *= 2
+        counts.append(os.cpu_count() or 1)
+
+        baseline = None
+        print(f"{args.files} files x {args.paragraphs} paragraphs")
+        print(f"{'workers':>8} {'wall_s':>8} {'speedup':>8}")
+        for workers in counts:
+            wall = run_batch(template_dir, Path(tmp) / "work", workers)
+            baseline = baseline or wall
+            print(f"{workers:>8} {wall:>8.2f} {baseline / wall:>8.2f}")
+
+if __name__ == "__main__":
+    main()
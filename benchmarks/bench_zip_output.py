@@ -0,0 +1,73 @@
+"""CPU time and size of the text-replace output archive per compression mode.
+
+    python benchmarks/bench_zip_output.py [--files 50] [--paragraphs 2000]
+
+Generates DOCX files with python-docx and packs them the way
+/text-replace/process does: the previous ZIP_DEFLATED temp file, the
+ZIP_STORED default, and the streamed archive written to an unseekable sink.
+Prints CPU seconds and archive bytes for each.
+"""
+from __future__ import annotations
+
+import io
+import time
+import zipfile
+import argparse
+import tempfile
+from pathlib import Path
+
+from docx import Document
+
+class _Unseekable(io.RawIOBase):
+    def __init__(self):
+        self.size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.size += len(data)
+        return len(data)
+
+def make_docx(path: Path, paragraphs: int) -> None:
+    doc = Document()
+    for i in range(paragraphs):
+        p = doc.add_paragraph()
+        p.add_run(f"บริษัท XYZ จำกัด {i} ").bold = True
+        p.add_run("ติดต่อ XYZ Corp")
+    doc.save(path)
+
+def pack(paths, target, compression) -> float:
+    start = time.process_time()
+    with zipfile.ZipFile(target, "w", compression) as zf:
+        for p in paths:
+            zf.write(p, p.name)
+    return time.process_time() - start
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=50)
+    parser.add_argument("--paragraphs", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        paths = []
+        for i in range(args.files):
+            paths.append(tmp / f"doc_{i:03d}.docx")
+            make_docx(paths[-1], args.paragraphs)
+        inputs = sum(p.stat().st_size for p in paths)
+
+        print(f"{args.files} files, {inputs} input bytes")
+        print(f"{'mode':>16} {'cpu_s':>8} {'bytes':>12} {'ratio':>7}")
+        for name, compression in (("deflated", zipfile.ZIP_DEFLATED), ("stored", zipfile.ZIP_STORED)):
+            target = tmp / f"{name}.zip"
+            cpu = pack(paths, target, compression)
+            size = target.stat().st_size
+            print(f"{name:>16} {cpu:>8.3f} {size:>12} {size / inputs:>7.3f}")
+        sink = _Unseekable()
+        cpu = pack(paths, sink, zipfile.ZIP_STORED)
+        print(f"{'stored, stream':>16} {cpu:>8.3f} {sink.size:>12} {sink.size / inputs:>7.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import codecs
+from typing import List, Tuple
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    from pyarrow import csv as pa_csv
+except ImportError:
+    pa = None
+
+# Compare CSVs are only used for the text of each row: the circuit
+# extraction looks at the header names and at every row's cells joined by
+# spaces. With pyarrow the file is parsed on all cores and the join happens in
+# Arrow, so only the one joined column is ever turned into Python strings.
+# Without pyarrow, or for files Arrow rejects (ragged rows), pandas reads it.
+
+SAMPLE_SIZE = 64 * 1024
+
+# pandas' default NA strings; read_csv(dtype=str) turns them into NaN, which
+# the row join writes as "nan".
+NA_VALUES = [
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND",
+    "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+]
+
+def detect_encoding(path: str) -> str:
+    with open(path, "rb") as f:
+        return sniff_encoding(f.read(SAMPLE_SIZE))
+
+def sniff_encoding(sample: bytes) -> str:
+    """utf-8-sig, utf-8 or cp874 (Thai Windows/TIS-620 exports), judged from the file start."""
+    if sample.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    try:
+        # final=False tolerates a multi-byte character cut at the sample end.
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        return "cp874"
+
+def _header_names(path: str, encoding: str) -> List[str]:
+    """Column names exactly as pandas reports them (blank and repeated names renamed)."""
+    return [str(c) for c in pd.read_csv(path, nrows=0, encoding=encoding).columns]
+
+def join_row_text(df: pd.DataFrame) -> pd.Series:
+    if df.empty:
+        return pd.Series([], dtype=object)
+    return df.apply(lambda r: " ".join([("" if v is None else str(v)) for v in r.values]), axis=1)
+
+def _read_pandas(path: str, encoding: str) -> Tuple[List[str], pd.Series]:
+    df = pd.read_csv(path, dtype=str, encoding=encoding)
+    return [str(c) for c in df.columns], join_row_text(df)
+
+def _read_arrow(path: str, encoding: str) -> Tuple[List[str], pd.Series]:
+    names = _header_names(path, encoding)
+    table = pa_csv.read_csv(
+        path,
+        read_options=pa_csv.ReadOptions(
+            column_names=names, skip_rows=1,
+            encoding="utf8" if encoding.startswith("utf-8") else encoding),
+        convert_options=pa_csv.ConvertOptions(
+            column_types={name: pa.string() for name in names},
+            null_values=NA_VALUES, strings_can_be_null=True),
+    )
+    joined = pc.binary_join_element_wise(
+        *table.columns, " ", null_handling="replace", null_replacement="nan")
+    return names, joined.to_pandas()
+
+def read_compare_text(path: str) -> Tuple[List[str], pd.Series]:
+    """Header names and the space-joined text of every row of a compare CSV."""
+    encoding = detect_encoding(path)
+    if pa is not None:
+        try:
+            return _read_arrow(path, encoding)
+        except (pa.ArrowInvalid, UnicodeDecodeError):
+            pass
+    return _read_pandas(path, encoding)
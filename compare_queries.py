@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import func, or_, select
+from sqlalchemy.orm import Session, Query
+
+try:
+    from .db_models import CompareSession, CompareResult
+    from .dimensions import dimension_ids, search_dimension_ids
+except Exception:
+    from db_models import CompareSession, CompareResult
+    from dimensions import dimension_ids, search_dimension_ids
+
+# Query builders for the hot compare paths. Routes and the query-plan guard
+# (query_plans.py) share them so the guard always checks what production runs.
+
+def records_query(
+    db: Session,
+    job_id: int,
+    project: str = "",
+    province: str = "",
+    customer: str = "",
+    status: str = "",
+    q: str = "",
+) -> Optional[Query]:
+    """Filtered, ordered records of one job; None when a filter value is unknown.
+
+    Served by ix_results_session_matched_id (session_id, matched DESC, id).
+    """
+    query = db.query(CompareResult).filter(CompareResult.session_id == job_id)
+    for field, value in (("project_name", project), ("province", province), ("customer", customer)):
+        if value:
+            ids = dimension_ids(db, field, value)
+            if not ids:
+                return None
+            query = query.filter(getattr(CompareResult, f"{field}_id").in_(ids))
+    if status:
+        if status == "Found": query = query.filter(CompareResult.matched == 1)
+        elif status == "Unmatched": query = query.filter(CompareResult.matched == 0)
+    if q:
+        safe_q = q.replace('%', '\\%').replace('_', '\\_')[:100]
+        like_pattern = f"%{safe_q}%"
+        matches = search_dimension_ids(db, ("customer", "project_name", "province", "service_type"), like_pattern)
+        conds = [CompareResult.circuit_norm.ilike(like_pattern)]
+        for field, ids in matches.items():
+            if ids:
+                conds.append(getattr(CompareResult, f"{field}_id").in_(ids))
+        query = query.filter(or_(*conds))
+    return query.order_by(CompareResult.matched.desc(), CompareResult.id)
+
+def jobs_query(db: Session) -> Query:
+    """Sessions newest first with per-session totals from covering index lookups."""
+    total = select(func.count(CompareResult.id)).where(
+        CompareResult.session_id == CompareSession.id
+    ).correlate(CompareSession).scalar_subquery()
+    matched = select(func.count(CompareResult.id)).where(
+        CompareResult.session_id == CompareSession.id,
+        CompareResult.matched == 1
+    ).correlate(CompareSession).scalar_subquery()
+    return db.query(
+        CompareSession.id,
+        CompareSession.created_at,
+        CompareSession.pinned,
+        CompareSession.master_version_id,
+        CompareSession.source_job_id,
+        total.label('total_records'),
+        matched.label('matched_total'),
+    ).order_by(CompareSession.id.desc())
+
+def duplicate_session_query(db: Session, content_hash: str) -> Query:
+    """Newest job with the given upload hash and its totals (ix_sessions_content_hash)."""
+    return jobs_query(db).add_columns(
+        CompareSession.upload_matched,
+        CompareSession.upload_unmatched,
+    ).filter(CompareSession.content_hash == content_hash).limit(1)
+
+def expired_sessions_query(db: Session, cutoff_date: datetime) -> Query:
+    """Unpinned sessions created before the cutoff (ix_sessions_pinned_created)."""
+    return db.query(CompareSession).filter(
+        CompareSession.pinned == False,
+        CompareSession.created_at < cutoff_date
+    )
@@ -1,4 +1,6 @@
 import os
+import zipfile
+import tempfile
 from dotenv import load_dotenv
 try:
     load_dotenv('.env.docker')
@@ -50,3 +52,101 @@ try:
     JOB_RETENTION_DAYS = int(os.getenv("JOB_RETENTION_DAYS", "60"))
 except ValueError:
     JOB_RETENTION_DAYS = 60
+
+
+try:
+    RECORDS_CACHE_MAX_MB = int(os.getenv("RECORDS_CACHE_MAX_MB", "64"))
+except ValueError:
+    RECORDS_CACHE_MAX_MB = 64
+
+JOBS_VERSION_FILE = os.getenv("JOBS_VERSION_FILE", os.path.join(tempfile.gettempdir(), "compare_jobs.version"))
+
+try:
+    JOB_CLEANUP_INTERVAL_SECONDS = int(os.getenv("JOB_CLEANUP_INTERVAL_SECONDS", "600"))
+except ValueError:
+    JOB_CLEANUP_INTERVAL_SECONDS = 600
+
+EVENTS_JOURNAL_FILE = os.getenv("EVENTS_JOURNAL_FILE", os.path.join(tempfile.gettempdir(), "compare_events.jsonl"))
+
+try:
+    SSE_HEARTBEAT_SECONDS = int(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+except ValueError:
+    SSE_HEARTBEAT_SECONDS = 15
+
+try:
+    SSE_STATS_INTERVAL_SECONDS = int(os.getenv("SSE_STATS_INTERVAL_SECONDS", "30"))
+except ValueError:
+    SSE_STATS_INTERVAL_SECONDS = 30
+
+try:
+    TEXT_REPLACE_WORKERS = max(1, int(os.getenv("TEXT_REPLACE_WORKERS", str(os.cpu_count() or 1))))
+except ValueError:
+    TEXT_REPLACE_WORKERS = os.cpu_count() or 1
+
+# How the text-replace pool starts workers. Forking a threaded server process
+# can copy held locks into the child, so workers are spawned by default.
+TEXT_REPLACE_START_METHOD = os.getenv("TEXT_REPLACE_START_METHOD", "spawn").lower()
+
+# "stream" rewrites OOXML parts at the zip level; "legacy" uses python-docx/openpyxl.
+TEXT_REPLACE_ENGINE = os.getenv("TEXT_REPLACE_ENGINE", "stream").lower()
+
+# Output archives hold already-deflated DOCX/XLSX, so members are stored by
+# default; set TEXT_REPLACE_ZIP_DEFLATE=1 to compress them again.
+TEXT_REPLACE_ZIP_COMPRESSION = zipfile.ZIP_DEFLATED if os.getenv("TEXT_REPLACE_ZIP_DEFLATE", "0") == "1" else zipfile.ZIP_STORED
+
+# Per-job state of text-replace jobs (mode=job), shared by all workers.
+TEXT_REPLACE_JOBS_DIR = os.getenv("TEXT_REPLACE_JOBS_DIR", os.path.join(tempfile.gettempdir(), "text_replace_jobs"))
+
+# A running job saves its state at least every 30 seconds; one not saved for
+# this long lost its worker and is marked failed.
+try:
+    TEXT_REPLACE_JOB_STALE_SECONDS = int(os.getenv("TEXT_REPLACE_JOB_STALE_SECONDS", "300"))
+except ValueError:
+    TEXT_REPLACE_JOB_STALE_SECONDS = 300
+
+# Content-addressed store for text-replace output archives. Point every
+# worker/container at the same directory (shared volume) to scale out.
+TEXT_REPLACE_ARTIFACT_DIR = os.getenv("TEXT_REPLACE_ARTIFACT_DIR", os.path.join(tempfile.gettempdir(), "text_replace_artifacts"))
+
+# Limits of /text-replace/process-archive (one ZIP of documents).
+try:
+    TEXT_REPLACE_ARCHIVE_MAX_MB = int(os.getenv("TEXT_REPLACE_ARCHIVE_MAX_MB", "2048"))
+except ValueError:
+    TEXT_REPLACE_ARCHIVE_MAX_MB = 2048
+
+try:
+    TEXT_REPLACE_ARCHIVE_MAX_FILES = int(os.getenv("TEXT_REPLACE_ARCHIVE_MAX_FILES", "5000"))
+except ValueError:
+    TEXT_REPLACE_ARCHIVE_MAX_FILES = 5000
+
+# On-disk cache of per-file text-replace outputs, keyed by input hash, rules
+# and engine version; shared by workers like the artifact store. 0 disables it.
+TEXT_REPLACE_CACHE_DIR = os.getenv("TEXT_REPLACE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "text_replace_cache"))
+
+try:
+    TEXT_REPLACE_CACHE_MAX_MB = int(os.getenv("TEXT_REPLACE_CACHE_MAX_MB", "1024"))
+except ValueError:
+    TEXT_REPLACE_CACHE_MAX_MB = 1024
+
+# Resumable upload sessions (/uploads): data and state files shared by workers.
+UPLOADS_DIR = os.getenv("UPLOADS_DIR", os.path.join(tempfile.gettempdir(), "compare_uploads"))
+
+try:
+    UPLOAD_SESSION_TTL_HOURS = int(os.getenv("UPLOAD_SESSION_TTL_HOURS", "24"))
+except ValueError:
+    UPLOAD_SESSION_TTL_HOURS = 24
+
+# Master index files (<workbook sha256>.idx) that every worker maps read-only.
+MASTER_INDEX_DIR = os.getenv("MASTER_INDEX_DIR", os.path.join(tempfile.gettempdir(), "compare_master_index"))
+
+try:
+    MASTER_INDEX_KEEP = int(os.getenv("MASTER_INDEX_KEEP", "3"))
+except ValueError:
+    MASTER_INDEX_KEEP = 3
+
+# Largest edit distance of near-miss suggestions for unmatched circuits (1 or 2).
+# The deletion index behind them holds about len(code)**d variants per master key.
+try:
+    SUGGEST_MAX_DISTANCE = min(max(int(os.getenv("SUGGEST_MAX_DISTANCE", "1")), 1), 2)
+except ValueError:
+    SUGGEST_MAX_DISTANCE = 1
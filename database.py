@@ -2,6 +2,8 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from .config import DATABASE_URL
 from .models import Base
+from .db_models import Base as CompareBase
+from .migrations import run_migrations
 
 engine = create_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -14,4 +16,6 @@ def get_db():
         db.close()
 
 def init_db():
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    Base.metadata.create_all(bind=engine)
+    CompareBase.metadata.create_all(bind=engine)
+    run_migrations(engine)
@@ -1,9 +1,24 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, Index, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, Index, ForeignKey, UniqueConstraint
 from sqlalchemy.orm import declarative_base, relationship
+from sqlalchemy.dialects import mysql
 from sqlalchemy.sql import func
 
 Base = declarative_base()
 
+# Descriptive fields stored once in compare_dimensions and referenced from
+# compare_results through an integer "<field>_id" column.
+DIMENSION_FIELDS = (
+    "customer",
+    "project_name",
+    "province",
+    "service_type",
+    "service_category",
+    "sla",
+    "branch",
+)
+
+DIMENSION_COLLATION = "utf8mb4_bin"
+
 class CompareSession(Base):
     __tablename__ = "compare_sessions"
 
@@ -13,12 +28,45 @@ class CompareSession(Base):
     archived_at = Column(DateTime, nullable=True)
 
     filename = Column(String(255), nullable=False)
+    # SHA-256 of the master version and the compare file bytes; repeated
+    # uploads of the same workbook reuse the job (see /compare-upload).
+    content_hash = Column(String(64), nullable=True)
+    # master_versions.id the job was matched against; NULL for a master
+    # given as a file (uploaded with the job, or before any import).
+    master_version_id = Column(Integer, nullable=True)
+    # compare_sessions.id of the job this one was rematched from; NULL for
+    # uploads. Not a foreign key: the source may be deleted before it.
+    source_job_id = Column(Integer, nullable=True)
+    # Totals of the upload as first matched, counting every occurrence of a
+    # circuit; results keep one row per distinct circuit. NULL for rematches
+    # and for jobs stored before these columns.
+    upload_matched = Column(Integer, nullable=True)
+    upload_unmatched = Column(Integer, nullable=True)
 
     results = relationship("CompareResult", back_populates="session", cascade="all, delete-orphan")
 
     __table_args__ = (
         Index("ix_sessions_created_at", "created_at"),
         Index("ix_sessions_pinned_archived", "pinned", "archived_at"),
+        # retention cleanup: pinned = false AND created_at < cutoff
+        Index("ix_sessions_pinned_created", "pinned", "created_at"),
+        Index("ix_sessions_content_hash", "content_hash"),
+    )
+
+
+class CompareDimension(Base):
+    """One distinct value of a descriptive field (customer, province, ...)."""
+    __tablename__ = "compare_dimensions"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    kind = Column(String(32), nullable=False)
+    # Binary on MySQL: the default collation would make "Bangkok" and "bangkok"
+    # one unique value, and the second could never get an id of its own.
+    value = Column(String(255).with_variant(mysql.VARCHAR(255, charset="utf8mb4", collation=DIMENSION_COLLATION), "mysql"),
+                   nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("kind", "value", name="uq_dimensions_kind_value"),
     )
 
 
@@ -26,25 +74,72 @@ class CompareResult(Base):
     __tablename__ = "compare_results"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    session_id = Column(Integer, ForeignKey("compare_sessions.id", ondelete="CASCADE"), index=True)
-    created_at = Column(DateTime, server_default=func.now(), index=True)
+    session_id = Column(Integer, ForeignKey("compare_sessions.id", ondelete="CASCADE"))
+    created_at = Column(DateTime, server_default=func.now())
 
-    customer = Column(String(255))
-    project_name = Column(String(255))
-    province = Column(String(255))
-    service_type = Column(String(255))
-    service_category = Column(String(255))
-
-    sla = Column(String(32))
-    branch = Column(String(255))
+    # compare_dimensions.id references; NULL means no value ("" has its own row).
+    customer_id = Column(Integer)
+    project_name_id = Column(Integer)
+    province_id = Column(Integer)
+    service_type_id = Column(Integer)
+    service_category_id = Column(Integer)
+    sla_id = Column(Integer)
+    branch_id = Column(Integer)
 
     circuit_norm = Column(String(255), index=True)
-    circuit_raw = Column(Text)
     matched = Column(Integer)
 
     session = relationship("CompareSession", back_populates="results")
 
-    __table_args__ = (
-        Index("ix_results_session_id_created_at", "session_id", "created_at"),
-        Index("ix_results_matched_session", "matched", "session_id"),
-    )
+
+class MasterVersion(Base):
+    """One imported master workbook. Exactly one version is active at a time;
+    older ones are kept for audit and can be reactivated."""
+    __tablename__ = "master_versions"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    created_at = Column(DateTime, server_default=func.now())
+    filename = Column(String(255), nullable=False)
+    # SHA-256 of the workbook, so jobs deduplicate the same way as with the file.
+    sha256 = Column(String(64), nullable=False)
+    row_count = Column(Integer, nullable=False, default=0)
+    active = Column(Boolean, default=False, nullable=False, index=True)
+
+
+class MasterCircuit(Base):
+    """A master row of one version, keyed by normalized circuit code.
+
+    Values are stored raw as read from the workbook; compare runs format them
+    exactly as they do rows read from a file.
+    """
+    __tablename__ = "master_circuits"
+
+    version_id = Column(Integer, ForeignKey("master_versions.id", ondelete="CASCADE"), primary_key=True)
+    circuit_norm = Column(String(255), primary_key=True)
+
+    customer = Column(Text)
+    project_name = Column(Text)
+    province = Column(Text)
+    service_type = Column(Text)
+    sla = Column(Text)
+    branch = Column(Text)
+
+
+# get_records: session_id = ? [AND matched = ?] ORDER BY matched DESC, id.
+# Also covers the per-session counts in /jobs and deletes by session_id.
+Index(
+    "ix_results_session_matched_id",
+    CompareResult.session_id,
+    CompareResult.matched.desc(),
+    CompareResult.id,
+)
+
+# Indexes superseded by the ones above; dropped from existing databases.
+OBSOLETE_INDEXES = {
+    "compare_results": (
+        "ix_results_session_id_created_at",
+        "ix_results_matched_session",
+        "ix_compare_results_session_id",
+        "ix_compare_results_created_at",
+    ),
+}
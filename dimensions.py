@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple, Any
+
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
+
+try:
+    from .db_models import CompareDimension, DIMENSION_FIELDS
+except Exception:
+    from db_models import CompareDimension, DIMENSION_FIELDS
+
+# Dimension rows are append-only, so id <-> value pairs can be cached for the
+# lifetime of the process.
+_id_cache: Dict[Tuple[str, str], int] = {}
+_label_cache: Dict[int, str] = {}
+_cache_lock = threading.Lock()
+
+_IN_CHUNK = 500
+
+def _remember(kind: str, value: str, dim_id: int) -> None:
+    with _cache_lock:
+        _id_cache[(kind, value)] = dim_id
+        _label_cache[dim_id] = value
+
+def _load_ids(db: Session, kind: str, values: List[str]) -> None:
+    for i in range(0, len(values), _IN_CHUNK):
+        chunk = values[i:i + _IN_CHUNK]
+        rows = db.query(CompareDimension.id, CompareDimension.value).filter(
+            CompareDimension.kind == kind,
+            CompareDimension.value.in_(chunk)
+        ).all()
+        for dim_id, value in rows:
+            _remember(kind, value, dim_id)
+
+def _clean(value: Any) -> Optional[str]:
+    # "" is a value of its own; only None (NULL) has no dimension row.
+    if value is None or value != value:  # None or NaN
+        return None
+    return str(value)[:255]
+
+def _resolve_collisions(db: Session, kind: str, values: List[str]) -> None:
+    """Map values the database treats as equal to a stored one onto that row.
+
+    Under a PAD SPACE collation (MySQL utf8mb4_bin) "x " equals the stored
+    "x", so the insert is refused and no row comes back with the exact value.
+    """
+    for v in values:
+        row = db.query(CompareDimension.id).filter(
+            CompareDimension.kind == kind, CompareDimension.value == v
+        ).first()
+        if row is not None:
+            with _cache_lock:
+                _id_cache[(kind, v)] = row[0]
+
+def get_or_create_ids(db: Session, kind: str, values: Iterable[Any]) -> Dict[str, int]:
+    """Map each value of one dimension kind, "" included, to its id, inserting new values."""
+    wanted = {v for v in (_clean(x) for x in values) if v is not None}
+    missing = [v for v in wanted if (kind, v) not in _id_cache]
+    if missing:
+        _load_ids(db, kind, missing)
+        missing = [v for v in missing if (kind, v) not in _id_cache]
+    if missing:
+        try:
+            db.bulk_insert_mappings(CompareDimension, [{"kind": kind, "value": v} for v in missing])
+            db.commit()
+        except IntegrityError:
+            # Another worker inserted some of the same values concurrently.
+            db.rollback()
+            for v in missing:
+                if db.query(CompareDimension.id).filter(
+                    CompareDimension.kind == kind, CompareDimension.value == v
+                ).first() is None:
+                    db.add(CompareDimension(kind=kind, value=v))
+                    try:
+                        db.commit()
+                    except IntegrityError:
+                        db.rollback()
+        _load_ids(db, kind, missing)
+        _resolve_collisions(db, kind, [v for v in missing if (kind, v) not in _id_cache])
+    return {v: _id_cache[(kind, v)] for v in wanted if (kind, v) in _id_cache}
+
+def encode_rows(db: Session, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Replace descriptive field values in result rows with their dimension ids."""
+    for field in DIMENSION_FIELDS:
+        ids = get_or_create_ids(db, field, (r.get(field) for r in rows))
+        id_col = f"{field}_id"
+        for r in rows:
+            r[id_col] = ids.get(_clean(r.pop(field, None)))
+    return rows
+
+def dimension_ids(db: Session, kind: str, value: str) -> List[int]:
+    """Ids matching an exact filter value (several under case-insensitive collations)."""
+    rows = db.query(CompareDimension.id).filter(
+        CompareDimension.kind == kind,
+        CompareDimension.value == value
+    ).all()
+    return [r[0] for r in rows]
+
+def search_dimension_ids(db: Session, kinds: Iterable[str], like_pattern: str) -> Dict[str, List[int]]:
+    """Ids per kind whose value matches an ILIKE pattern."""
+    out: Dict[str, List[int]] = {k: [] for k in kinds}
+    rows = db.query(CompareDimension.id, CompareDimension.kind).filter(
+        CompareDimension.kind.in_(list(out)),
+        CompareDimension.value.ilike(like_pattern)
+    ).all()
+    for dim_id, kind in rows:
+        out[kind].append(dim_id)
+    return out
+
+def dimension_labels(db: Session, ids: Iterable[Optional[int]]) -> Dict[int, str]:
+    """Resolve dimension ids to their values, using the process cache first."""
+    wanted = {i for i in ids if i is not None}
+    missing = [i for i in wanted if i not in _label_cache]
+    for i in range(0, len(missing), _IN_CHUNK):
+        rows = db.query(CompareDimension.id, CompareDimension.kind, CompareDimension.value).filter(
+            CompareDimension.id.in_(missing[i:i + _IN_CHUNK])
+        ).all()
+        for dim_id, kind, value in rows:
+            _remember(kind, value, dim_id)
+    return {i: _label_cache[i] for i in wanted if i in _label_cache}
+
+def decode_rows(db: Session, rows: List[Any]) -> List[Dict[str, Any]]:
+    """Turn result rows carrying "<field>_id" attributes into dicts of field values.
+
+    A NULL id decodes to None and "" has its own dimension row, so values
+    come back exactly as they were stored before dimension ids.
+    """
+    labels = dimension_labels(
+        db, (getattr(r, f"{f}_id") for r in rows for f in DIMENSION_FIELDS)
+    )
+    return [{f: labels.get(getattr(r, f"{f}_id")) for f in DIMENSION_FIELDS} for r in rows]
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import os
+import json
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Set
+
+from .config import EVENTS_JOURNAL_FILE, SSE_STATS_INTERVAL_SECONDS
+from .system_stats import collect_system_stats
+
+_POLL_SECONDS = 1.0
+_REPLAY_SIZE = 500
+_QUEUE_SIZE = 1000
+
+class EventFanout:
+    """Per-worker fan-out of journal events to SSE subscribers.
+
+    A single task per process tails the shared journal written by
+    job_events.publish_event and pushes new events to every subscriber queue,
+    so the number of open tabs does not multiply file or database reads.
+    Periodic ``stats`` events are generated here only while someone listens.
+    """
+
+    def __init__(self):
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._recent: Deque[Dict[str, Any]] = deque(maxlen=_REPLAY_SIZE)
+        self._task: Optional[asyncio.Task] = None
+        self._inode: Optional[int] = None
+        self._offset = 0
+        self._head = b""
+        self._last_id = 0
+        self._last_stats = 0.0
+
+    def subscribe(self, last_event_id: Optional[int] = None) -> asyncio.Queue:
+        q: asyncio.Queue = asyncio.Queue(maxsize=_QUEUE_SIZE)
+        if self._task is None or self._task.done():
+            self._read_journal()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        if last_event_id is not None:
+            for evt in self._recent:
+                if evt["id"] > last_event_id:
+                    q.put_nowait(evt)
+        self._subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q: asyncio.Queue) -> None:
+        self._subscribers.discard(q)
+
+    def _broadcast(self, evt: Dict[str, Any]) -> None:
+        for q in list(self._subscribers):
+            try:
+                q.put_nowait(evt)
+            except asyncio.QueueFull:
+                # Slow client: drop it, EventSource reconnects with Last-Event-ID.
+                self._subscribers.discard(q)
+                logging.warning("Dropping SSE subscriber with full queue")
+
+    def _read_journal(self) -> list:
+        """Return events appended since the last read, following journal trims."""
+        try:
+            st = os.stat(EVENTS_JOURNAL_FILE)
+        except FileNotFoundError:
+            return []
+        if st.st_ino != self._inode or st.st_size < self._offset:
+            self._inode, self._offset = st.st_ino, 0
+        if st.st_size == self._offset:
+            return []
+        with open(EVENTS_JOURNAL_FILE, "rb") as f:
+            # A trim replaces the file, and the new one can get the old
+            # inode number back; its first line tells them apart.
+            if self._offset and f.read(len(self._head)) != self._head:
+                self._offset = 0
+            f.seek(self._offset)
+            chunk = f.read(st.st_size - self._offset)
+        end = chunk.rfind(b"\n") + 1
+        if self._offset == 0:
+            self._head = chunk[:chunk.find(b"\n") + 1]
+        self._offset += end
+
+        fresh = []
+        for line in chunk[:end].splitlines():
+            try:
+                evt = json.loads(line)
+            except ValueError:
+                continue
+            if evt.get("id", 0) <= self._last_id:
+                continue
+            self._last_id = evt["id"]
+            self._recent.append(evt)
+            fresh.append(evt)
+        return fresh
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while self._subscribers:
+            try:
+                for evt in self._read_journal():
+                    self._broadcast(evt)
+                now = loop.time()
+                if now - self._last_stats >= SSE_STATS_INTERVAL_SECONDS:
+                    self._last_stats = now
+                    # Stats are per worker and not replayed, so they bypass the journal.
+                    self._broadcast({"id": None, "event": "stats", "data": collect_system_stats()})
+            except Exception as e:
+                logging.warning(f"Event fan-out error: {e}")
+            await asyncio.sleep(_POLL_SECONDS)
+        self._last_stats = 0.0
+
+fanout = EventFanout()
+
+def format_sse(evt: Dict[str, Any]) -> str:
+    lines = []
+    if evt.get("id") is not None:
+        lines.append(f"id: {evt['id']}")
+    lines.append(f"event: {evt['event']}")
+    lines.append("data: " + json.dumps(evt["data"], ensure_ascii=False))
+    return "\n".join(lines) + "\n\n"
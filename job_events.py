@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import os
+import json
+import time
+import logging
+from typing import Any, Dict
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, journal trims are not coordinated
+    fcntl = None
+
+from .config import JOBS_VERSION_FILE, EVENTS_JOURNAL_FILE
+
+# The jobs version lives in a small file so every worker process on the host
+# sees the same value. Bumping replaces the file, which changes its inode and
+# mtime; reading is a single stat() and never touches the database.
+
+_JOURNAL_MAX_BYTES = 1024 * 1024
+
+def jobs_version() -> str:
+    """Opaque token that changes whenever the set of jobs changes."""
+    try:
+        st = os.stat(JOBS_VERSION_FILE)
+    except FileNotFoundError:
+        bump_jobs_version()
+        try:
+            st = os.stat(JOBS_VERSION_FILE)
+        except OSError:
+            return "0"
+    except OSError:
+        return "0"
+    return f"{st.st_ino:x}-{st.st_mtime_ns:x}"
+
+def bump_jobs_version() -> None:
+    """Record that jobs were created, pinned, deleted or cleaned up."""
+    tmp_path = f"{JOBS_VERSION_FILE}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "w") as f:
+            f.write(str(time.time_ns()))
+        os.replace(tmp_path, JOBS_VERSION_FILE)
+    except OSError as e:
+        logging.warning(f"Failed to bump jobs version: {e}")
+
+def _lock(fd: int, exclusive: bool) -> None:
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+
+def _is_current(fd: int) -> bool:
+    try:
+        return os.fstat(fd).st_ino == os.stat(EVENTS_JOURNAL_FILE).st_ino
+    except FileNotFoundError:
+        return False
+
+# Appends hold a shared flock on the journal and the trim an exclusive one,
+# so no append lands in the old file between the trim's read and its
+# replace. A writer that opened the file just before a trim replaced it
+# finds it is no longer current once it gets the lock, and reopens.
+
+def _append(data: bytes) -> int:
+    """Append one event line; returns the journal size after it."""
+    while True:
+        fd = os.open(EVENTS_JOURNAL_FILE, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            _lock(fd, exclusive=False)
+            if not _is_current(fd):
+                continue
+            # One O_APPEND write per event keeps concurrent writers from interleaving.
+            os.write(fd, data)
+            return os.fstat(fd).st_size
+        finally:
+            # Closing releases the lock.
+            os.close(fd)
+
+def _trim_journal() -> None:
+    """Keep the newer half of the journal once it grows past _JOURNAL_MAX_BYTES."""
+    tmp_path = f"{EVENTS_JOURNAL_FILE}.{os.getpid()}.tmp"
+    with open(EVENTS_JOURNAL_FILE, "rb") as f:
+        _lock(f.fileno(), exclusive=True)
+        # Another process may have trimmed while this one waited for the lock.
+        if not _is_current(f.fileno()) or os.fstat(f.fileno()).st_size <= _JOURNAL_MAX_BYTES:
+            return
+        f.seek(-(_JOURNAL_MAX_BYTES // 2), os.SEEK_END)
+        tail = f.read()
+        tail = tail[tail.find(b"\n") + 1:]
+        with open(tmp_path, "wb") as out:
+            out.write(tail)
+        os.replace(tmp_path, EVENTS_JOURNAL_FILE)
+
+def publish_event(event: str, data: Dict[str, Any]) -> None:
+    """Append an event to the shared journal that every worker's fan-out tails.
+
+    Event ids are nanosecond timestamps, so they increase across processes and
+    can be used directly as the SSE Last-Event-ID.
+    """
+    line = json.dumps({"id": time.time_ns(), "event": event, "data": data}, ensure_ascii=False) + "\n"
+    try:
+        if _append(line.encode("utf-8")) > _JOURNAL_MAX_BYTES:
+            _trim_journal()
+    except OSError as e:
+        logging.warning(f"Failed to publish event {event}: {e}")
+
+def job_changed(event: str, data: Dict[str, Any]) -> None:
+    """Bump the jobs version and notify subscribers of a job-* event."""
+    bump_jobs_version()
+    publish_event(event, data)
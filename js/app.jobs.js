@@ -34,6 +34,28 @@
     }
   };
 
+  // Quiet refresh for server-pushed changes: keeps the records panels as they are.
+  App.refreshJobs = async ()=>{
+    try{
+      const jobs = await fetchJobs();
+      App.JOBS_ALL = jobs || [];
+      jobCount.textContent=`${App.JOBS_ALL.length} jobs`;
+      App.applyJobsFilter(true);
+    }catch(e){ console.error('โหลด jobs ไม่สำเร็จ:', e.message); }
+  };
+
+  const eventsToken = typeof AuthManager !== 'undefined' ? AuthManager.getToken() : null;
+  if (global.EventSource && eventsToken) {
+    let refreshTimer = null;
+    const events = new EventSource(`${App.API_BASE}/events?token=${encodeURIComponent(eventsToken)}`);
+    ['job-created', 'job-pinned', 'job-deleted'].forEach(name=>{
+      events.addEventListener(name, ()=>{
+        clearTimeout(refreshTimer);
+        refreshTimer = setTimeout(App.refreshJobs, 300);
+      });
+    });
+  }
+
   App.applyJobsFilter = (resetShown=false)=>{
     const from = jobDateFrom.value ? new Date(jobDateFrom.value+'T00:00:00') : null;
     const to   = jobDateTo.value   ? new Date(jobDateTo.value+'T23:59:59.999') : null;
@@ -81,6 +103,7 @@
           <div class="small" style="color:#9aa6b2">${ts}</div>
         </div>
         <div class="small">Records: ${j.total_records} · Matched: ${j.matched_total} · Unmatched: ${j.unmatched_total}</div>
+        ${j.source_job_id ? `<div class="small" style="color:#9aa6b2">Rematch of Job #${j.source_job_id} · distinct circuits</div>` : ''}
       `;
       li.addEventListener('click', ()=>App.selectJob(j.job_id, li));
       const pinBtn = li.querySelector('.pin-btn');
@@ -3,10 +3,11 @@
     
     async function loadStats() {
         try {
-            const response = await fetch('/jobs');
+            // ETag + no-cache: unchanged polls revalidate as 304 without a DB query
+            const response = await fetch('/jobs/count');
             if (response.ok) {
-                const jobs = await response.json();
-                document.getElementById('compareJobs').textContent = jobs.length;
+                const data = await response.json();
+                document.getElementById('compareJobs').textContent = data.count;
                 document.getElementById('lastUpdate').textContent = new Date().toLocaleTimeString('th-TH');
             } else {
                 const errorText = await response.text();
@@ -19,6 +20,13 @@
         }
     }
     
+    function applySystemStats(stats) {
+        document.getElementById('cpuUsage').textContent = `${stats.cpu.percent}%`;
+        document.getElementById('memoryUsage').textContent = `${stats.memory.used}/${stats.memory.total} GB`;
+        document.getElementById('diskUsage').textContent = `${stats.disk.used}/${stats.disk.total} GB`;
+        document.getElementById('cpuCores').textContent = `${stats.cpu.count} cores`;
+    }
+    
     async function loadSystemStats() {
         const endpoints = ['/system-stats', '/api/system-stats', 'http://localhost:8000/system-stats'];
         
@@ -26,11 +34,7 @@
             try {
                 const response = await fetch(endpoint);
                 if (response.ok) {
-                    const stats = await response.json();
-                    document.getElementById('cpuUsage').textContent = `${stats.cpu.percent}%`;
-                    document.getElementById('memoryUsage').textContent = `${stats.memory.used}/${stats.memory.total} GB`;
-                    document.getElementById('diskUsage').textContent = `${stats.disk.used}/${stats.disk.total} GB`;
-                    document.getElementById('cpuCores').textContent = `${stats.cpu.count} cores`;
+                    applySystemStats(await response.json());
                     return; // Success, exit function
                 }
             } catch (error) {
@@ -43,12 +47,27 @@
         document.getElementById('cpuCores').textContent = '4 cores';
     }
     
+    // Server pushes job changes and periodic stats; EventSource reconnects on
+    // its own and resumes with Last-Event-ID, so no polling is needed.
+    function connectEvents() {
+        if (!window.EventSource) return false;
+        const token = AuthManager.getToken();
+        if (!token) return false;
+        const events = new EventSource(`/events?token=${encodeURIComponent(token)}`);
+        events.addEventListener('stats', (e) => applySystemStats(JSON.parse(e.data)));
+        events.addEventListener('job-created', loadStats);
+        events.addEventListener('job-deleted', loadStats);
+        return true;
+    }
+    
     function initStats() {
         loadStats();
         loadSystemStats();
         
-        setInterval(loadStats, 30000);
-        setInterval(loadSystemStats, 30000);
+        if (!connectEvents()) {
+            setInterval(loadStats, 30000);
+            setInterval(loadSystemStats, 30000);
+        }
     }
     
     window.DashboardStats = { initStats, loadStats, loadSystemStats };
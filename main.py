@@ -7,10 +7,14 @@ from fastapi.responses import FileResponse, RedirectResponse
 from .routes.compare import router as compare_router
 from .routes.text_replace import router as text_replace_router
 from .routes.auth import router as auth_router
+from .routes.events import router as events_router
+from .routes.uploads import router as uploads_router
 from .middleware.security import SecurityHeadersMiddleware
 from .middleware.auth_middleware import AuthMiddleware
 from .database import init_db
+from .text_replace_jobs import fail_stale_jobs
 from .models import TextReplaceHistory
+from .system_stats import collect_system_stats
 
 app = FastAPI(title="Compare System API")
 
@@ -20,6 +24,10 @@ async def startup_event():
         init_db()
     except Exception as e:
         print(f"Warning: Failed to initialize database: {e}")
+    try:
+        fail_stale_jobs()
+    except Exception as e:
+        print(f"Warning: Failed to check text-replace jobs: {e}")
 
 app.add_middleware(SecurityHeadersMiddleware)
 app.add_middleware(AuthMiddleware)
@@ -69,29 +77,10 @@ def health():
 
 @app.get("/system-stats")
 def get_system_stats():
-    import random
-    import time
-    
-
-    return {
-        "memory": {
-            "total": 8.0,
-            "used": round(2.1 + random.uniform(0, 1.5), 1),
-            "available": round(5.9 - random.uniform(0, 1.5), 1),
-            "percent": round(25 + random.uniform(0, 15), 1)
-        },
-        "disk": {
-            "total": 50.0,
-            "used": round(12.5 + random.uniform(0, 2), 1),
-            "free": round(37.5 - random.uniform(0, 2), 1),
-            "percent": round(25 + random.uniform(0, 5), 1)
-        },
-        "cpu": {
-            "percent": round(15 + random.uniform(0, 25), 1),
-            "count": 4
-        }
-    }
+    return collect_system_stats()
 
 app.include_router(auth_router)
 app.include_router(compare_router)
 app.include_router(text_replace_router)
+app.include_router(events_router)
+app.include_router(uploads_router)
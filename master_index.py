@@ -0,0 +1,260 @@
+from __future__ import annotations
+
+import os
+import sys
+import json
+import mmap
+import uuid
+import logging
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator, Mapping, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+try:
+    from .config import MASTER_INDEX_DIR, MASTER_INDEX_KEEP
+except Exception:
+    from config import MASTER_INDEX_DIR, MASTER_INDEX_KEEP
+
+# Columnar master lookup. Normalized circuit codes are plain ASCII
+# ([A-Z0-9], see _normalize_code), so they are kept as one sorted fixed-width
+# bytes array searched with np.searchsorted. Each enrichment field is
+# dictionary encoded: an int32 code per row pointing into the field's distinct
+# values, so a province or customer repeated over thousands of rows is one
+# Python string. Per-row dicts of the same data cost several hundred bytes
+# per field.
+#
+# An index can be saved as one file: a JSON header followed by the arrays,
+# with the distinct values of each field as a UTF-8 arena plus offsets.
+# Opening maps the file read-only, so worker processes share one copy in the
+# page cache and start matching without parsing the workbook.
+
+FIELDS = ("customer", "project_name", "province", "service_type", "sla", "branch")
+
+_MAGIC = b"MASTERIDX1\n"
+_ALIGN = 64
+
+class StringArena:
+    """Read-only sequence of strings stored as UTF-8 bytes and end offsets."""
+
+    def __init__(self, offsets: np.ndarray, data: np.ndarray):
+        self.offsets = offsets
+        self.data = data
+
+    @classmethod
+    def pack(cls, values: Sequence[Any]) -> "StringArena":
+        encoded = [str(v).encode("utf-8") for v in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        return cls(offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8))
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return self.data[self.offsets[i]:self.offsets[i + 1]].tobytes().decode("utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        return (self[i] for i in range(len(self)))
+
+    @property
+    def nbytes(self) -> int:
+        return self.offsets.nbytes + self.data.nbytes
+
+Values = Union[np.ndarray, StringArena]
+
+class MasterIndex:
+    def __init__(self, keys: np.ndarray, codes: Dict[str, np.ndarray], values: Dict[str, Values],
+                 buffer: Optional[mmap.mmap] = None):
+        self.keys = keys
+        self.codes = codes
+        self.values = values
+        # The mapping the arrays of an opened index point into.
+        self._buffer = buffer
+
+    @classmethod
+    def build(cls, keys: Sequence[str], columns: Mapping[str, Sequence[Any]]) -> "MasterIndex":
+        """Index unique codes; columns hold one raw value per key (None/NaN when empty)."""
+        key_arr = np.array(list(keys), dtype="S") if len(keys) else np.array([], dtype="S1")
+        order = np.argsort(key_arr, kind="stable")
+        key_arr = key_arr[order]
+        codes, values = {}, {}
+        for field in FIELDS:
+            column = pd.Series(list(columns.get(field, [None] * len(order))), dtype=object)
+            field_codes, uniques = pd.factorize(column.iloc[order], use_na_sentinel=True)
+            codes[field] = field_codes.astype(np.int32)
+            values[field] = np.asarray(uniques, dtype=object)
+        return cls(key_arr, codes, values)
+
+    @classmethod
+    def from_rows(cls, rows: Mapping[str, Mapping[str, Any]]) -> "MasterIndex":
+        return cls.build(list(rows), {f: [r.get(f) for r in rows.values()] for f in FIELDS})
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def lookup(self, codes: Sequence[str]) -> np.ndarray:
+        """Row position of every code in one vectorized search; -1 where absent."""
+        if not len(codes) or not len(self.keys):
+            return np.full(len(codes), -1, dtype=np.int64)
+        try:
+            query = np.array(list(codes), dtype="S")
+        except UnicodeEncodeError:
+            # Not a normalized code, so it cannot match; "?" is never in a key.
+            query = pd.Series(list(codes), dtype=object).str.encode("ascii", errors="replace").to_numpy().astype("S")
+        width = self.keys.dtype.itemsize
+        # A code longer than the widest key would be truncated by the cast below.
+        fits = np.char.str_len(query) <= width if query.dtype.itemsize > width else True
+        q = query.astype(self.keys.dtype)
+        pos = np.searchsorted(self.keys, q)
+        pos[pos == len(self.keys)] = 0
+        found = fits & (self.keys[pos] == q)
+        return np.where(found, pos, -1)
+
+    def column(self, field: str, pos: np.ndarray, fn: Optional[Callable[[Any], Any]] = None,
+               missing: Any = None) -> np.ndarray:
+        """Values of field at pos (from lookup); fn runs once per distinct value.
+
+        Absent codes and empty values both give missing.
+        """
+        if not len(self.keys):
+            return np.full(len(pos), missing, dtype=object)
+        field_codes = np.where(pos >= 0, self.codes[field][np.maximum(pos, 0)], -1)
+        values = self.values[field]
+        # One slot per distinct value plus a last one, picked by code -1, for missing.
+        table = np.full(len(values) + 1, missing, dtype=object)
+        for code in np.unique(field_codes[field_codes >= 0]):
+            value = values[code]
+            table[code] = fn(value) if fn is not None else value
+        return table[field_codes]
+
+    def records(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        for i, key in enumerate(self.keys):
+            row = {}
+            for field in FIELDS:
+                code = self.codes[field][i]
+                row[field] = self.values[field][code] if code >= 0 else None
+            yield key.decode("ascii"), row
+
+    def nbytes(self) -> int:
+        """Memory held by the index: arrays plus the distinct value strings."""
+        total = self.keys.nbytes
+        for field in FIELDS:
+            values = self.values[field]
+            total += self.codes[field].nbytes
+            if isinstance(values, StringArena):
+                total += values.nbytes
+            else:
+                total += values.nbytes + sum(sys.getsizeof(v) for v in values)
+        return total
+
+    def save(self, path: str) -> None:
+        """Write the index file; it replaces path atomically."""
+        arrays = {"keys": self.keys}
+        for field in FIELDS:
+            arena = self.values[field]
+            if not isinstance(arena, StringArena):
+                arena = StringArena.pack(arena)
+            arrays[f"{field}.codes"] = self.codes[field]
+            arrays[f"{field}.offsets"] = arena.offsets
+            arrays[f"{field}.data"] = arena.data
+        # Offsets are relative to the end of the header block.
+        layout, offset = {}, 0
+        for name, arr in arrays.items():
+            layout[name] = {"dtype": arr.dtype.str, "count": int(arr.size), "offset": offset}
+            offset += -(-arr.nbytes // _ALIGN) * _ALIGN
+        header = json.dumps({"arrays": layout}).encode("utf-8")
+        header += b" " * (-(len(_MAGIC) + 8 + len(header)) % _ALIGN)
+
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(_MAGIC + len(header).to_bytes(8, "little") + header)
+                base = f.tell()
+                for name, arr in arrays.items():
+                    f.seek(base + layout[name]["offset"])
+                    f.write(np.ascontiguousarray(arr).tobytes())
+                f.truncate(base + offset)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def open(cls, path: str) -> "MasterIndex":
+        """Map an index file read-only; raises ValueError when it is not one."""
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if buffer[:len(_MAGIC)] != _MAGIC:
+            buffer.close()
+            raise ValueError(f"Not a master index file: {path}")
+        header_len = int.from_bytes(buffer[len(_MAGIC):len(_MAGIC) + 8], "little")
+        base = len(_MAGIC) + 8 + header_len
+        layout = json.loads(buffer[len(_MAGIC) + 8:base])["arrays"]
+
+        def array(name: str) -> np.ndarray:
+            spec = layout[name]
+            return np.frombuffer(buffer, dtype=np.dtype(spec["dtype"]), count=spec["count"],
+                                 offset=base + spec["offset"])
+
+        codes = {f: array(f"{f}.codes") for f in FIELDS}
+        values = {f: StringArena(array(f"{f}.offsets"), array(f"{f}.data")) for f in FIELDS}
+        return cls(array("keys"), codes, values, buffer)
+
+# Per-process cache of opened index files, newest last.
+_opened: "OrderedDict[str, MasterIndex]" = OrderedDict()
+_OPENED_MAX = 2
+
+def _index_path(sha256: str) -> str:
+    return os.path.join(MASTER_INDEX_DIR, f"{sha256}.idx")
+
+def _touch(path: str) -> None:
+    # Pruning keeps the most recently used files.
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+def _prune_index_files() -> None:
+    try:
+        entries = [e for e in os.scandir(MASTER_INDEX_DIR) if e.name.endswith(".idx")]
+    except FileNotFoundError:
+        return
+    entries.sort(key=lambda e: e.stat().st_mtime, reverse=True)
+    for entry in entries[MASTER_INDEX_KEEP:]:
+        try:
+            # Workers still mapping it keep their pages; the name is freed.
+            os.remove(entry.path)
+        except OSError:
+            pass
+
+def shared_master_index(sha256: str, build: Callable[[], MasterIndex]) -> MasterIndex:
+    """The index of the master workbook with this hash, shared between workers.
+
+    The first worker to need it calls build and saves the file; every other
+    worker, and every restart, maps that file instead of parsing the master.
+    """
+    path = _index_path(sha256)
+    index = _opened.get(sha256)
+    if index is not None:
+        _opened.move_to_end(sha256)
+        _touch(path)
+        return index
+    try:
+        index = MasterIndex.open(path)
+        _touch(path)
+    except (OSError, ValueError, KeyError):
+        index = build()
+        try:
+            os.makedirs(MASTER_INDEX_DIR, exist_ok=True)
+            index.save(path)
+            index = MasterIndex.open(path)
+            _prune_index_files()
+        except OSError as e:
+            logging.warning(f"Failed to share master index {path}: {e}")
+    _opened[sha256] = index
+    while len(_opened) > _OPENED_MAX:
+        _opened.popitem(last=False)
+    return index
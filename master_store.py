@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session
+
+try:
+    from .db_models import MasterVersion, MasterCircuit
+    from .master_index import FIELDS, MasterIndex
+except Exception:
+    from db_models import MasterVersion, MasterCircuit
+    from master_index import FIELDS, MasterIndex
+
+# Imported master workbooks. Each import is a new version in
+# master_versions with its rows in master_circuits keyed by
+# (version_id, circuit_norm); compare runs look their circuits up in the
+# active version instead of reparsing the workbook. Columns are the
+# MasterIndex fields, so stored and file masters match through the same code.
+
+_INSERT_BATCH = 5000
+_LOOKUP_BATCH = 500
+
+def import_master(db: Session, index: MasterIndex, filename: str, sha256: str) -> MasterVersion:
+    """Store a loaded master as a new version and make it the active one."""
+    version = MasterVersion(filename=filename, sha256=sha256, row_count=len(index))
+    db.add(version)
+    db.flush()
+    batch: List[dict] = []
+    for code, values in index.records():
+        batch.append({"version_id": version.id, "circuit_norm": code, **values})
+        if len(batch) >= _INSERT_BATCH:
+            db.execute(insert(MasterCircuit), batch)
+            batch = []
+    if batch:
+        db.execute(insert(MasterCircuit), batch)
+    _set_active(db, version.id)
+    db.commit()
+    db.refresh(version)
+    return version
+
+def _set_active(db: Session, version_id: int) -> None:
+    db.execute(update(MasterVersion).where(MasterVersion.active == True, MasterVersion.id != version_id)
+               .values(active=False))
+    db.execute(update(MasterVersion).where(MasterVersion.id == version_id).values(active=True))
+
+def activate_version(db: Session, version_id: int) -> Optional[MasterVersion]:
+    version = db.query(MasterVersion).filter(MasterVersion.id == version_id).first()
+    if version is None:
+        return None
+    _set_active(db, version_id)
+    db.commit()
+    db.refresh(version)
+    return version
+
+def active_version(db: Session) -> Optional[MasterVersion]:
+    return db.query(MasterVersion).filter(MasterVersion.active == True).first()
+
+def previous_version(db: Session) -> Optional[MasterVersion]:
+    """The newest version imported before the active one."""
+    current = active_version(db)
+    if current is None:
+        return None
+    return db.query(MasterVersion).filter(MasterVersion.id < current.id) \
+        .order_by(MasterVersion.id.desc()).first()
+
+def lookup_circuits(db: Session, version_id: int, codes: Iterable[str]) -> Dict[str, dict]:
+    """Master rows of one version for the given codes, for MasterIndex.from_rows."""
+    wanted = list(set(codes))
+    found: Dict[str, dict] = {}
+    columns = [getattr(MasterCircuit, c) for c in FIELDS]
+    for i in range(0, len(wanted), _LOOKUP_BATCH):
+        rows = db.query(MasterCircuit.circuit_norm, *columns).filter(
+            MasterCircuit.version_id == version_id,
+            MasterCircuit.circuit_norm.in_(wanted[i:i + _LOOKUP_BATCH]),
+        ).all()
+        for code, *values in rows:
+            found[code] = dict(zip(FIELDS, values))
+    return found
+
+def version_keys(db: Session, version_id: int) -> List[str]:
+    """Every circuit code of one version, for building its suggestion index."""
+    rows = db.query(MasterCircuit.circuit_norm).filter(MasterCircuit.version_id == version_id).all()
+    return [code for (code,) in rows]
+
+def version_info(version: MasterVersion) -> Dict[str, Any]:
+    return {
+        "version_id": version.id,
+        "filename": version.filename,
+        "sha256": version.sha256,
+        "row_count": version.row_count,
+        "active": bool(version.active),
+        "created_at": version.created_at.isoformat() if version.created_at else None,
+    }
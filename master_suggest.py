@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Callable, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Near-miss suggestions for unmatched circuits, SymSpell style. Every master
+# key is stored under each string left after deleting up to max_distance of
+# its characters. Two codes within edit distance d share such a deletion
+# variant, so the candidates of a query come from binary searches for its
+# own variants instead of a scan over every master key. Candidates are then
+# checked with the optimal string alignment distance, where swapping two
+# adjacent characters (a transposed digit) costs 1 like a wrong character.
+#
+# Codes are the ASCII keys of MasterIndex, handled as uint8 matrices padded
+# with NUL, so variants and distances are computed for all codes at once.
+
+Suggestion = Tuple[str, int]
+
+def _matrix(codes: np.ndarray) -> np.ndarray:
+    width = codes.dtype.itemsize
+    return np.ascontiguousarray(codes).view(np.uint8).reshape(len(codes), width)
+
+def _strings(matrix: np.ndarray) -> np.ndarray:
+    return np.ascontiguousarray(matrix).view(f"S{matrix.shape[1]}").ravel()
+
+def _encode(codes: Sequence[str]) -> np.ndarray:
+    try:
+        return np.array(list(codes), dtype="S")
+    except UnicodeEncodeError:
+        # Non-ASCII codes keep their length; "?" never occurs in a key.
+        return pd.Series(list(codes), dtype=object).str.encode("ascii", errors="replace").to_numpy().astype("S")
+
+def _deletes(matrix: np.ndarray, lengths: np.ndarray, max_distance: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Rows with up to max_distance characters deleted, with their lengths and source rows."""
+    rows = np.arange(len(matrix), dtype=np.int32)
+    out_m, out_l, out_r = [matrix], [lengths], [rows]
+    level_m, level_l, level_r = matrix, lengths, rows
+    for _ in range(max_distance):
+        next_m, next_l, next_r = [], [], []
+        pad = np.zeros((len(level_m), 1), dtype=np.uint8)
+        for i in range(level_m.shape[1]):
+            keep = level_l > i
+            if not keep.any():
+                break
+            deleted = np.concatenate([level_m[:, :i], level_m[:, i + 1:], pad], axis=1)
+            next_m.append(deleted[keep])
+            next_l.append(level_l[keep] - 1)
+            next_r.append(level_r[keep])
+        if not next_m:
+            break
+        level_m, level_l, level_r = np.concatenate(next_m), np.concatenate(next_l), np.concatenate(next_r)
+        # Runs like "0000" give the same variant several times per row.
+        packed = np.concatenate([level_r.astype(">i4").view(np.uint8).reshape(-1, 4), level_m], axis=1)
+        _, first = np.unique(np.ascontiguousarray(packed).view(f"V{packed.shape[1]}").ravel(), return_index=True)
+        level_m, level_l, level_r = level_m[first], level_l[first], level_r[first]
+        out_m.append(level_m)
+        out_l.append(level_l)
+        out_r.append(level_r)
+    return np.concatenate(out_m), np.concatenate(out_l), np.concatenate(out_r)
+
+def _osa_distance(a: np.ndarray, la: np.ndarray, b: np.ndarray, lb: np.ndarray) -> np.ndarray:
+    """Optimal string alignment distance of each row pair of two padded uint8 matrices."""
+    n, wa, wb = len(a), a.shape[1], b.shape[1]
+    d = np.empty((n, wa + 1, wb + 1), dtype=np.int16)
+    d[:, :, 0] = np.arange(wa + 1)
+    d[:, 0, :] = np.arange(wb + 1)
+    for i in range(1, wa + 1):
+        ca = a[:, i - 1]
+        for j in range(1, wb + 1):
+            cb = b[:, j - 1]
+            best = np.minimum(d[:, i - 1, j], d[:, i, j - 1]) + 1
+            best = np.minimum(best, d[:, i - 1, j - 1] + (ca != cb))
+            if i > 1 and j > 1:
+                swapped = (ca == b[:, j - 2]) & (a[:, i - 2] == cb)
+                best = np.where(swapped, np.minimum(best, d[:, i - 2, j - 2] + 1), best)
+            d[:, i, j] = best
+    # Cells past either string's end are never read: each pair stops at its own lengths.
+    return d[np.arange(n), la, lb]
+
+class DeletionIndex:
+    """Deletion variants of the sorted keys of a MasterIndex, for suggest()."""
+
+    _PAIR_CHUNK = 100_000
+
+    def __init__(self, keys: np.ndarray, max_distance: int = 1):
+        self.keys = keys
+        self.max_distance = max_distance
+        width = max(keys.dtype.itemsize, 1)
+        self._matrix = _matrix(keys.astype(f"S{width}"))
+        self._lengths = np.char.str_len(keys).astype(np.int32) if len(keys) else np.zeros(0, np.int32)
+        variants, _, owners = _deletes(self._matrix, self._lengths, max_distance)
+        order = np.argsort(_strings(variants), kind="stable")
+        self.variants = _strings(variants)[order]
+        self.owners = owners[order]
+
+    def __len__(self) -> int:
+        return len(self.variants)
+
+    @property
+    def nbytes(self) -> int:
+        return self.variants.nbytes + self.owners.nbytes + self._lengths.nbytes
+
+    def suggest(self, codes: Sequence[str], limit: int = 3, max_distance: int = 1) -> List[List[Suggestion]]:
+        """Up to limit (key, distance) pairs per code, nearest first, then in key order.
+
+        Exact matches are left out; max_distance is capped at the index's.
+        """
+        result: List[List[Suggestion]] = [[] for _ in codes]
+        max_distance = min(max_distance, self.max_distance)
+        if not len(codes) or not len(self.keys) or limit <= 0:
+            return result
+        query = _encode(codes)
+        q_matrix = _matrix(query) if query.dtype.itemsize else np.zeros((len(query), 1), np.uint8)
+        q_lengths = np.char.str_len(query).astype(np.int32)
+
+        width = self._matrix.shape[1]
+        variants, lengths, rows = _deletes(q_matrix, q_lengths, max_distance)
+        fits = lengths <= width
+        variants, rows = variants[fits], rows[fits]
+        if variants.shape[1] >= width:
+            variants = variants[:, :width]
+        else:
+            variants = np.pad(variants, ((0, 0), (0, width - variants.shape[1])))
+        variants = _strings(variants)
+
+        # Every index entry equal to a query variant is a candidate pair.
+        lo = np.searchsorted(self.variants, variants, "left")
+        hi = np.searchsorted(self.variants, variants, "right")
+        counts = hi - lo
+        starts = np.repeat(lo - (np.cumsum(counts) - counts), counts)
+        entries = np.arange(counts.sum()) + starts
+        pairs = np.unique(np.repeat(rows, counts).astype(np.int64) * len(self.keys) + self.owners[entries])
+        q_rows, k_rows = pairs // len(self.keys), pairs % len(self.keys)
+
+        distance = np.empty(len(pairs), dtype=np.int16)
+        for s in range(0, len(pairs), self._PAIR_CHUNK):
+            q, k = q_rows[s:s + self._PAIR_CHUNK], k_rows[s:s + self._PAIR_CHUNK]
+            distance[s:s + self._PAIR_CHUNK] = _osa_distance(
+                q_matrix[q], q_lengths[q], self._matrix[k], self._lengths[k])
+        near = (distance >= 1) & (distance <= max_distance)
+        q_rows, k_rows, distance = q_rows[near], k_rows[near], distance[near]
+
+        # Keys are sorted, so ordering by row breaks distance ties alphabetically.
+        order = np.lexsort((k_rows, distance, q_rows))
+        q_rows, k_rows, distance = q_rows[order], k_rows[order], distance[order]
+        group_start = np.flatnonzero(np.r_[True, q_rows[1:] != q_rows[:-1]])
+        rank = np.arange(len(q_rows)) - np.repeat(group_start, np.diff(np.r_[group_start, len(q_rows)]))
+        top = rank < limit
+        for q, k, dist in zip(q_rows[top].tolist(), k_rows[top].tolist(), distance[top].tolist()):
+            result[q].append((self.keys[k].decode("ascii"), dist))
+        return result
+
+# Per-process cache of deletion indexes by master sha256, newest last.
+_built: "OrderedDict[str, DeletionIndex]" = OrderedDict()
+_BUILT_MAX = 2
+
+def deletion_index(sha256: str, keys: Callable[[], np.ndarray], max_distance: int) -> DeletionIndex:
+    """The deletion index of the master with this hash, built on first use from keys()."""
+    index = _built.get(sha256)
+    if index is None or index.max_distance < max_distance:
+        index = DeletionIndex(keys(), max_distance)
+        _built[sha256] = index
+    _built.move_to_end(sha256)
+    while len(_built) > _BUILT_MAX:
+        _built.popitem(last=False)
+    return index
@@ -1,5 +1,5 @@
 from fastapi import Request, HTTPException
-from fastapi.responses import RedirectResponse
+from fastapi.responses import JSONResponse, RedirectResponse
 from starlette.middleware.base import BaseHTTPMiddleware
 from ..auth import verify_token
 
@@ -14,24 +14,36 @@ class AuthMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request: Request, call_next):
         path = request.url.path
         
+        # The event stream carries job ids, file names and progress; checked
+        # before the public prefixes, which "/" makes match every path.
+        if path == "/events":
+            return await self._authenticate(request, call_next)
+        
         if any(path.startswith(public) for public in self.public_paths):
             return await call_next(request)
         
-        if path in ['/jobs', '/system-stats', '/text-replace/history', '/compare-upload'] or path.startswith('/api/') or path.startswith('/text-replace/') or path.startswith('/admin/') or path.startswith('/export/'):
+        if path in ['/jobs', '/system-stats', '/text-replace/history', '/compare-upload'] or path.startswith('/api/') or path.startswith('/text-replace/') or path.startswith('/admin/') or path.startswith('/export/') or path.startswith('/uploads'):
             return await call_next(request)
         
+        return await self._authenticate(request, call_next)
+    
+    async def _authenticate(self, request: Request, call_next):
         auth_header = request.headers.get("Authorization")
+        # EventSource cannot send headers, so the event stream takes the token as a query parameter.
+        if request.url.path == "/events" and not auth_header and request.query_params.get("token"):
+            auth_header = f"Bearer {request.query_params['token']}"
         if not auth_header or not auth_header.startswith("Bearer "):
             if "text/html" in request.headers.get("accept", ""):
                 return RedirectResponse(url="/login", status_code=302)
-            raise HTTPException(status_code=401, detail="Authentication required")
+            # Raised here it would surface as a 500: middleware runs outside the exception handlers.
+            return JSONResponse(status_code=401, content={"detail": "Authentication required"})
         
         token = auth_header.split(" ")[1]
         user = verify_token(token)
         if not user:
             if "text/html" in request.headers.get("accept", ""):
                 return RedirectResponse(url="/login", status_code=302)
-            raise HTTPException(status_code=401, detail="Invalid or expired token")
+            return JSONResponse(status_code=401, content={"detail": "Invalid or expired token"})
         
         request.state.user = user
         return await call_next(request)
\ No newline at end of file
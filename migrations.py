@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import logging
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+from .db_models import Base as CompareBase, DIMENSION_FIELDS, DIMENSION_COLLATION, OBSOLETE_INDEXES
+from .models import Base
+
+def _migrate_compare_result_dimensions(engine: Engine) -> None:
+    """Move per-row descriptive strings into compare_dimensions and drop circuit_raw.
+
+    Safe to run repeatedly: it only acts while legacy columns are still present.
+    """
+    insp = inspect(engine)
+    if "compare_results" not in insp.get_table_names():
+        return
+    cols = {c["name"] for c in insp.get_columns("compare_results")}
+    legacy = [f for f in DIMENSION_FIELDS if f in cols]
+    if not legacy and "circuit_raw" not in cols:
+        return
+
+    logging.warning(f"Migrating compare_results to dimension ids (legacy columns: {legacy})")
+    with engine.begin() as conn:
+        for f in DIMENSION_FIELDS:
+            if f"{f}_id" not in cols:
+                conn.execute(text(f"ALTER TABLE compare_results ADD COLUMN {f}_id INTEGER"))
+
+        for f in legacy:
+            conn.execute(
+                text(f"""
+                    INSERT INTO compare_dimensions (kind, value)
+                    SELECT DISTINCT :kind, r.{f}
+                    FROM compare_results r
+                    WHERE r.{f} IS NOT NULL
+                      AND NOT EXISTS (
+                          SELECT 1 FROM compare_dimensions d
+                          WHERE d.kind = :kind AND d.value = r.{f}
+                      )
+                """),
+                {"kind": f},
+            )
+            conn.execute(
+                text(f"""
+                    UPDATE compare_results
+                    SET {f}_id = (
+                        SELECT d.id FROM compare_dimensions d
+                        WHERE d.kind = :kind AND d.value = compare_results.{f}
+                    )
+                    WHERE {f}_id IS NULL AND {f} IS NOT NULL
+                """),
+                {"kind": f},
+            )
+
+        for col in legacy + (["circuit_raw"] if "circuit_raw" in cols else []):
+            conn.execute(text(f"ALTER TABLE compare_results DROP COLUMN {col}"))
+
+def _binary_dimension_values(engine: Engine) -> None:
+    """Give compare_dimensions.value a binary collation on MySQL (see CompareDimension)."""
+    if engine.dialect.name != "mysql" or "compare_dimensions" not in inspect(engine).get_table_names():
+        return
+    with engine.begin() as conn:
+        collation = conn.execute(text("""
+            SELECT COLLATION_NAME FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'compare_dimensions' AND COLUMN_NAME = 'value'
+        """)).scalar()
+        if collation == DIMENSION_COLLATION:
+            return
+        logging.warning(f"Changing compare_dimensions.value collation from {collation} to {DIMENSION_COLLATION}")
+        # A stricter collation only splits values, so the unique key still holds.
+        conn.execute(text(f"ALTER TABLE compare_dimensions MODIFY value VARCHAR(255) "
+                          f"CHARACTER SET utf8mb4 COLLATE {DIMENSION_COLLATION} NOT NULL"))
+
+def _add_missing_columns(engine: Engine) -> None:
+    """Add nullable model columns that existing tables do not have yet."""
+    insp = inspect(engine)
+    tables = set(insp.get_table_names())
+    for metadata in (Base.metadata, CompareBase.metadata):
+        for table in metadata.sorted_tables:
+            if table.name not in tables:
+                continue
+            existing = {c["name"] for c in insp.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                if not column.nullable:
+                    logging.warning(f"Cannot add NOT NULL column {table.name}.{column.name} automatically")
+                    continue
+                logging.warning(f"Adding column {column.name} to {table.name}")
+                col_type = column.type.compile(dialect=engine.dialect)
+                with engine.begin() as conn:
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {col_type}"))
+
+def _sync_indexes(engine: Engine) -> None:
+    """Create model indexes missing from existing tables and drop superseded ones."""
+    insp = inspect(engine)
+    tables = set(insp.get_table_names())
+    for metadata in (Base.metadata, CompareBase.metadata):
+        for table in metadata.sorted_tables:
+            if table.name not in tables:
+                continue
+            existing = {ix["name"] for ix in insp.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing:
+                    logging.warning(f"Creating index {index.name} on {table.name}")
+                    index.create(bind=engine)
+            for name in OBSOLETE_INDEXES.get(table.name, ()):
+                if name in existing:
+                    logging.warning(f"Dropping obsolete index {name} on {table.name}")
+                    with engine.begin() as conn:
+                        conn.execute(text(f"DROP INDEX {name} ON {table.name}" if engine.dialect.name == "mysql"
+                                          else f"DROP INDEX {name}"))
+
+def run_migrations(engine: Engine) -> None:
+    """Bring an existing database up to the current models."""
+    _binary_dimension_values(engine)
+    _migrate_compare_result_dimensions(engine)
+    _add_missing_columns(engine)
+    _sync_indexes(engine)
@@ -11,6 +11,7 @@ class TextReplaceHistory(Base):
     zip_id = Column(String(36), unique=True, index=True)
     find_text = Column(Text, nullable=False)
     replace_text = Column(Text, nullable=False)
+    rules = Column(Text, nullable=True)
     total_files = Column(Integer, nullable=False)
     successful = Column(Integer, nullable=False)
     failed = Column(Integer, nullable=False)
@@ -18,7 +19,9 @@ class TextReplaceHistory(Base):
     total_replacements = Column(Integer, default=0)
     files_with_matches = Column(Integer, default=0)
     files_no_matches = Column(Integer, default=0)
+    cache_hits = Column(Integer, default=0)
     zip_path = Column(String(500), nullable=False)
+    artifact_id = Column(String(64), index=True, nullable=True)
     zip_available = Column(Boolean, default=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    expires_at = Column(DateTime(timezone=True), nullable=False)
\ No newline at end of file
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
\ No newline at end of file
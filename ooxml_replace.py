@@ -0,0 +1,607 @@
+from __future__ import annotations
+
+import re
+import codecs
+import shutil
+import struct
+import zipfile
+import tempfile
+from xml.etree import ElementTree
+from bisect import bisect_right
+from collections import Counter
+from typing import Dict, FrozenSet, Iterator, List, Optional, Pattern, Tuple
+
+from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format
+
+try:
+    from .replace_rules import FindSpans, Span
+except Exception:
+    from replace_rules import FindSpans, Span
+
+# Zip-level find/replace for Office Open XML packages. Only the XML parts that
+# hold document text are decompressed and rewritten token by token; every
+# other member (media, styles, relationships) is copied with its compressed
+# bytes untouched.
+
+_CHUNK_SIZE = 256 * 1024
+_SPOOL_SIZE = 16 * 1024 * 1024
+SCAN_MAX_LOCATIONS = 200
+
+DOCX_TEXT_PARTS = re.compile(r"^word/(document|header\d*|footer\d*|footnotes|endnotes)\.xml$")
+
+# Paragraph boundaries, text nodes and the mc:Fallback copies Word writes for
+# text boxes (the same text is also present in mc:Choice, so it is rewritten
+# but not counted twice).
+DOCX_TOKENS = re.compile(
+    r"(?P<open><w:p(?:\s[^>]*)?(?<!/)>)"
+    r"|(?P<close></w:p>)"
+    r"|(?P<empty><w:p(?:\s[^>]*)?/>)"
+    r"|(?P<text><w:t(?P<attrs>\s[^>]*)?(?<!/)>(?P<body>[^<]*)</w:t>)"
+    r"|(?P<fb_open><mc:Fallback(?:\s[^>]*)?(?<!/)>)"
+    r"|(?P<fb_close></mc:Fallback>)"
+)
+
+XLSX_SHARED_STRINGS = "xl/sharedStrings.xml"
+XLSX_STYLES = "xl/styles.xml"
+_SML_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+XLSX_SHEET_PARTS = re.compile(r"^xl/worksheets/[^/]+\.xml$")
+
+# String items of sharedStrings.xml (<si>) and inline strings (<is>); the
+# phonetic hints in <rPh> are not part of the cell text.
+XLSX_STRING_TOKENS = re.compile(
+    r"(?P<open><(?:si|is)>)"
+    r"|(?P<close></(?:si|is)>)"
+    r"|(?P<empty><(?:si|is)/>)"
+    r"|(?P<text><t(?P<attrs>\s[^>]*)?(?<!/)>(?P<body>[^<]*)</t>)"
+    r"|(?P<skip_open><rPh(?:\s[^>]*)?(?<!/)>)"
+    r"|(?P<skip_close></rPh>)"
+)
+
+XLSX_CELL = re.compile(r"<c(?P<attrs>\s[^>]*)?(?:/>|(?<!/)>(?P<inner>.*?)</c>)", re.S)
+_CELL_TYPE = re.compile(r'\st="([^"]*)"')
+_CELL_VALUE = re.compile(r"<v>([^<]*)</v>")
+_T_BODY = re.compile(r"<t(?:\s[^>]*)?(?<!/)>([^<]*)</t>")
+_CELL_REF = re.compile(r'\sr="([^"]*)"')
+_CELL_STYLE = re.compile(r'\ss="(\d+)"')
+_SIMPLE_INLINE = re.compile(r"<is><t(?P<attrs>\s[^>]*)?(?<!/)>(?P<body>[^<]*)</t></is>")
+
+class Locations:
+    """Match locations of one file for scans, capped at SCAN_MAX_LOCATIONS."""
+
+    def __init__(self):
+        self.items: List[Dict[str, object]] = []
+        self.truncated = False
+
+    def add(self, **location: object) -> None:
+        if len(self.items) < SCAN_MAX_LOCATIONS:
+            self.items.append(location)
+        else:
+            self.truncated = True
+
+_ENTITY = re.compile(r"&(#x[0-9a-fA-F]+|#[0-9]+|lt|gt|amp|quot|apos);")
+_NAMED = {"lt": "<", "gt": ">", "amp": "&", "quot": '"', "apos": "'"}
+
+def _unescape(s: str) -> str:
+    if "&" not in s:
+        return s
+    def sub(m):
+        ref = m.group(1)
+        if ref[0] == "#":
+            return chr(int(ref[2:], 16) if ref[1] == "x" else int(ref[1:]))
+        return _NAMED[ref]
+    return _ENTITY.sub(sub, s)
+
+def _escape(s: str) -> str:
+    return s.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+def distribute(texts: List[str], spans: List[Span]) -> List[str]:
+    """Apply spans over the concatenation of texts, keeping node boundaries.
+
+    Unmatched characters stay in the node they came from; each replacement is
+    placed in the node where its match starts, and the rest of the match is
+    removed from the following nodes. Run formatting is therefore kept for
+    everything except the matched text itself.
+    """
+    starts, pos = [], 0
+    for t in texts:
+        starts.append(pos)
+        pos += len(t)
+    out = [[] for _ in texts]
+
+    def node_of(p):
+        return bisect_right(starts, p) - 1
+
+    def emit(a, b):
+        while a < b:
+            k = node_of(a)
+            end = min(b, starts[k] + len(texts[k]))
+            out[k].append(texts[k][a - starts[k]:end - starts[k]])
+            a = end
+
+    cursor = 0
+    for s, e, repl, _ in spans:
+        emit(cursor, s)
+        out[node_of(s)].append(repl)
+        cursor = e
+    emit(cursor, pos)
+    return ["".join(parts) for parts in out]
+
+class PartRewriter:
+    """Incremental rewriter for one XML part.
+
+    Feed decoded text chunks; output is released whenever no container
+    element (a paragraph, a string item) is left open, so memory is bounded by
+    the largest container rather than the part. ``rule_counts`` holds matches
+    per rule index and ``changed`` maps the ordinal of every top-level
+    container whose text changed to the rules that changed it. With
+    ``dry_run`` nothing is rewritten and ``matched`` lists (ordinal, spans)
+    for every top-level container with a match instead.
+    """
+
+    def __init__(self, tokens: Pattern, find_spans: FindSpans, dry_run: bool = False):
+        self.tokens = tokens
+        self.find_spans = find_spans
+        self.dry_run = dry_run
+        self.matched: List[Tuple[int, List[Span]]] = []
+        self.count = 0
+        self.rule_counts: Counter = Counter()
+        self.changed: Dict[int, FrozenSet[int]] = {}
+        self._ordinal = 0
+        self._buf = ""
+        self._scan = 0
+        self._stack: List[List[tuple]] = []
+        self._fallback = 0
+        self._skip = 0
+        self._open_at: Optional[int] = None
+        self._edits: List[Tuple[int, int, str]] = []
+
+    def feed(self, data: str) -> str:
+        self._buf += data
+        for m in self.tokens.finditer(self._buf, self._scan):
+            kind = m.lastgroup
+            if kind == "open":
+                if not self._stack:
+                    self._open_at = m.start()
+                self._stack.append([])
+            elif kind == "close":
+                if self._stack:
+                    self._close(self._stack.pop())
+                    if not self._stack:
+                        self._open_at = None
+                        self._ordinal += 1
+            elif kind == "empty":
+                if not self._stack:
+                    self._ordinal += 1
+            elif kind == "text":
+                if self._stack and not self._skip:
+                    self._stack[-1].append((m.start("body"), m.end("body"), m.group("attrs") or "",
+                                            _unescape(m.group("body"))))
+            elif kind == "fb_open":
+                self._fallback += 1
+            elif kind == "fb_close":
+                self._fallback = max(0, self._fallback - 1)
+            elif kind == "skip_open":
+                self._skip += 1
+            elif kind == "skip_close":
+                self._skip = max(0, self._skip - 1)
+            self._scan = m.end()
+        return self._flush()
+
+    def close(self) -> str:
+        # Unbalanced markup: release what is left unchanged.
+        self._stack.clear()
+        self._open_at = None
+        self._scan = len(self._buf)
+        return self._flush()
+
+    def _close(self, nodes: List[tuple]) -> None:
+        if not nodes:
+            return
+        texts = [n[3] for n in nodes]
+        spans = self.find_spans("".join(texts))
+        if not spans:
+            return
+        if not self._fallback:
+            self.count += len(spans)
+            self.rule_counts.update(span[3] for span in spans)
+        if self.dry_run:
+            if not self._fallback:
+                self.matched.append((self._ordinal, spans))
+            return
+        new_texts = distribute(texts, spans)
+        if new_texts != texts and len(self._stack) == 0:
+            self.changed[self._ordinal] = frozenset(span[3] for span in spans)
+        for (body_start, body_end, attrs, old), new in zip(nodes, new_texts):
+            if new == old:
+                continue
+            if new != new.strip() and "xml:space" not in attrs:
+                # Insert right after the element name: <w:t| attrs>
+                at = body_start - 1 - len(attrs)
+                self._edits.append((at, at, ' xml:space="preserve"'))
+            self._edits.append((body_start, body_end, _escape(new)))
+
+    def _flush(self) -> str:
+        # Everything before the outermost open paragraph is final.
+        cut = self._open_at if self._stack else self._scan
+        if cut <= 0:
+            return ""
+        done = sorted(e for e in self._edits if e[0] < cut)
+        self._edits = [(s - cut, e - cut, r) for s, e, r in self._edits if s >= cut]
+        parts, pos = [], 0
+        for s, e, r in done:
+            parts.append(self._buf[pos:s])
+            parts.append(r)
+            pos = e
+        parts.append(self._buf[pos:cut])
+        self._buf = self._buf[cut:]
+        self._scan -= cut
+        if self._stack:
+            self._open_at -= cut
+            self._stack = [[(b - cut, be - cut, a, x) for b, be, a, x in frame] for frame in self._stack]
+        return "".join(parts)
+
+def _number_text(value: str) -> Optional[str]:
+    """str() of the number openpyxl would load from a <v> value, or None."""
+    try:
+        return str(int(value))
+    except ValueError:
+        pass
+    try:
+        return str(float(value))
+    except ValueError:
+        return None
+
+def _parse_number(text: str):
+    for conv in (int, float):
+        try:
+            return conv(text)
+        except ValueError:
+            pass
+    return None
+
+class SheetRewriter:
+    """Incremental cell-level rewriter for one worksheet part.
+
+    Counts cells that reference a changed shared string, and rewrites inline
+    strings and plain numbers in place. Formula cells are left untouched.
+    A numeric cell whose new text is no longer a number becomes an inline
+    string, as the openpyxl engine does. ``rule_counts`` counts, per rule,
+    the changed cells that rule contributed to. Scans pass ``locations`` to
+    collect the coordinates of matching cells, and ``shared_matches`` with
+    the number of matches in each shared string. Numbers in the cell styles
+    of ``date_styles`` are dates or times and are left untouched: openpyxl
+    loads them as datetimes, whose text is not the stored serial number.
+    """
+
+    def __init__(self, find_spans: FindSpans, changed_shared: Dict[int, FrozenSet[int]],
+                 locations: Optional[Locations] = None, sheet: str = "",
+                 shared_matches: Optional[Dict[int, int]] = None,
+                 date_styles: FrozenSet[int] = frozenset()):
+        self.find_spans = find_spans
+        self.date_styles = date_styles
+        self.changed_shared = changed_shared
+        self.locations = locations
+        self.sheet = sheet
+        self.shared_matches = shared_matches or {}
+        self.count = 0
+        self.rule_counts: Counter = Counter()
+        self.rewrites = 0
+        self._buf = ""
+
+    def feed(self, data: str) -> str:
+        self._buf += data
+        parts, pos = [], 0
+        for m in XLSX_CELL.finditer(self._buf):
+            new_cell = self._cell(m.group("attrs") or "", m.group("inner"))
+            if new_cell is not None:
+                parts.append(self._buf[pos:m.start()])
+                parts.append(new_cell)
+                pos = m.end()
+            else:
+                parts.append(self._buf[pos:m.end()])
+                pos = m.end()
+        self._buf = self._buf[pos:]
+        return "".join(parts)
+
+    def close(self) -> str:
+        out, self._buf = self._buf, ""
+        return out
+
+    def _cell(self, attrs: str, inner: Optional[str]) -> Optional[str]:
+        if not inner or "<f" in inner:
+            return None
+        t = _CELL_TYPE.search(attrs)
+        cell_type = t.group(1) if t else "n"
+        if cell_type == "s":
+            v = _CELL_VALUE.search(inner)
+            rules = self.changed_shared.get(int(v.group(1))) if v and v.group(1).strip().isdigit() else None
+            if rules:
+                self.count += 1
+                self.rule_counts.update(rules)
+                self._locate(attrs, self.shared_matches.get(int(v.group(1)), 1))
+            return None
+        if cell_type == "inlineStr":
+            simple = _SIMPLE_INLINE.fullmatch(inner)
+            if simple:
+                # One plain text node, the usual shape; no need for the run rewriter.
+                old_text = _unescape(simple.group("body"))
+                spans = self.find_spans(old_text)
+                if not spans:
+                    return None
+                new_text = distribute([old_text], spans)[0]
+                if new_text == old_text:
+                    return None
+                t_attrs = simple.group("attrs") or ""
+                if new_text != new_text.strip() and "xml:space" not in t_attrs:
+                    t_attrs += ' xml:space="preserve"'
+                return self._emit(attrs, f"<is><t{t_attrs}>{_escape(new_text)}</t></is>",
+                                  frozenset(span[3] for span in spans), len(spans))
+            if not self.find_spans(_unescape("".join(_T_BODY.findall(inner)))):
+                return None
+            rewriter = PartRewriter(XLSX_STRING_TOKENS, self.find_spans)
+            new_inner = rewriter.feed(inner) + rewriter.close()
+            if not rewriter.changed:
+                return None
+            return self._emit(attrs, new_inner, rewriter.changed[0], rewriter.count)
+        if cell_type not in ("n", "str"):
+            return None
+        if cell_type == "n" and self.date_styles:
+            style = _CELL_STYLE.search(attrs)
+            if int(style.group(1) if style else 0) in self.date_styles:
+                return None
+        v = _CELL_VALUE.search(inner)
+        if not v:
+            return None
+        raw = _unescape(v.group(1))
+        old_text = _number_text(raw) if cell_type == "n" else raw
+        if old_text is None:
+            return None
+        spans = self.find_spans(old_text)
+        if not spans:
+            return None
+        new_text = distribute([old_text], spans)[0]
+        rules = frozenset(span[3] for span in spans)
+        if cell_type == "n":
+            new_value = _parse_number(new_text)
+            if new_value is not None:
+                if new_value == _parse_number(raw):
+                    return None
+                return self._emit(attrs, inner[:v.start(1)] + new_text + inner[v.end(1):], rules, len(spans))
+            space = ' xml:space="preserve"' if new_text != new_text.strip() else ""
+            new_attrs = _CELL_TYPE.sub(' t="inlineStr"', attrs) if t else attrs + ' t="inlineStr"'
+            return self._emit(new_attrs, f"<is><t{space}>{_escape(new_text)}</t></is>", rules, len(spans))
+        if new_text == old_text:
+            return None
+        return self._emit(attrs, inner[:v.start(1)] + _escape(new_text) + inner[v.end(1):], rules, len(spans))
+
+    def _locate(self, attrs: str, matches: int) -> None:
+        if self.locations is not None:
+            ref = _CELL_REF.search(attrs)
+            self.locations.add(sheet=self.sheet, cell=ref.group(1) if ref else None, matches=matches)
+
+    def _emit(self, attrs: str, inner: str, rules: FrozenSet[int], matches: int) -> str:
+        self.count += 1
+        self.rule_counts.update(rules)
+        self.rewrites += 1
+        self._locate(attrs, matches)
+        return f"<c{attrs}>{inner}</c>"
+
+def _iter_text(zin: zipfile.ZipFile, info: zipfile.ZipInfo) -> Iterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    with zin.open(info) as f:
+        while True:
+            chunk = f.read(_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield decoder.decode(chunk)
+    yield decoder.decode(b"", final=True)
+
+def _has_match(zin: zipfile.ZipFile, info: zipfile.ZipInfo, tokens: Pattern, find_spans: FindSpans) -> bool:
+    """Dry run that stops at the first paragraph with a match."""
+    rewriter = PartRewriter(tokens, find_spans)
+    for text in _iter_text(zin, info):
+        rewriter.feed(text)
+        if rewriter.count:
+            return True
+    return False
+
+def _out_info(info: zipfile.ZipInfo) -> zipfile.ZipInfo:
+    out_info = zipfile.ZipInfo(info.filename, info.date_time)
+    out_info.compress_type = zipfile.ZIP_DEFLATED
+    out_info.external_attr = info.external_attr
+    return out_info
+
+def _rewrite_member(zin: zipfile.ZipFile, zout: zipfile.ZipFile, info: zipfile.ZipInfo, rewriter):
+    with zout.open(_out_info(info), "w") as dst:
+        for text in _iter_text(zin, info):
+            dst.write(rewriter.feed(text).encode("utf-8"))
+        dst.write(rewriter.close().encode("utf-8"))
+    return rewriter
+
+def _rewrite_sheet(zin: zipfile.ZipFile, zout: zipfile.ZipFile, info: zipfile.ZipInfo,
+                   rewriter: "SheetRewriter") -> "SheetRewriter":
+    """One pass over a worksheet; the output is kept only if a cell changed.
+
+    Most sheets merely reference shared strings and are copied raw, so the
+    rewritten XML is spooled instead of being compressed up front.
+    """
+    with tempfile.SpooledTemporaryFile(max_size=_SPOOL_SIZE) as spool:
+        for text in _iter_text(zin, info):
+            spool.write(rewriter.feed(text).encode("utf-8"))
+        spool.write(rewriter.close().encode("utf-8"))
+        if not rewriter.rewrites:
+            copy_member_raw(zin, zout, info)
+            return rewriter
+        spool.seek(0)
+        with zout.open(_out_info(info), "w") as dst:
+            shutil.copyfileobj(spool, dst, _CHUNK_SIZE)
+    return rewriter
+
+def copy_member_raw(zin: zipfile.ZipFile, zout: zipfile.ZipFile, info: zipfile.ZipInfo) -> None:
+    """Append a member to zout with its compressed bytes copied verbatim."""
+    zin.fp.seek(info.header_offset)
+    header = zin.fp.read(zipfile.sizeFileHeader)
+    if header[:4] != zipfile.stringFileHeader:
+        raise zipfile.BadZipFile(f"Bad local header for {info.filename}")
+    name_len, extra_len = struct.unpack("<HH", header[26:30])
+    zin.fp.seek(info.header_offset + zipfile.sizeFileHeader + name_len + extra_len)
+
+    out_info = zipfile.ZipInfo(info.filename, info.date_time)
+    out_info.compress_type = info.compress_type
+    out_info.external_attr = info.external_attr
+    out_info.create_system = info.create_system
+    # Sizes and CRC go in the local header, so no data descriptor follows.
+    out_info.flag_bits = info.flag_bits & ~0x08
+    out_info.CRC = info.CRC
+    out_info.compress_size = info.compress_size
+    out_info.file_size = info.file_size
+
+    zout.fp.seek(zout.start_dir)
+    out_info.header_offset = zout.fp.tell()
+    zout.fp.write(out_info.FileHeader())
+    remaining = info.compress_size
+    while remaining:
+        chunk = zin.fp.read(min(_CHUNK_SIZE, remaining))
+        if not chunk:
+            raise zipfile.BadZipFile(f"Truncated member {info.filename}")
+        zout.fp.write(chunk)
+        remaining -= len(chunk)
+    zout.start_dir = zout.fp.tell()
+    zout.filelist.append(out_info)
+    zout.NameToInfo[out_info.filename] = out_info
+    zout._didModify = True
+
+def replace_in_package(src_path: str, dst_path: str, parts: Pattern, tokens: Pattern,
+                       find_spans: FindSpans) -> Tuple[int, Counter]:
+    """Copy src to dst, rewriting text parts that match.
+
+    Returns the number of matches and the matches per rule index.
+    """
+    count, rule_counts = 0, Counter()
+    with zipfile.ZipFile(src_path) as zin, zipfile.ZipFile(dst_path, "w") as zout:
+        for info in zin.infolist():
+            if parts.match(info.filename) and _has_match(zin, info, tokens, find_spans):
+                rewriter = _rewrite_member(zin, zout, info, PartRewriter(tokens, find_spans))
+                count += rewriter.count
+                rule_counts.update(rewriter.rule_counts)
+            else:
+                copy_member_raw(zin, zout, info)
+    return count, rule_counts
+
+def replace_in_docx(src_path: str, dst_path: str, find_spans: FindSpans) -> Tuple[int, Counter]:
+    return replace_in_package(src_path, dst_path, DOCX_TEXT_PARTS, DOCX_TOKENS, find_spans)
+
+def _scan_member(zin: zipfile.ZipFile, info: zipfile.ZipInfo, rewriter):
+    """Run a rewriter over a member without writing anything."""
+    for text in _iter_text(zin, info):
+        rewriter.feed(text)
+    rewriter.close()
+    return rewriter
+
+def replace_in_xlsx(src_path: str, dst_path: str, find_spans: FindSpans) -> Tuple[int, Counter]:
+    """Rewrite shared and inline strings; returns changed cells and cells per rule.
+
+    Each distinct shared string is replaced once, but the count is taken per
+    referencing cell to match the per-cell count of the openpyxl engine.
+    Worksheets that only reference shared strings are copied raw.
+    """
+    count, rule_counts = 0, Counter()
+    with zipfile.ZipFile(src_path) as zin, zipfile.ZipFile(dst_path, "w") as zout:
+        names = set(zin.namelist())
+        changed_shared = {}
+        if XLSX_SHARED_STRINGS in names:
+            shared = zin.getinfo(XLSX_SHARED_STRINGS)
+            changed_shared = _scan_member(zin, shared, PartRewriter(XLSX_STRING_TOKENS, find_spans)).changed
+        date_styles = _date_styles(zin)
+
+        for info in zin.infolist():
+            if info.filename == XLSX_SHARED_STRINGS and changed_shared:
+                _rewrite_member(zin, zout, info, PartRewriter(XLSX_STRING_TOKENS, find_spans))
+            elif XLSX_SHEET_PARTS.match(info.filename):
+                rewriter = SheetRewriter(find_spans, changed_shared, date_styles=date_styles)
+                _rewrite_sheet(zin, zout, info, rewriter)
+                count += rewriter.count
+                rule_counts.update(rewriter.rule_counts)
+            else:
+                copy_member_raw(zin, zout, info)
+    return count, rule_counts
+
+def _date_styles(zin: zipfile.ZipFile) -> FrozenSet[int]:
+    """Indexes of the cell styles (cellXfs) whose number format is a date or time."""
+    try:
+        styles = ElementTree.fromstring(zin.read(XLSX_STYLES))
+    except (KeyError, ElementTree.ParseError):
+        return frozenset()
+    formats = dict(BUILTIN_FORMATS)
+    for fmt in styles.iter(f"{{{_SML_NS}}}numFmt"):
+        if fmt.get("numFmtId", "").isdigit():
+            formats[int(fmt.get("numFmtId"))] = fmt.get("formatCode", "")
+    cell_xfs = styles.find(f"{{{_SML_NS}}}cellXfs")
+    if cell_xfs is None:
+        return frozenset()
+    dates = set()
+    for i, xf in enumerate(cell_xfs.findall(f"{{{_SML_NS}}}xf")):
+        fmt_id = xf.get("numFmtId", "0")
+        if fmt_id.isdigit() and is_date_format(formats.get(int(fmt_id))):
+            dates.add(i)
+    return frozenset(dates)
+
+def _sheet_names(zin: zipfile.ZipFile) -> Dict[str, str]:
+    """Map worksheet part names to the sheet names shown in Excel."""
+    try:
+        workbook = ElementTree.fromstring(zin.read("xl/workbook.xml"))
+        rels = ElementTree.fromstring(zin.read("xl/_rels/workbook.xml.rels"))
+    except (KeyError, ElementTree.ParseError):
+        return {}
+    targets = {}
+    for rel in rels:
+        target = rel.get("Target", "")
+        targets[rel.get("Id")] = target.lstrip("/") if target.startswith("/") else "xl/" + target
+    names = {}
+    for sheet in workbook.iter(f"{{{_SML_NS}}}sheet"):
+        part = targets.get(sheet.get(f"{{{_REL_NS}}}id"))
+        if part:
+            names[part] = sheet.get("name")
+    return names
+
+def scan_docx(fileobj, find_spans: FindSpans) -> Tuple[int, Counter, Locations]:
+    """Count matches without rewriting; locations are (part, paragraph) pairs.
+
+    Paragraphs are numbered from 1 within each part; text in a text box is
+    reported at the paragraph that anchors it.
+    """
+    count, rule_counts, locations = 0, Counter(), Locations()
+    with zipfile.ZipFile(fileobj) as zin:
+        for info in zin.infolist():
+            if not DOCX_TEXT_PARTS.match(info.filename):
+                continue
+            scan = _scan_member(zin, info, PartRewriter(DOCX_TOKENS, find_spans, dry_run=True))
+            count += scan.count
+            rule_counts.update(scan.rule_counts)
+            for ordinal, spans in scan.matched:
+                locations.add(part=info.filename, paragraph=ordinal + 1, matches=len(spans))
+    return count, rule_counts, locations
+
+def scan_xlsx(fileobj, find_spans: FindSpans) -> Tuple[int, Counter, Locations]:
+    """Count matching cells without rewriting; locations are (sheet, cell) pairs."""
+    count, rule_counts, locations = 0, Counter(), Locations()
+    with zipfile.ZipFile(fileobj) as zin:
+        shared_rules, shared_matches = {}, {}
+        if XLSX_SHARED_STRINGS in zin.namelist():
+            scan = _scan_member(zin, zin.getinfo(XLSX_SHARED_STRINGS),
+                                PartRewriter(XLSX_STRING_TOKENS, find_spans, dry_run=True))
+            for ordinal, spans in scan.matched:
+                shared_rules[ordinal] = frozenset(span[3] for span in spans)
+                shared_matches[ordinal] = len(spans)
+        names = _sheet_names(zin)
+        date_styles = _date_styles(zin)
+        for info in zin.infolist():
+            if not XLSX_SHEET_PARTS.match(info.filename):
+                continue
+            scan = _scan_member(zin, info, SheetRewriter(
+                find_spans, shared_rules, locations, names.get(info.filename, info.filename), shared_matches,
+                date_styles))
+            count += scan.count
+            rule_counts.update(scan.rule_counts)
+    return count, rule_counts, locations
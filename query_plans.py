@@ -0,0 +1,120 @@
+"""EXPLAIN QUERY PLAN guard for the hot compare queries.
+
+Builds every hot query through compare_queries against an in-memory SQLite
+schema created from the models, and reports plans that fall back to a full
+table scan or a temp B-tree sort. tests/test_query_plans.py runs it under
+pytest; to print every plan after touching models or queries:
+
+    python -m app.query_plans
+
+It exits with status 1 when any plan regresses.
+"""
+from __future__ import annotations
+
+import sys
+from datetime import datetime
+from typing import Callable, Dict, List, Tuple
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from .db_models import Base as CompareBase, CompareDimension, CompareResult, CompareSession, MasterCircuit, MasterVersion
+from .compare_queries import records_query, jobs_query, expired_sessions_query, duplicate_session_query
+
+# name -> (builder, tables a full scan is acceptable on)
+HOT_QUERIES: Dict[str, Tuple[Callable[[Session], object], Tuple[str, ...]]] = {
+    "session_by_id": (
+        lambda db: db.query(CompareSession).filter(CompareSession.id == 1), ()),
+    "records_page": (
+        lambda db: records_query(db, 1).offset(100).limit(50), ()),
+    "records_status": (
+        lambda db: records_query(db, 1, status="Found").limit(50), ()),
+    "records_dimension_filters": (
+        lambda db: records_query(db, 1, project="p", province="x", customer="c", status="Unmatched").limit(50), ()),
+    "records_search": (
+        lambda db: records_query(db, 1, q="abc").limit(50), ()),
+    # Listing every session scans compare_sessions by design; the per-session
+    # totals must still come from index lookups.
+    "jobs_list": (
+        lambda db: jobs_query(db), ("compare_sessions",)),
+    "jobs_page": (
+        lambda db: jobs_query(db).filter(CompareSession.id < 100).limit(51), ()),
+    "duplicate_upload": (
+        lambda db: duplicate_session_query(db, "0" * 64), ()),
+    "expired_sessions": (
+        lambda db: expired_sessions_query(db, datetime(2000, 1, 1)), ()),
+    "rematch_circuits": (
+        lambda db: db.query(CompareResult.id, CompareResult.circuit_norm).filter(CompareResult.session_id == 1), ()),
+    "unmatched_circuits": (
+        lambda db: db.query(CompareResult.circuit_norm).filter(
+            CompareResult.session_id == 1, CompareResult.matched == 0).order_by(CompareResult.id), ()),
+    "active_master": (
+        lambda db: db.query(MasterVersion).filter(MasterVersion.active == True), ()),
+    "master_lookup": (
+        lambda db: db.query(MasterCircuit).filter(
+            MasterCircuit.version_id == 1, MasterCircuit.circuit_norm.in_(["1234J5678", "1234ID567"])), ()),
+    "master_keys": (
+        lambda db: db.query(MasterCircuit.circuit_norm).filter(MasterCircuit.version_id == 1), ()),
+    "delete_results_by_session": (
+        lambda db: db.query(CompareResult.id).filter(CompareResult.session_id.in_([1, 2])), ()),
+}
+
+def _seed(db: Session) -> None:
+    for kind, value in (("customer", "c"), ("project_name", "p"), ("province", "x"), ("service_type", "st")):
+        db.add(CompareDimension(kind=kind, value=value))
+    db.commit()
+
+def explain(engine: Engine, query) -> List[str]:
+    """Return the SQLite EXPLAIN QUERY PLAN detail lines for an ORM query or statement."""
+    stmt = getattr(query, "statement", query)
+    sql = str(stmt.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+    with engine.connect() as conn:
+        return [row[-1] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + sql)]
+
+def plan_problems(plan: List[str], allow_scan: Tuple[str, ...] = ()) -> List[str]:
+    problems = []
+    for line in plan:
+        if "USE TEMP B-TREE" in line:
+            problems.append(f"temp sort: {line}")
+        elif line.startswith("SCAN ") and "INDEX" not in line:
+            table = line.split()[1]
+            if table not in allow_scan:
+                problems.append(f"full scan: {line}")
+    return problems
+
+def check_query_plans(engine: Engine = None) -> Dict[str, Dict[str, List[str]]]:
+    """Explain every hot query; returns {name: {"plan": [...], "problems": [...]}}."""
+    if engine is None:
+        engine = create_engine("sqlite://")
+        CompareBase.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        try:
+            _seed(db)
+        finally:
+            db.close()
+
+    report = {}
+    db = sessionmaker(bind=engine)()
+    try:
+        for name, (build, allow_scan) in HOT_QUERIES.items():
+            plan = explain(engine, build(db))
+            report[name] = {"plan": plan, "problems": plan_problems(plan, allow_scan)}
+    finally:
+        db.close()
+    return report
+
+def main() -> int:
+    failed = 0
+    for name, info in check_query_plans().items():
+        status = "FAIL" if info["problems"] else "ok"
+        print(f"[{status}] {name}")
+        for line in info["plan"]:
+            print(f"    {line}")
+        for problem in info["problems"]:
+            print(f"    !! {problem}")
+        failed += bool(info["problems"])
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
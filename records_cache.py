@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Set, Tuple
+
+from .config import RECORDS_CACHE_MAX_MB
+
+class ResponseCache:
+    """In-process LRU of serialized responses bounded by total body size.
+
+    Keys are tuples whose first element is the job id, so every entry of a
+    job can be dropped when the job is deleted. Compare results never change
+    after a job is written; callers put the job's identity in the key and
+    check it exists before a lookup, since a delete handled by another
+    worker process does not reach this cache.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple, Tuple[bytes, str]]" = OrderedDict()
+        self._by_job: Dict[Hashable, Set[Tuple]] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def etag_for(body: bytes) -> str:
+        return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+    def get(self, key: Tuple) -> Optional[Tuple[bytes, str]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: Tuple, body: bytes) -> str:
+        etag = self.etag_for(body)
+        # A single response larger than a quarter of the budget would evict
+        # most of the cache for one job; serve it uncached instead.
+        if len(body) > self.max_bytes // 4:
+            return etag
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[0])
+            self._entries[key] = (body, etag)
+            self._by_job.setdefault(key[0], set()).add(key)
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes and self._entries:
+                old_key, (old_body, _) = self._entries.popitem(last=False)
+                self._bytes -= len(old_body)
+                self._discard_job_key(old_key)
+                self.evictions += 1
+        return etag
+
+    def _discard_job_key(self, key: Tuple) -> None:
+        keys = self._by_job.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_job[key[0]]
+
+    def invalidate_job(self, job_id: Hashable) -> None:
+        with self._lock:
+            for key in self._by_job.pop(job_id, ()):
+                entry = self._entries.pop(key, None)
+                if entry is not None:
+                    self._bytes -= len(entry[0])
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "jobs": len(self._by_job),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+records_cache = ResponseCache(RECORDS_CACHE_MAX_MB * 1024 * 1024)
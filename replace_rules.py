@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import io
+import csv
+import json
+from collections import deque
+from typing import Callable, List, Optional, Sequence, Tuple
+
+# Find/replace rule sets for the text-replace engines. Matchers return
+# (start, end, replacement, rule index) spans, non-overlapping and left to
+# right, so the engines can rewrite text and count matches per rule.
+
+Rule = Tuple[str, str]
+Span = Tuple[int, int, str, int]
+FindSpans = Callable[[str], List[Span]]
+
+MAX_RULES = 1000
+
+def single_needle(find_text: str, replace_text: str, rule: int = 0) -> FindSpans:
+    """Non-overlapping left-to-right matches of one needle, like str.replace."""
+    step = len(find_text)
+    def find_spans(text: str) -> List[Span]:
+        spans = []
+        i = text.find(find_text)
+        while i != -1:
+            spans.append((i, i + step, replace_text, rule))
+            i = text.find(find_text, i + step)
+        return spans
+    return find_spans
+
+class AhoCorasick:
+    """Multi-pattern matcher with leftmost-longest semantics.
+
+    Every pattern is found in one pass over the text; among overlapping
+    matches the one starting first wins, and the longest one among those
+    starting at the same position, so "ABC Corp" beats "ABC" where both apply.
+    """
+
+    def __init__(self, rules: Sequence[Rule]):
+        self.rules = list(rules)
+        self._goto: List[dict] = [{}]
+        self._fail: List[int] = [0]
+        # Rule spelled out exactly by each state, as (length, rule index).
+        self._out: List[Optional[Tuple[int, int]]] = [None]
+        for idx, (find_text, _) in enumerate(self.rules):
+            state = 0
+            for ch in find_text:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(None)
+                state = nxt
+            self._out[state] = (len(find_text), idx)
+        self._link_failures()
+
+    def _link_failures(self) -> None:
+        # Every state also keeps the outputs of its fail chain so a short rule
+        # ending inside a longer partial match is still seen.
+        self._all_out: List[Tuple[Tuple[int, int], ...]] = [()] * len(self._goto)
+        queue = deque()
+        for child in self._goto[0].values():
+            queue.append(child)
+            self._all_out[child] = (self._out[child],) if self._out[child] else ()
+        while queue:
+            state = queue.popleft()
+            for ch, child in self._goto[state].items():
+                f = self._fail[state]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[child] = self._goto[f].get(ch, 0)
+                own = (self._out[child],) if self._out[child] else ()
+                self._all_out[child] = own + self._all_out[self._fail[child]]
+                queue.append(child)
+
+    def find_spans(self, text: str) -> List[Span]:
+        goto, fail, all_out = self._goto, self._fail, self._all_out
+        longest = {}
+        state = 0
+        for pos, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for length, idx in all_out[state]:
+                start = pos - length + 1
+                best = longest.get(start)
+                if best is None or length > best[0]:
+                    longest[start] = (length, idx)
+        spans = []
+        end = 0
+        for start in sorted(longest):
+            if start < end:
+                continue
+            length, idx = longest[start]
+            spans.append((start, start + length, self.rules[idx][1], idx))
+            end = start + length
+        return spans
+
+def compile_rules(rules: Sequence[Rule]) -> FindSpans:
+    if len(rules) == 1:
+        return single_needle(rules[0][0], rules[0][1])
+    return AhoCorasick(rules).find_spans
+
+def _check_rules(rules: List[Rule], require_replace: bool = True) -> List[Rule]:
+    if not rules:
+        raise ValueError("No replacement rules provided")
+    if len(rules) > MAX_RULES:
+        raise ValueError(f"Maximum {MAX_RULES} replacement rules allowed")
+    seen = set()
+    for i, (find_text, replace_text) in enumerate(rules, 1):
+        if not find_text.strip():
+            raise ValueError(f"Rule {i}: find text cannot be empty")
+        if require_replace and not replace_text.strip():
+            raise ValueError(f"Rule {i}: find and replace text cannot be empty")
+        if find_text in seen:
+            raise ValueError(f"Rule {i}: duplicate find text '{find_text}'")
+        seen.add(find_text)
+    return rules
+
+def parse_rules_json(raw: str, require_replace: bool = True) -> List[Rule]:
+    """Rules from JSON: [{"find": ..., "replace": ...}] or [[find, replace], ...].
+
+    Without require_replace (scans) a bare list of find strings is accepted too.
+    """
+    try:
+        data = json.loads(raw)
+    except ValueError as e:
+        raise ValueError(f"Invalid rules JSON: {e}")
+    if not isinstance(data, list):
+        raise ValueError("Rules must be a JSON list")
+    rules = []
+    for i, item in enumerate(data, 1):
+        if isinstance(item, str) and not require_replace:
+            pair = (item, "")
+        elif isinstance(item, dict):
+            pair = (item.get("find"), item.get("replace", "" if not require_replace else None))
+        elif isinstance(item, (list, tuple)) and len(item) == 2:
+            pair = tuple(item)
+        else:
+            raise ValueError(f"Rule {i}: expected {{'find', 'replace'}} or a [find, replace] pair")
+        if not all(isinstance(v, str) for v in pair):
+            raise ValueError(f"Rule {i}: find and replace must be strings")
+        rules.append(pair)
+    return _check_rules(rules, require_replace)
+
+def parse_rules_csv(content: bytes, require_replace: bool = True) -> List[Rule]:
+    """Rules from a two-column CSV (find, replace); a find,replace header row is skipped.
+
+    Without require_replace (scans) the replace column may be left out.
+    """
+    for encoding in ("utf-8-sig", "cp874"):
+        try:
+            text = content.decode(encoding)
+            break
+        except UnicodeDecodeError:
+            continue
+    else:
+        raise ValueError("Rules CSV must be UTF-8 or TIS-620 encoded")
+    rules = []
+    for i, row in enumerate(csv.reader(io.StringIO(text)), 1):
+        if not row or not any(cell.strip() for cell in row):
+            continue
+        if len(row) < 2 and require_replace:
+            raise ValueError(f"Rules CSV line {i}: expected find,replace")
+        if i == 1 and [c.strip().lower() for c in row[:2]] in (["find", "replace"], ["find"]):
+            continue
+        rules.append((row[0], row[1] if len(row) > 1 else ""))
+    return _check_rules(rules, require_replace)
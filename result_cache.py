@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import os
+import json
+import time
+import uuid
+import hashlib
+import logging
+import shutil
+from typing import List, Optional, Sequence, Tuple
+
+try:
+    from .config import TEXT_REPLACE_CACHE_DIR, TEXT_REPLACE_CACHE_MAX_MB
+except Exception:
+    from config import TEXT_REPLACE_CACHE_DIR, TEXT_REPLACE_CACHE_MAX_MB
+
+# Cache of rewritten text-replace outputs. An entry is one file holding a
+# JSON header line with the replacement counts followed by the output
+# document, so it appears and disappears atomically. Hits refresh the mtime
+# and pruning drops the oldest entries first, which makes the store an LRU
+# bounded by TEXT_REPLACE_CACHE_MAX_MB. Used from the process-pool workers.
+
+_CHUNK_SIZE = 1024 * 1024
+_MAX_BYTES = TEXT_REPLACE_CACHE_MAX_MB * 1024 * 1024
+
+_written = 0
+
+def cache_key(file_path: str, rules: Sequence[Tuple[str, str]], engine: str) -> Optional[str]:
+    """SHA-256 over engine version, rules and input bytes; None when caching is off."""
+    if _MAX_BYTES <= 0:
+        return None
+    h = hashlib.sha256()
+    h.update(json.dumps([engine, [list(r) for r in rules]], ensure_ascii=False).encode("utf-8"))
+    h.update(b"\n")
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _entry_path(key: str) -> str:
+    return os.path.join(TEXT_REPLACE_CACHE_DIR, key[:2], f"{key}.entry")
+
+def fetch(key: Optional[str], file_path: str) -> Optional[Tuple[int, List[int]]]:
+    """Overwrite file_path with the cached output; returns (total, rule counts) or None on a miss."""
+    if key is None:
+        return None
+    path = _entry_path(key)
+    tmp_path = f"{file_path}.cached"
+    try:
+        with open(path, "rb") as src:
+            header = json.loads(src.readline())
+            with open(tmp_path, "wb") as dst:
+                shutil.copyfileobj(src, dst, _CHUNK_SIZE)
+        os.replace(tmp_path, file_path)
+        os.utime(path)
+        return header["total"], header["rule_counts"]
+    except (OSError, ValueError, KeyError):
+        # Missing, evicted mid-read or corrupt: a miss either way.
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return None
+
+def put(key: Optional[str], file_path: str, total: int, rule_counts: List[int]) -> None:
+    global _written
+    if key is None:
+        return
+    path = _entry_path(key)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp_path, "wb") as dst:
+            dst.write(json.dumps({"total": total, "rule_counts": rule_counts}).encode("utf-8") + b"\n")
+            with open(file_path, "rb") as src:
+                shutil.copyfileobj(src, dst, _CHUNK_SIZE)
+        _written += os.path.getsize(tmp_path)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logging.warning(f"Failed to cache text-replace output: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return
+    # Each worker prunes after writing a tenth of the budget, so the store
+    # overshoots by at most that much per worker between prunes.
+    if _written >= _MAX_BYTES // 10:
+        _written = 0
+        prune()
+
+def prune(max_bytes: int = _MAX_BYTES) -> int:
+    """Delete least recently used entries until the cache fits in max_bytes (90% after pruning)."""
+    entries = []
+    total = 0
+    try:
+        buckets = [e for e in os.scandir(TEXT_REPLACE_CACHE_DIR) if e.is_dir()]
+    except FileNotFoundError:
+        return 0
+    now = time.time()
+    for bucket in buckets:
+        for entry in os.scandir(bucket.path):
+            try:
+                st = entry.stat()
+            except FileNotFoundError:
+                continue
+            if entry.name.endswith(".tmp"):
+                # Left behind by a crashed worker.
+                if now - st.st_mtime > 3600:
+                    try:
+                        os.unlink(entry.path)
+                    except FileNotFoundError:
+                        pass
+                continue
+            entries.append((st.st_mtime, st.st_size, entry.path))
+            total += st.st_size
+    if total <= max_bytes:
+        return 0
+    removed = 0
+    target = max_bytes * 9 // 10
+    for _, size, path in sorted(entries):
+        if total <= target:
+            break
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+    return removed
+
+def stats() -> dict:
+    entries = 0
+    size = 0
+    try:
+        for bucket in os.scandir(TEXT_REPLACE_CACHE_DIR):
+            if bucket.is_dir():
+                for entry in os.scandir(bucket.path):
+                    if entry.name.endswith(".entry"):
+                        entries += 1
+                        size += entry.stat().st_size
+    except FileNotFoundError:
+        pass
+    return {"entries": entries, "bytes": size, "max_bytes": _MAX_BYTES}
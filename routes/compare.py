@@ -2,31 +2,43 @@ from __future__ import annotations
 
 import os
 import re
+import json
+import asyncio
+import time
 import sys
+import hashlib
 import importlib.util
 import logging
 from pathlib import Path
+from types import SimpleNamespace
 from tempfile import NamedTemporaryFile
-from typing import List, Optional
+from typing import List, NamedTuple, Optional
 from datetime import timezone
 
 import pandas as pd
 from datetime import datetime, timedelta
 from fastapi import APIRouter, UploadFile, File, HTTPException, Query, Header, Body, Request
-from fastapi.responses import FileResponse
-from sqlalchemy import create_engine, text
+from fastapi.responses import FileResponse, JSONResponse, Response
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError, OperationalError
 from openpyxl import load_workbook
 
 from ..database import SessionLocal
-from ..db_models import CompareSession, CompareResult
-from ..config import ADMIN_TOKEN, DATABASE_URL, MASTER_EXCEL_PATH, SHEET_NAME, JOB_RETENTION_DAYS
+from ..db_models import CompareSession, CompareResult, MasterVersion
+from ..dimensions import decode_rows
+from ..compare_queries import records_query, jobs_query, expired_sessions_query, duplicate_session_query
+from ..records_cache import records_cache
+from ..job_events import jobs_version, job_changed, publish_event
+from ..master_store import active_version, activate_version, previous_version, version_info
+from ..uploads import StagedUpload, save_upload_temp, UploadTooLarge, is_spreadsheet, looks_like_csv
+from ..config import ADMIN_TOKEN, MASTER_EXCEL_PATH, SHEET_NAME, JOB_RETENTION_DAYS, JOB_CLEANUP_INTERVAL_SECONDS
+from ..config import SUGGEST_MAX_DISTANCE
 try:
-    from ..test_compare_insert_full_6 import run_test_compare
+    from ..test_compare_insert_full_6 import run_test_compare, run_rematch, import_master_file, suggest_circuits
 except Exception:
     try:
-        from test_compare_insert_full_6 import run_test_compare
+        from test_compare_insert_full_6 import run_test_compare, run_rematch, import_master_file, suggest_circuits
     except Exception:
         def _load_from_file(p: Path):
             if not p.is_file():
@@ -51,7 +63,7 @@ except Exception:
             
             if not hasattr(mod, "run_test_compare"):
                 raise ImportError("run_test_compare function not found in module")
-            return getattr(mod, "run_test_compare")
+            return mod
 
         loaded = None
         if True:
@@ -71,20 +83,79 @@ except Exception:
                     "run_test_compare not found. "
                     "Place test_compare_insert_full_6.py in project root or scripts folder."
                 )
-        run_test_compare = loaded
+        run_test_compare = loaded.run_test_compare
+        run_rematch = loaded.run_rematch
+        import_master_file = loaded.import_master_file
+        suggest_circuits = loaded.suggest_circuits
 
 router = APIRouter()
 
+_last_cleanup = 0.0
+_master_version_memo: dict = {}
+
+def _master_version(path: str) -> str:
+    """SHA-256 of a master workbook, rehashed only when its size or mtime changes"""
+    st = os.stat(path)
+    key = (path, st.st_size, st.st_mtime_ns)
+    version = _master_version_memo.get(key)
+    if version is None:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(chunk)
+        version = h.hexdigest()
+        _master_version_memo.clear()
+        _master_version_memo[key] = version
+    return version
+
+def _find_duplicate_job(content_hash: str) -> Optional[dict]:
+    db: Session = SessionLocal()
+    try:
+        row = duplicate_session_query(db, content_hash).first()
+        if row is None:
+            return None
+        if row.upload_matched is not None:
+            matched, unmatched = row.upload_matched, row.upload_unmatched or 0
+        else:
+            # Stored before the upload totals were kept: only distinct circuits are known.
+            matched = row.matched_total or 0
+            unmatched = (row.total_records or 0) - matched
+        res = {
+            "job_id": row.id,
+            "matched_total": matched,
+            "unmatched_total": unmatched,
+            "total_records": matched + unmatched,
+            "master_version_id": row.master_version_id,
+            "deduplicated": True,
+        }
+        if row.upload_matched is None:
+            res["distinct"] = True
+        return res
+    finally:
+        db.close()
+
+def _maybe_cleanup_old_jobs():
+    """Run _cleanup_old_jobs at most once per JOB_CLEANUP_INTERVAL_SECONDS"""
+    global _last_cleanup
+    now = time.monotonic()
+    if _last_cleanup and now - _last_cleanup < JOB_CLEANUP_INTERVAL_SECONDS:
+        return
+    _last_cleanup = now
+    _cleanup_old_jobs()
+
+def _not_modified(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    return if_none_match.strip() == "*" or etag in [t.strip() for t in if_none_match.split(",")]
+
 def _cleanup_old_jobs():
     """Auto cleanup jobs older than JOB_RETENTION_DAYS (except pinned)"""
     try:
         db = SessionLocal()
         try:
             cutoff_date = datetime.now() - timedelta(days=JOB_RETENTION_DAYS)
-            old_sessions = db.query(CompareSession).filter(
-                CompareSession.created_at < cutoff_date,
-                CompareSession.pinned != True
-            ).all()
+            old_sessions = expired_sessions_query(db, cutoff_date).all()
+            old_ids = [session.id for session in old_sessions]
             
             deleted_count = 0
             for session in old_sessions:
@@ -97,6 +168,9 @@ def _cleanup_old_jobs():
             
             if deleted_count > 0:
                 db.commit()
+                for job_id in old_ids:
+                    records_cache.invalidate_job(job_id)
+                job_changed("job-deleted", {"job_ids": old_ids, "reason": "retention"})
                 print(f"Auto-cleaned {deleted_count} old jobs (older than {JOB_RETENTION_DAYS} days)")
         finally:
             db.close()
@@ -169,11 +243,86 @@ def admin_debug(
         "match": bool(ADMIN_TOKEN) and (hmac.compare_digest(client_token, ADMIN_TOKEN) if client_token else False),
     }
 
+def check_compare_file(suffix: str, staged: StagedUpload) -> None:
+    """Validate a staged compare file from its size and first bytes"""
+    if staged.size == 0:
+        raise HTTPException(status_code=400, detail="Empty file not allowed")
+    if staged.size < 4:
+        raise HTTPException(status_code=400, detail="Invalid file format")
+    
+    csv_signature = suffix.lower() == '.csv' and looks_like_csv(staged.head)
+    if not (is_spreadsheet(staged.head) or csv_signature):
+        if suffix.lower() == '.csv':
+            logging.warning("CSV validation failed on the file prefix")
+        raise HTTPException(status_code=400, detail="Invalid file format")
+
+def check_master_file(staged: StagedUpload) -> None:
+    if staged.size == 0:
+        raise HTTPException(status_code=400, detail="Empty master file not allowed")
+    if not is_spreadsheet(staged.head):
+        raise HTTPException(status_code=400, detail="Invalid master file format")
+
+def default_master_path() -> str:
+    """The configured master workbook, confined to the allowed directories"""
+    if not MASTER_EXCEL_PATH:
+        raise HTTPException(status_code=500, detail="Master file not configured")
+    
+    master_path = Path(MASTER_EXCEL_PATH).resolve()
+    allowed_base_dirs = [
+        Path(__file__).resolve().parent.parent.parent,
+        Path('/opt/compare-system').resolve()
+    ]
+    
+    if not any(str(master_path).startswith(str(base_dir)) for base_dir in allowed_base_dirs):
+        raise HTTPException(status_code=500, detail="Master file path not allowed")
+    
+    if not master_path.exists():
+        raise HTTPException(status_code=500, detail="Master file not found")
+    return str(master_path)
+
+class MasterSource(NamedTuple):
+    path: Optional[str]  # workbook to read; None for an imported version
+    version: str  # SHA-256 of the workbook, part of the upload dedup hash
+    version_id: Optional[int] = None
+
+def current_master() -> MasterSource:
+    """The active imported master version, or else the configured workbook"""
+    db: Session = SessionLocal()
+    try:
+        version = active_version(db)
+    finally:
+        db.close()
+    if version is not None:
+        return MasterSource(None, version.sha256, version.id)
+    path = default_master_path()
+    return MasterSource(path, _master_version(path))
+
+def run_staged_compare(cf_path: str, compare_sha256: str, master: MasterSource, force: bool) -> dict:
+    """Return the existing job for an identical upload, or run the compare into a new job."""
+    content_hash = hashlib.sha256(f"{master.version}:{compare_sha256}".encode()).hexdigest()
+    if not force:
+        existing = _find_duplicate_job(content_hash)
+        if existing is not None:
+            return existing
+
+    res = run_test_compare(master_path=master.path, compare_path=cf_path, content_hash=content_hash,
+                           master_version_id=master.version_id, master_sha256=master.version)
+    res["deduplicated"] = False
+    job_changed("job-created", res)
+    return res
+
 @router.post("/compare-upload")
 async def compare_upload(
     compare_file: UploadFile = File(...),
     master_file: UploadFile | None = File(None),
+    force: bool = Query(default=False),
 ):
+    """Compare a workbook against the master and store the results as a job.
+    
+    An upload identical to an existing job (same compare file bytes and same
+    master version) returns that job with ``deduplicated: true`` instead of
+    recomputing it; ``force=true`` always creates a new job.
+    """
     try:
         cmp_suffix = os.path.splitext(compare_file.filename or "")[1] or ".xlsx"
         cf_path = None
@@ -213,43 +362,13 @@ async def compare_upload(
                 if compare_file.content_type not in allowed_mime_types:
                     raise HTTPException(status_code=400, detail="Invalid MIME type")
             
-            content = await compare_file.read()
-            if len(content) > 50 * 1024 * 1024:
-                raise HTTPException(status_code=413, detail="File too large")
-            
-            if len(content) < 4:
-                raise HTTPException(status_code=400, detail="Invalid file format")
-            
-            xlsx_signature = content[:4] == b'PK\x03\x04'
-            xls_signature = len(content) >= 8 and content[:8] == b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
-            
-            csv_signature = False
-            if cmp_suffix.lower() == '.csv':
-                try:
-                    import io
-                    with io.BytesIO(content) as csv_buffer:
-                        test_df = pd.read_csv(csv_buffer, nrows=1)
-                        csv_signature = True
-                except (pd.errors.EmptyDataError, pd.errors.ParserError, UnicodeDecodeError, ValueError) as e:
-                    logging.warning(f"CSV validation failed: {e}")
-                    csv_signature = False
-                except Exception as e:
-                    logging.exception(f"Unexpected error during CSV validation: {e}")
-                    csv_signature = False
-            
-            if not (xlsx_signature or xls_signature or csv_signature):
-                raise HTTPException(status_code=400, detail="Invalid file format")
-            
-            await compare_file.seek(0)
-            
-            if not content:
-                raise HTTPException(status_code=400, detail="Empty file not allowed")
-            
             safe_suffix = cmp_suffix if cmp_suffix in allowed_extensions else '.xlsx'
-            with NamedTemporaryFile(delete=False, suffix=safe_suffix, prefix='compare_') as tfc:
-                cf_path = tfc.name
-                tfc.write(content)
-                tfc.flush()
+            try:
+                staged = await save_upload_temp(compare_file, 50 * 1024 * 1024, suffix=safe_suffix, prefix='compare_')
+            except UploadTooLarge:
+                raise HTTPException(status_code=413, detail="File too large")
+            cf_path = staged.path
+            check_compare_file(cmp_suffix, staged)
 
             if master_file is not None:
                 master_suffix = os.path.splitext(master_file.filename or "")[1]
@@ -281,82 +400,65 @@ async def compare_upload(
                     if master_file.content_type not in master_allowed_mime:
                         raise HTTPException(status_code=400, detail="Invalid master file MIME type")
                 
-                master_content = await master_file.read()
-                if len(master_content) > 50 * 1024 * 1024:
-                    raise HTTPException(status_code=413, detail="Master file too large")
-                
-                if not master_content:
-                    raise HTTPException(status_code=400, detail="Empty master file not allowed")
-                
-                if len(master_content) >= 4:
-                    master_xlsx_sig = master_content[:4] == b'PK\x03\x04'
-                    master_xls_sig = len(master_content) >= 8 and master_content[:8] == b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
-                    if not (master_xlsx_sig or master_xls_sig):
-                        raise HTTPException(status_code=400, detail="Invalid master file format")
-                else:
-                    raise HTTPException(status_code=400, detail="Invalid master file format")
-                    
                 safe_master_suffix = master_suffix if master_suffix.lower() in {'.xlsx', '.xls'} else '.xlsx'
-                with NamedTemporaryFile(delete=False, suffix=safe_master_suffix, prefix='master_') as tfm:
-                    mf_path = tfm.name
-                    tfm.write(master_content)
-                    tfm.flush()
+                try:
+                    master_staged = await save_upload_temp(master_file, 50 * 1024 * 1024,
+                                                           suffix=safe_master_suffix, prefix='master_')
+                except UploadTooLarge:
+                    raise HTTPException(status_code=413, detail="Master file too large")
+                mf_path = master_staged.path
+                check_master_file(master_staged)
+                master = MasterSource(mf_path, master_staged.sha256)
             else:
-                if not MASTER_EXCEL_PATH:
-                    raise HTTPException(status_code=500, detail="Master file not configured")
-                
-                master_path = Path(MASTER_EXCEL_PATH).resolve()
-                allowed_base_dirs = [
-                    Path(__file__).resolve().parent.parent.parent,
-                    Path('/opt/compare-system').resolve()
-                ]
-                
-                if not any(str(master_path).startswith(str(base_dir)) for base_dir in allowed_base_dirs):
-                    raise HTTPException(status_code=500, detail="Master file path not allowed")
-                
-                if not master_path.exists():
-                    raise HTTPException(status_code=500, detail="Master file not found")
-                    
-                mf_path = str(master_path)
-
-            res = run_test_compare(master_path=mf_path, compare_path=cf_path)
-            return res
+                master = current_master()
+            
+            return run_staged_compare(cf_path, staged.sha256, master, force)
         finally:
             if cf_path and os.path.exists(cf_path):
                 try:
                     os.unlink(cf_path)
                 except (OSError, IOError) as e:
                     logging.warning(f"Failed to cleanup temp file {cf_path}: {e}")
-            if mf_path and mf_path != MASTER_EXCEL_PATH and os.path.exists(mf_path):
+            if mf_path and master_file is not None and os.path.exists(mf_path):
                 try:
                     os.unlink(mf_path)
                 except (OSError, IOError) as e:
                     logging.warning(f"Failed to cleanup temp file {mf_path}: {e}")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _jobs_etag(*parts) -> str:
+    return 'W/"jobs-' + "-".join([jobs_version()] + [str(p) for p in parts]) + '"'
+
 @router.get("/jobs")
-def list_jobs():
-    _cleanup_old_jobs()
+def list_jobs(
+    limit: Optional[int] = Query(default=None, ge=1, le=1000),
+    cursor: Optional[int] = Query(default=None, ge=1),
+    if_none_match: Optional[str] = Header(None),
+):
+    """Jobs newest first. With ``limit``, returns one page and the next page's
+    cursor in the X-Next-Cursor header (absent on the last page)."""
+    _maybe_cleanup_old_jobs()
+
+    etag = _jobs_etag(limit or "", cursor or "")
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if _not_modified(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
     
     db: Session = SessionLocal()
     try:
-        from sqlalchemy import func
-        
-        from sqlalchemy import case
-        
-        sessions_with_counts = db.query(
-            CompareSession.id,
-            CompareSession.created_at,
-            CompareSession.pinned,
-            func.count(CompareResult.id).label('total_records'),
-            func.sum(case((CompareResult.matched == 1, 1), else_=0)).label('matched_total')
-        ).outerjoin(
-            CompareResult, CompareSession.id == CompareResult.session_id
-        ).group_by(
-            CompareSession.id, CompareSession.created_at, CompareSession.pinned
-        ).order_by(CompareSession.id.desc()).all()
+        query = jobs_query(db)
+        if cursor:
+            query = query.filter(CompareSession.id < cursor)
+        if limit:
+            query = query.limit(limit + 1)
+        sessions_with_counts = query.all()
+        if limit and len(sessions_with_counts) > limit:
+            sessions_with_counts = sessions_with_counts[:limit]
+            headers["X-Next-Cursor"] = str(sessions_with_counts[-1].id)
         
         out = []
         for s in sessions_with_counts:
@@ -376,11 +478,29 @@ def list_jobs():
                 "job_id": s.id,
                 "created_at": created_iso,
                 "pinned": bool(s.pinned),
+                "master_version_id": s.master_version_id,
+                "source_job_id": s.source_job_id,
                 "total_records": total,
                 "matched_total": matched,
                 "unmatched_total": total - matched,
             })
-        return out
+        return JSONResponse(content=out, headers=headers)
+    finally:
+        db.close()
+
+@router.get("/jobs/count")
+def count_jobs(if_none_match: Optional[str] = Header(None)):
+    _maybe_cleanup_old_jobs()
+
+    etag = _jobs_etag("count")
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if _not_modified(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    db: Session = SessionLocal()
+    try:
+        count = db.query(func.count(CompareSession.id)).scalar() or 0
+        return JSONResponse(content={"count": int(count)}, headers=headers)
     finally:
         db.close()
 
@@ -395,52 +515,89 @@ def get_records(
     q: str = Query(default=""),
     page: int = Query(default=1, ge=1),
     page_size: int = Query(default=10000, ge=10, le=50000),
+    suggest: int = Query(default=0, ge=0, le=10),
+    max_distance: int = Query(default=1, ge=1, le=2),
+    if_none_match: Optional[str] = Header(None),
 ):
+    """One page of a job's records.
+
+    With suggest > 0 every unmatched record also carries "suggestions": up
+    to that many codes of the current master within max_distance edits.
+    """
     if job_id <= 0:
         raise HTTPException(status_code=400, detail="Invalid job ID")
-    
+
+    master = None
+    if suggest:
+        _check_suggest_distance(max_distance)
+        master = current_master()
+    # Suggestions depend on the master as well as the job.
+    suggest_key = (suggest, max_distance, master.version) if master else None
+
     db: Session = SessionLocal()
     try:
-        session_exists = db.query(CompareSession).filter(CompareSession.id == job_id).first()
-        if not session_exists:
-            raise HTTPException(status_code=404, detail="Job not found")
-        
-        query = db.query(CompareResult).filter(CompareResult.session_id == job_id)
-        if project: query = query.filter(CompareResult.project_name == project)
-        if province: query = query.filter(CompareResult.province == province)
-        if customer: query = query.filter(CompareResult.customer == customer)
-        if status:
-            if status == "Found": query = query.filter(CompareResult.matched == 1)
-            elif status == "Unmatched": query = query.filter(CompareResult.matched == 0)
-        if q:
-            safe_q = q.replace('%', '\%').replace('_', '\_')[:100]
-            like_pattern = f"%{safe_q}%"
-            query = query.filter(
-                (CompareResult.customer.ilike(like_pattern)) |
-                (CompareResult.project_name.ilike(like_pattern)) |
-                (CompareResult.province.ilike(like_pattern)) |
-                (CompareResult.service_type.ilike(like_pattern)) |
-                (CompareResult.circuit_norm.ilike(like_pattern)) |
-                (CompareResult.circuit_raw.ilike(like_pattern))
-            )
-        offset = (page - 1) * page_size
-        results = query.order_by(CompareResult.matched.desc(), CompareResult.id).offset(offset).limit(page_size).all()
-        return [
-            {
-                "id": r.id,
-                "customer": r.customer,
-                "project": r.project_name,
-                "province": r.province,
-                "branch": r.branch,
-                "sla": r.sla,
-                "service_category": r.service_category,
-                "circuit_norm": r.circuit_norm,
-                "status": "Found" if r.matched else "Unmatched",
-            }
-            for r in results
-        ]
+        # Checked on every request: the cache is per worker, and a job deleted
+        # through another worker, or a new job reusing its id, must not be
+        # served from it. The identity columns tell a reused id apart.
+        identity = db.query(CompareSession.created_at, CompareSession.filename, CompareSession.content_hash) \
+            .filter(CompareSession.id == job_id).first()
     finally:
         db.close()
+    if identity is None:
+        records_cache.invalidate_job(job_id)
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    cache_key = (job_id, tuple(identity), project, province, customer, status, q, page, page_size, suggest_key)
+    cached = records_cache.get(cache_key)
+    if cached is not None:
+        body, etag = cached
+    else:
+        db = SessionLocal()
+        try:
+            query = records_query(db, job_id, project, province, customer, status, q)
+            records = []
+            if query is not None:
+                offset = (page - 1) * page_size
+                results = query.offset(offset).limit(page_size).all()
+                values = decode_rows(db, results)
+                records = [
+                    {
+                        "id": r.id,
+                        "customer": v["customer"],
+                        "project": v["project_name"],
+                        "province": v["province"],
+                        "branch": v["branch"],
+                        "sla": v["sla"],
+                        "service_category": v["service_category"],
+                        "circuit_norm": r.circuit_norm,
+                        "status": "Found" if r.matched else "Unmatched",
+                    }
+                    for r, v in zip(results, values)
+                ]
+        finally:
+            db.close()
+        if master is not None:
+            unmatched = [r for r in records if r["status"] == "Unmatched"]
+            near = _suggestions(master, [r["circuit_norm"] for r in unmatched], suggest, max_distance)
+            for r in unmatched:
+                r["suggestions"] = near[r["circuit_norm"]]
+        body = json.dumps(records, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        etag = records_cache.put(cache_key, body)
+
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if _not_modified(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@router.get("/admin/cache-stats")
+def records_cache_stats(
+    x_admin_token: Optional[str] = Header(None, convert_underscores=False),
+    x_admin_token_alt: Optional[str] = Header(None, alias="X_Admin_Token"),
+    authorization: Optional[str] = Header(None),
+):
+    """Hit rate and memory use of the records response cache (admin only)"""
+    _require_admin(x_admin_token, x_admin_token_alt, authorization, None)
+    return records_cache.stats()
 
 @router.post("/jobs/{job_id}/pin")
 def pin_job(job_id: int, payload: dict = Body(...)):
@@ -456,10 +613,188 @@ def pin_job(job_id: int, payload: dict = Body(...)):
         except Exception as e:
             db.rollback()
             raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+        job_changed("job-pinned", {"job_id": job_id, "pinned": pinned})
         return {"ok": True, "job_id": job_id, "pinned": s.pinned}
     finally:
         db.close()
 
+def _check_suggest_distance(max_distance: int) -> None:
+    if max_distance > SUGGEST_MAX_DISTANCE:
+        raise HTTPException(status_code=400, detail=f"max_distance is limited to {SUGGEST_MAX_DISTANCE}")
+
+def _suggestions(master: MasterSource, codes: List[str], limit: int, max_distance: int) -> dict:
+    try:
+        return suggest_circuits(codes, master.path, master.version_id, master.version, limit, max_distance)
+    except Exception as e:
+        logging.exception(f"Suggestions against master {master.version} failed: {e}")
+        raise HTTPException(status_code=500, detail="Processing failed")
+
+@router.get("/jobs/{job_id}/suggestions")
+def job_suggestions(
+    job_id: int,
+    limit: int = Query(default=3, ge=1, le=10),
+    max_distance: int = Query(default=1, ge=1, le=2),
+):
+    """Near-miss master codes for every unmatched circuit of a job.
+
+    Candidates come from the current master's deletion index, nearest
+    first; an adjacent swap counts as one edit like a wrong character.
+    """
+    _check_suggest_distance(max_distance)
+    db: Session = SessionLocal()
+    try:
+        if not db.query(CompareSession.id).filter(CompareSession.id == job_id).first():
+            raise HTTPException(status_code=404, detail="Job not found")
+        rows = db.query(CompareResult.circuit_norm).filter(
+            CompareResult.session_id == job_id, CompareResult.matched == 0
+        ).order_by(CompareResult.id).all()
+    finally:
+        db.close()
+    master = current_master()
+    near = _suggestions(master, [code for (code,) in rows], limit, max_distance)
+    return {
+        "job_id": job_id,
+        "master_version_id": master.version_id,
+        "max_distance": max_distance,
+        "unmatched_total": len(near),
+        "suggested_total": sum(1 for v in near.values() if v),
+        "suggestions": [{"circuit_norm": code, "suggestions": v} for code, v in near.items()],
+    }
+
+def _rematch(job_ids: List[int]) -> dict:
+    try:
+        master = current_master()
+        created = run_rematch(job_ids, master.path, master.version_id, master.version)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.exception(f"Rematch of jobs {job_ids} failed: {e}")
+        raise HTTPException(status_code=500, detail="Processing failed")
+    for res in created.values():
+        job_changed("job-created", res)
+    return created
+
+@router.post("/jobs/{job_id}/rematch")
+def rematch_job(job_id: int):
+    """Match a job's stored circuits against the current master into a new job.
+
+    The original upload is not needed and the source job is left unchanged.
+    The new job records source_job_id, and its totals count distinct circuits.
+    """
+    created = _rematch([job_id])
+    if job_id not in created:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return created[job_id]
+
+@router.post("/admin/jobs/rematch")
+def bulk_rematch_jobs(
+    job_ids: List[int] = Body(..., embed=True),
+    x_admin_token: Optional[str] = Header(None, convert_underscores=False),
+    x_admin_token_alt: Optional[str] = Header(None, alias="X_Admin_Token"),
+    authorization: Optional[str] = Header(None),
+):
+    """Rematch several jobs, reading the master once"""
+    _require_admin(x_admin_token, x_admin_token_alt, authorization, None)
+    job_ids = list(dict.fromkeys(job_ids))
+    created = _rematch(job_ids)
+    return {
+        "ok": True,
+        "rematched": [created[jid] for jid in job_ids if jid in created],
+        "skipped": [{"job_id": jid, "reason": "not_found"} for jid in job_ids if jid not in created],
+    }
+
+@router.post("/admin/master/import")
+async def import_master(
+    master_file: UploadFile | None = File(None),
+    x_admin_token: Optional[str] = Header(None, convert_underscores=False),
+    x_admin_token_alt: Optional[str] = Header(None, alias="X_Admin_Token"),
+    authorization: Optional[str] = Header(None),
+):
+    """Load a master workbook (the upload, or MASTER_EXCEL_PATH) into the
+    database as a new version and make it active. Compare runs then look
+    circuits up in that version instead of reading the workbook."""
+    _require_admin(x_admin_token, x_admin_token_alt, authorization, None)
+
+    staged = None
+    try:
+        if master_file is not None:
+            if os.path.splitext(master_file.filename or "")[1].lower() != ".xlsx":
+                raise HTTPException(status_code=400, detail="Invalid master file type")
+            try:
+                staged = await save_upload_temp(master_file, 50 * 1024 * 1024, suffix=".xlsx", prefix="master_")
+            except UploadTooLarge:
+                raise HTTPException(status_code=413, detail="Master file too large")
+            check_master_file(staged)
+            path, filename, sha256 = staged.path, os.path.basename(master_file.filename), staged.sha256
+        else:
+            path = default_master_path()
+            filename, sha256 = os.path.basename(path), _master_version(path)
+        try:
+            info = await asyncio.to_thread(import_master_file, path, filename, sha256)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            logging.exception(f"Master import failed: {e}")
+            raise HTTPException(status_code=500, detail="Master import failed")
+        publish_event("master-activated", info)
+        return info
+    finally:
+        if staged is not None and os.path.exists(staged.path):
+            os.unlink(staged.path)
+
+@router.get("/admin/master/versions")
+def list_master_versions(
+    x_admin_token: Optional[str] = Header(None, convert_underscores=False),
+    x_admin_token_alt: Optional[str] = Header(None, alias="X_Admin_Token"),
+    authorization: Optional[str] = Header(None),
+):
+    """Imported master versions, newest first"""
+    _require_admin(x_admin_token, x_admin_token_alt, authorization, None)
+    db: Session = SessionLocal()
+    try:
+        return [version_info(v) for v in db.query(MasterVersion).order_by(MasterVersion.id.desc()).all()]
+    finally:
+        db.close()
+
+def _activate_master(version_id: Optional[int]) -> dict:
+    db: Session = SessionLocal()
+    try:
+        version = activate_version(db, version_id) if version_id is not None else None
+        if version is None:
+            raise HTTPException(status_code=404, detail="Master version not found")
+        info = version_info(version)
+    finally:
+        db.close()
+    publish_event("master-activated", info)
+    return info
+
+@router.post("/admin/master/versions/{version_id}/activate")
+def activate_master_version(
+    version_id: int,
+    x_admin_token: Optional[str] = Header(None, convert_underscores=False),
+    x_admin_token_alt: Optional[str] = Header(None, alias="X_Admin_Token"),
+    authorization: Optional[str] = Header(None),
+):
+    _require_admin(x_admin_token, x_admin_token_alt, authorization, None)
+    return _activate_master(version_id)
+
+@router.post("/admin/master/rollback")
+def rollback_master(
+    x_admin_token: Optional[str] = Header(None, convert_underscores=False),
+    x_admin_token_alt: Optional[str] = Header(None, alias="X_Admin_Token"),
+    authorization: Optional[str] = Header(None),
+):
+    """Reactivate the version imported before the active one"""
+    _require_admin(x_admin_token, x_admin_token_alt, authorization, None)
+    db: Session = SessionLocal()
+    try:
+        previous = previous_version(db)
+    finally:
+        db.close()
+    if previous is None:
+        raise HTTPException(status_code=404, detail="No earlier master version")
+    return _activate_master(previous.id)
+
 def _delete_single_job(db: Session, job_id: int) -> tuple[bool, str]:
     """Delete a single job with proper error handling."""
     try:
@@ -505,6 +840,9 @@ def bulk_delete_jobs(
         
         if deleted:
             db.commit()
+            for jid in deleted:
+                records_cache.invalidate_job(jid)
+            job_changed("job-deleted", {"job_ids": deleted})
         return {"ok": True, "deleted": deleted, "skipped": skipped}
     except Exception as e:
         db.rollback()
@@ -517,31 +855,21 @@ def bulk_delete_jobs(
 def export_summary(job_id: int = Query(...)):
     """
     ดึงข้อมูล summary จาก DB โดยตรง (ไม่ใช้ไฟล์ MASTER)
-    ถ้าใน compare_results มีคอลัมน์ 'sla' จะดึงมาใช้ด้วย
+    ค่า customer/project/province/sla อ่านผ่าน compare_dimensions
     """
     try:
-        engine = create_engine(DATABASE_URL)
-        with engine.connect() as conn:
-            has_sla = False
-            try:
-                chk = conn.execute(text("SHOW COLUMNS FROM compare_results LIKE 'sla'")).fetchone()
-                has_sla = bool(chk)
-            except Exception:
-                has_sla = False
-
-            allowed_cols = ['customer', 'project_name', 'province', 'service_type', 'service_category', 'circuit_norm']
-            if has_sla:
-                allowed_cols.append('sla')
-            select_cols = ', '.join(allowed_cols)
-            
-            rows = conn.execute(
-                text(f"""
-                    SELECT {select_cols}
-                    FROM compare_results
-                    WHERE session_id = :sid AND matched = 1
-                """),
-                {"sid": job_id},
-            ).fetchall()
+        db: Session = SessionLocal()
+        try:
+            matched_rows = db.query(CompareResult).filter(
+                CompareResult.session_id == job_id,
+                CompareResult.matched == 1
+            ).all()
+            rows = [
+                SimpleNamespace(circuit_norm=r.circuit_norm, **v)
+                for r, v in zip(matched_rows, decode_rows(db, matched_rows))
+            ]
+        finally:
+            db.close()
 
         def derive_category(circuit_norm: str, service_type) -> str:
             def _fmt(x):
@@ -667,10 +995,8 @@ def cleanup_old_jobs_admin(
         db = SessionLocal()
         try:
             cutoff_date = datetime.now() - timedelta(days=JOB_RETENTION_DAYS)
-            old_sessions = db.query(CompareSession).filter(
-                CompareSession.created_at < cutoff_date,
-                CompareSession.pinned != True
-            ).all()
+            old_sessions = expired_sessions_query(db, cutoff_date).all()
+            old_ids = [session.id for session in old_sessions]
             
             deleted_count = 0
             for session in old_sessions:
@@ -683,6 +1009,9 @@ def cleanup_old_jobs_admin(
             
             if deleted_count > 0:
                 db.commit()
+                for job_id in old_ids:
+                    records_cache.invalidate_job(job_id)
+                job_changed("job-deleted", {"job_ids": old_ids, "reason": "retention"})
             
             return {
                 "ok": True,
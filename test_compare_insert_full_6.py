@@ -3,9 +3,11 @@ from __future__ import annotations
 import os
 import re as _re
 import math
+import logging
 from datetime import datetime
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 
+import numpy as np
 import pandas as pd
 from sqlalchemy.orm import Session
 from dotenv import load_dotenv
@@ -13,9 +15,19 @@ from dotenv import load_dotenv
 try:
     from .database import SessionLocal
     from .db_models import CompareSession, CompareResult
+    from .dimensions import encode_rows
+    from .compare_csv import detect_encoding, join_row_text, read_compare_text
+    from .master_store import import_master, lookup_circuits, version_info, version_keys
+    from .master_index import MasterIndex, shared_master_index
+    from .master_suggest import deletion_index
 except Exception:
     from database import SessionLocal
     from db_models import CompareSession, CompareResult
+    from dimensions import encode_rows
+    from compare_csv import detect_encoding, join_row_text, read_compare_text
+    from master_store import import_master, lookup_circuits, version_info, version_keys
+    from master_index import MasterIndex, shared_master_index
+    from master_suggest import deletion_index
 
 load_dotenv()
 
@@ -77,10 +89,7 @@ def _read_compare(compare_path: str) -> pd.DataFrame:
         except Exception:
             return pd.read_excel(compare_path, header=None, dtype=str)
     if ext == ".csv":
-        try:
-            return pd.read_csv(compare_path, dtype=str)
-        except UnicodeDecodeError:
-            return pd.read_csv(compare_path, encoding="utf-8-sig", dtype=str)
+        return pd.read_csv(compare_path, dtype=str, encoding=detect_encoding(compare_path))
     try:
         return pd.read_excel(compare_path, dtype=str)
     except Exception:
@@ -116,8 +125,10 @@ def _extract_all_circuits(text: str) -> List[str]:
 
     return out
 
+SERVICE_TYPE_COLUMNS = ("ประเภท", "บริการ", "Service", "Service Type", "ประเภทบริการ")
+
 def _pick_service_type(info: dict) -> str:
-    for key in ("ประเภท", "บริการ", "Service", "Service Type", "ประเภทบริการ"):
+    for key in SERVICE_TYPE_COLUMNS:
         if key in info and pd.notna(info[key]):
             return str(info[key])
     return ""
@@ -137,100 +148,230 @@ def _derive_service_category(circuit_norm: str, service_type) -> str:
         return "Broadband"
     return base
 
-def run_test_compare(master_path: str, compare_path: str) -> Dict[str, Any]:
-    if not master_path or not compare_path:
-        raise ValueError("master_path and compare_path are required")
+def load_master(master_path: str, sha256: Optional[str] = None) -> MasterIndex:
+    """Master rows keyed by normalized circuit code, first row per code.
 
+    With the workbook's sha256 the index is the file shared by all workers,
+    built here only if no worker has built it yet.
+    """
+    if sha256:
+        return shared_master_index(sha256, lambda: load_master(master_path))
     mdf = _read_master(master_path)
     if KEY_COLUMN not in mdf.columns:
         raise ValueError(f"Master missing KEY_COLUMN: {KEY_COLUMN}")
     mdf[KEY_COLUMN] = mdf[KEY_COLUMN].astype(str).map(_normalize_code)
     mdf.rename(columns={KEY_COLUMN: "__KEY__"}, inplace=True)
     mdf.drop_duplicates(subset=["__KEY__"], inplace=True)
-    master_dict = mdf.set_index("__KEY__").to_dict(orient="index")
 
-    cdf = _read_compare(compare_path)
+    # _pick_service_type per row: the first of its columns with a value.
+    service_type = pd.Series(None, index=mdf.index, dtype=object)
+    for key in reversed(SERVICE_TYPE_COLUMNS):
+        if key in mdf.columns:
+            column = mdf[key]
+            if isinstance(column, pd.DataFrame):
+                column = column.iloc[:, 0]
+            service_type = column.where(column.notna(), service_type)
+
+    columns = {"service_type": service_type}
+    for field, header in (("customer", "ลูกค้า"), ("project_name", "ชื่อโครงการ"), ("province", "จังหวัด"),
+                          ("sla", "SLA"), ("branch", "สาขา")):
+        if header in mdf.columns:
+            columns[field] = mdf[header]
+    index = MasterIndex.build(mdf["__KEY__"].tolist(), columns)
+    logging.info(f"Master index for {os.path.basename(master_path)}: {len(index)} circuits, "
+                 f"{index.nbytes() / 1024 / 1024:.1f} MB")
+    return index
+
+def import_master_file(master_path: str, filename: str, sha256: str) -> Dict[str, Any]:
+    """Load a master workbook into master_circuits as the new active version."""
+    index = load_master(master_path, sha256)
+    db: Session = SessionLocal()
+    try:
+        return version_info(import_master(db, index, filename, sha256))
+    finally:
+        db.close()
+
+def run_test_compare(master_path: Optional[str], compare_path: str, content_hash: Optional[str] = None,
+                     master_version_id: Optional[int] = None,
+                     master_sha256: Optional[str] = None) -> Dict[str, Any]:
+    """Extract the circuits of a compare file and match them into a new job.
+
+    The master is the workbook at master_path (with master_sha256, through
+    the shared index), or with master_version_id the imported version of
+    that id, looked up only for the circuits found.
+    """
+    if not (master_path or master_version_id) or not compare_path:
+        raise ValueError("master_path and compare_path are required")
+
+    master = load_master(master_path, master_sha256) if master_version_id is None else None
 
-    header_text = " ".join([("" if c is None else str(c)) for c in cdf.columns])
+    if os.path.splitext(compare_path)[1].lower() == ".csv":
+        columns, joined = read_compare_text(compare_path)
+    else:
+        wdf = _read_compare(compare_path)
+        columns, joined = list(wdf.columns), join_row_text(wdf)
+
+    header_text = " ".join([("" if c is None else str(c)) for c in columns])
     header_codes = set(_extract_all_circuits(header_text))
 
-    cdf["__joined__"] = cdf.apply(
-        lambda r: " ".join([("" if v is None else str(v)) for v in r.values]),
-        axis=1
-    )
+    cdf = pd.DataFrame({"__joined__": joined})
     cdf["__circuits__"] = cdf["__joined__"].map(_extract_all_circuits)
     cdf = cdf[cdf["__circuits__"].map(lambda L: isinstance(L, list) and len(L) > 0)].copy()
     cdf = cdf.explode("__circuits__", ignore_index=True)
     cdf.rename(columns={"__circuits__": "norm_circuit"}, inplace=True)
-    cdf["raw_circuit"] = cdf["norm_circuit"]
 
     codes_in_rows = set(cdf["norm_circuit"].tolist()) if not cdf.empty else set()
     extra_codes = list(header_codes - codes_in_rows)
     if extra_codes:
-        extra_df = pd.DataFrame({
-            "norm_circuit": extra_codes,
-            "raw_circuit":  extra_codes
-        })
-        cdf = pd.concat([cdf[["norm_circuit","raw_circuit"]], extra_df], ignore_index=True)
+        extra_df = pd.DataFrame({"norm_circuit": extra_codes})
+        cdf = pd.concat([cdf[["norm_circuit"]], extra_df], ignore_index=True)
     else:
-        cdf = cdf[["norm_circuit","raw_circuit"]]
+        cdf = cdf[["norm_circuit"]]
 
     db: Session = SessionLocal()
-    session = CompareSession(
-        created_at=datetime.utcnow(),
-        filename=os.path.basename(compare_path) or "uploaded"
-    )
-    db.add(session)
-    db.commit()
-    db.refresh(session)
-
-    results: List[Dict[str, Any]] = []
-    matched_total = 0
-    unmatched_total = 0
-
-    for row in cdf.itertuples():
-        circuit_norm = getattr(row, "norm_circuit")
-        info    = master_dict.get(circuit_norm)
-        matched = 1 if info is not None else 0
-
-        customer       = _format_text((info or {}).get("ลูกค้า"))
-        project_name   = _format_text((info or {}).get("ชื่อโครงการ"))
-        province       = _format_text((info or {}).get("จังหวัด"))
-        service_type   = _pick_service_type(info or {})
-        service_cat    = _derive_service_category(circuit_norm, service_type)
-
-        sla_val        = (info or {}).get("SLA")
-        branch_val     = _format_text((info or {}).get("สาขา"))
-
-        results.append({
-            "session_id":       session.id,
-            "circuit_raw":      circuit_norm,
-            "circuit_norm":     circuit_norm,
-            "matched":          matched,
-            "customer":         customer if matched else "",
-            "project_name":     project_name if matched else "",
-            "province":         province if matched else "",
-            "service_type":     service_type if matched else "",
-            "service_category": service_cat if matched else "",
-            "sla":              (sla_val if matched else None),
-            "branch":           (branch_val if matched else ""),
-        })
-
-        if matched: matched_total += 1
-        else:       unmatched_total += 1
-
-    df_out = pd.DataFrame(results).drop_duplicates(subset=["circuit_norm"])
-    df_out = df_out.where(pd.notnull(df_out), None)
-    if not df_out.empty:
-        db.bulk_insert_mappings(CompareResult, df_out.to_dict(orient="records"))
+    try:
+        session = CompareSession(
+            created_at=datetime.utcnow(),
+            filename=os.path.basename(compare_path) or "uploaded",
+            content_hash=content_hash,
+            master_version_id=master_version_id,
+        )
+        db.add(session)
         db.commit()
+        db.refresh(session)
 
-    job_id = session.id
-    db.close()
+        if master is None:
+            master = MasterIndex.from_rows(lookup_circuits(db, master_version_id, cdf["norm_circuit"]))
+        matched_total, unmatched_total = _store_matches(db, session.id, cdf["norm_circuit"], master)
+        session.upload_matched = int(matched_total)
+        session.upload_unmatched = int(unmatched_total)
+        db.commit()
+        job_id = session.id
+    finally:
+        db.close()
 
     return {
         "job_id":          int(job_id),
         "matched_total":   int(matched_total),
         "unmatched_total": int(unmatched_total),
         "total_records":   int(matched_total + unmatched_total),
+        "master_version_id": master_version_id,
+    }
+
+def _service_categories(codes: pd.Series, service_types: np.ndarray) -> np.ndarray:
+    """_derive_service_category for every row, computed once per distinct service type."""
+    st_codes, st_values = pd.factorize(service_types)
+    if not len(st_values):
+        return np.full(len(codes), "", dtype=object)
+    base = np.array([_derive_service_category("", st) for st in st_values], dtype=object)
+    with_jy = np.array([_derive_service_category("0000J", st) for st in st_values], dtype=object)
+    is_jy = codes.str[4].str.upper().isin(["J", "Y"]).to_numpy()
+    return np.where(is_jy, with_jy[st_codes], base[st_codes])
+
+def _store_matches(db: Session, session_id: int, codes, index: MasterIndex):
+    """Match circuit codes against the master and insert one result per distinct code.
+
+    The whole batch is looked up at once and each field is formatted once per
+    distinct master value. Returns (matched, unmatched) counted over every
+    code, repeats included.
+    """
+    codes = pd.Series(list(codes), dtype=object)
+    pos = index.lookup(codes.tolist())
+    matched = pos >= 0
+    matched_total = int(matched.sum())
+    unmatched_total = len(codes) - matched_total
+
+    service_type = index.column("service_type", pos, str, "")
+    df_out = pd.DataFrame({
+        "session_id":       session_id,
+        "circuit_norm":     codes,
+        "matched":          matched.astype(int),
+        "customer":         index.column("customer", pos, _format_text, ""),
+        "project_name":     index.column("project_name", pos, _format_text, ""),
+        "province":         index.column("province", pos, _format_text, ""),
+        "service_type":     service_type,
+        "service_category": _service_categories(codes, service_type),
+        "sla":              index.column("sla", pos),
+        "branch":           index.column("branch", pos, _format_text, ""),
+    }).drop_duplicates(subset=["circuit_norm"])
+    df_out = df_out.where(pd.notnull(df_out), None)
+    if not df_out.empty:
+        rows = encode_rows(db, df_out.to_dict(orient="records"))
+        db.bulk_insert_mappings(CompareResult, rows)
+        db.commit()
+    return matched_total, unmatched_total
+
+def run_rematch(job_ids: List[int], master_path: Optional[str] = None,
+                master_version_id: Optional[int] = None,
+                master_sha256: Optional[str] = None) -> Dict[int, Dict[str, Any]]:
+    """Match the stored circuits of existing jobs against a master into new jobs.
+
+    The compare files are not needed: every job already holds its distinct
+    circuit codes, so the work is one lookup per stored result. The source
+    jobs are left as they are. The master is chosen as for run_test_compare.
+    Returns {source job id: new job totals} for the jobs that exist.
+
+    Only distinct codes are stored, so the totals count distinct circuits
+    (like the job list) and are lower than the source upload's totals when
+    its file repeated a circuit; the result says so with "distinct": True.
+    """
+    master = load_master(master_path, master_sha256) if master_version_id is None else None
+    out: Dict[int, Dict[str, Any]] = {}
+    db: Session = SessionLocal()
+    try:
+        sources = db.query(CompareSession).filter(CompareSession.id.in_(job_ids)).all()
+        order = {jid: i for i, jid in reversed(list(enumerate(job_ids)))}
+        for source in sorted(sources, key=lambda s: order[s.id]):
+            rows = db.query(CompareResult.id, CompareResult.circuit_norm).filter(
+                CompareResult.session_id == source.id
+            ).all()
+            # Keep the source's insertion order for the new result ids.
+            codes = [code for _, code in sorted(rows)]
+
+            session = CompareSession(created_at=datetime.utcnow(), filename=source.filename,
+                                     master_version_id=master_version_id, source_job_id=source.id)
+            db.add(session)
+            db.commit()
+            db.refresh(session)
+
+            lookup = master
+            if lookup is None:
+                lookup = MasterIndex.from_rows(lookup_circuits(db, master_version_id, codes))
+            matched_total, unmatched_total = _store_matches(db, session.id, codes, lookup)
+            out[source.id] = {
+                "job_id":          int(session.id),
+                "source_job_id":   int(source.id),
+                "matched_total":   int(matched_total),
+                "unmatched_total": int(unmatched_total),
+                "total_records":   int(matched_total + unmatched_total),
+                "distinct":        True,
+                "master_version_id": master_version_id,
+            }
+    finally:
+        db.close()
+    return out
+
+def suggest_circuits(codes: List[str], master_path: Optional[str] = None, master_version_id: Optional[int] = None,
+                     master_sha256: Optional[str] = None, limit: int = 3,
+                     max_distance: int = 1) -> Dict[str, List[Dict[str, Any]]]:
+    """Nearest master codes within max_distance edits of each code, keyed by code.
+
+    The master is chosen as for run_test_compare; its deletion index is built
+    once per process and master_sha256, which is required.
+    """
+    def keys() -> np.ndarray:
+        if master_version_id is None:
+            return load_master(master_path, master_sha256).keys
+        db: Session = SessionLocal()
+        try:
+            return MasterIndex.build(version_keys(db, master_version_id), {}).keys
+        finally:
+            db.close()
+
+    wanted = list(dict.fromkeys(codes))
+    index = deletion_index(master_sha256, keys, max_distance)
+    found = index.suggest(wanted, limit=limit, max_distance=max_distance)
+    return {
+        code: [{"circuit_norm": key, "distance": distance} for key, distance in near]
+        for code, near in zip(wanted, found)
     }
@@ -0,0 +1,157 @@
+"""Test setup: settings for config.py and the checkout imported as package "app".
+
+The repository root is the app package (uvicorn app.main:app), and most
+modules use relative imports, so a link named app to the root is put on
+sys.path whatever the checkout directory is called; spawned pool workers
+inherit the path. Every database, directory and file the app writes lives
+under one temporary directory per run.
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+WORK = tempfile.mkdtemp(prefix="compare_tests_")
+ADMIN_TOKEN = "test-admin-token"
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(WORK, "test.db"))
+os.environ.setdefault("ADMIN_TOKEN", ADMIN_TOKEN)
+for name, default in (
+    ("JOBS_VERSION_FILE", "jobs.version"),
+    ("EVENTS_JOURNAL_FILE", "events.jsonl"),
+    ("TEXT_REPLACE_JOBS_DIR", "text_replace_jobs"),
+    ("TEXT_REPLACE_ARTIFACT_DIR", "text_replace_artifacts"),
+    ("TEXT_REPLACE_CACHE_DIR", "text_replace_cache"),
+    ("UPLOADS_DIR", "uploads"),
+    ("MASTER_INDEX_DIR", "master_index"),
+    ("ARCHIVE_DIR", "archives"),
+):
+    os.environ.setdefault(name, os.path.join(WORK, default))
+
+os.symlink(ROOT, os.path.join(WORK, "app"), target_is_directory=True)
+sys.path.insert(0, WORK)
+
+
+MASTER_ROWS = 40
+XLSX_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def write_master(path, rows=MASTER_ROWS):
+    """A master workbook like NT.CSOC-MS.xlsx: a title row, then headers on row 2."""
+    df = pd.DataFrame([{
+        "เลขวงจร": f"{1000 + i}J{2000 + i}",
+        "ลูกค้า": f"cust {i % 7}",
+        "ชื่อโครงการ": f"proj {i % 5}",
+        "จังหวัด": ["กรุงเทพ", "เชียงใหม่"][i % 2],
+        "ประเภท": "Data : x",
+        "SLA": "99.9",
+        "สาขา": "br",
+    } for i in range(rows)])
+    with pd.ExcelWriter(path) as writer:
+        pd.DataFrame([["title"]]).to_excel(writer, sheet_name="Sheet1", index=False, header=False)
+        df.to_excel(writer, sheet_name="Sheet1", index=False, startrow=1)
+    return str(path)
+
+
+def compare_csv_text(codes):
+    """A compare CSV with one circuit per row, written the way users paste them."""
+    rows = [f"วงจร {code[:4]}-{code[4]}-{code[5:]},x" for code in codes]
+    return ("a,b\n" + "\n".join(rows) + "\n").encode("utf-8")
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture(scope="session")
+def master_xlsx():
+    return write_master(os.path.join(WORK, "master.xlsx"))
+
+
+@pytest.fixture(scope="session")
+def master_codes():
+    return [f"{1000 + i}J{2000 + i}" for i in range(MASTER_ROWS)]
+
+
+@pytest.fixture
+def admin_headers():
+    return {"Authorization": f"Bearer {ADMIN_TOKEN}"}
+
+
+@pytest.fixture
+def import_master(client, admin_headers):
+    """Import a master workbook through /admin/master/import; returns the version info."""
+    def upload(path):
+        with open(path, "rb") as master:
+            r = client.post("/admin/master/import", headers=admin_headers,
+                            files={"master_file": ("master.xlsx", master.read(), XLSX_TYPE)})
+        assert r.status_code == 200, r.text
+        return r.json()
+    return upload
+
+
+@pytest.fixture
+def upload_compare(client, master_xlsx):
+    """Upload a compare CSV of the given circuit codes with the test master; returns the response JSON."""
+    def upload(codes, force=True, name="compare.csv"):
+        with open(master_xlsx, "rb") as master:
+            r = client.post("/compare-upload", params={"force": force}, files={
+                "compare_file": (name, compare_csv_text(codes), "text/csv"),
+                "master_file": ("master.xlsx", master.read(), XLSX_TYPE),
+            })
+        assert r.status_code == 200, r.text
+        return r.json()
+    return upload
+
+
+DOCX_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+
+def make_docx(path, paragraphs=("บริษัท ABC จำกัด", "ABC Corp")):
+    from docx import Document
+
+    doc = Document()
+    for text in paragraphs:
+        doc.add_paragraph(text)
+    doc.save(path)
+    return str(path)
+
+
+def make_xlsx(path, cells=("ABC row 1", "shared ABC")):
+    from openpyxl import Workbook
+
+    wb = Workbook()
+    for r, value in enumerate(cells, 1):
+        wb.active.cell(r, 1, value)
+    wb.save(path)
+    return str(path)
+
+
+@pytest.fixture(scope="session")
+def documents():
+    """{name: bytes} of one DOCX and one XLSX with "ABC" in them."""
+    folder = Path(WORK) / "documents"
+    folder.mkdir(exist_ok=True)
+    return {
+        "a.docx": Path(make_docx(folder / "a.docx")).read_bytes(),
+        "b.xlsx": Path(make_xlsx(folder / "b.xlsx")).read_bytes(),
+    }
+
+
+@pytest.fixture
+def upload_files(documents):
+    """Multipart "files" entries for the named documents (or raw bytes)."""
+    def files(names, contents=None):
+        contents = contents or {}
+        return [("files", (name, contents.get(name, documents.get(name)), "application/octet-stream"))
+                for name in names]
+    return files
@@ -0,0 +1,93 @@
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import artifact_store
+from app.models import Base, TextReplaceHistory
+
+
+@pytest.fixture
+def store_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(artifact_store, "TEXT_REPLACE_ARTIFACT_DIR", str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)()
+
+
+def _stored(content):
+    path = artifact_store.new_temp_path()
+    with open(path, "wb") as f:
+        f.write(content)
+    return artifact_store.store(path)
+
+
+def _row(db, digest, expires_in=timedelta(days=1), zip_path=""):
+    row = TextReplaceHistory(
+        zip_id=str(uuid.uuid4()), find_text="a", replace_text="b", total_files=1, successful=1, failed=0,
+        success_rate="100.0%", zip_path=zip_path, artifact_id=digest, expires_at=datetime.now() + expires_in)
+    db.add(row)
+    db.commit()
+    return row
+
+
+def _age(path, seconds):
+    old = time.time() - seconds
+    os.utime(path, (old, old))
+
+
+def test_identical_archives_share_one_file(store_dir):
+    first, second = _stored(b"zip bytes"), _stored(b"zip bytes")
+    assert first == second
+    with open(artifact_store.artifact_path(first), "rb") as f:
+        assert f.read() == b"zip bytes"
+    assert os.listdir(store_dir / "tmp") == []
+
+
+def test_release_keeps_referenced_and_recent_files(store_dir, db):
+    shared, alone, recent = _stored(b"shared"), _stored(b"alone"), _stored(b"recent")
+    for digest in (shared, alone):
+        _age(artifact_store.artifact_path(digest), artifact_store.ARTIFACT_GRACE_SECONDS + 10)
+    _row(db, shared)
+    assert artifact_store.release(db, [shared, alone, recent]) == 1
+    assert os.path.exists(artifact_store.artifact_path(shared))
+    assert not os.path.exists(artifact_store.artifact_path(alone))
+    assert os.path.exists(artifact_store.artifact_path(recent))
+
+
+def test_cleanup_marks_missing_and_expired_rows(store_dir, db):
+    kept, lost = _stored(b"kept"), _stored(b"lost")
+    live, gone, expired = _row(db, kept), _row(db, lost), _row(db, kept, timedelta(seconds=-1))
+    os.unlink(artifact_store.artifact_path(lost))
+    swept = artifact_store.cleanup_artifacts(db)
+    assert (swept["expired_records"], swept["missing_files"]) == (1, 1)
+    db.expire_all()
+    assert (live.zip_available, gone.zip_available, expired.zip_available) == (True, False, False)
+    assert artifact_store.resolve(live) == artifact_store.artifact_path(kept)
+
+
+def test_cleanup_deletes_expired_legacy_archives(store_dir, db, monkeypatch):
+    legacy_dir = store_dir / "legacy"
+    legacy_dir.mkdir()
+    monkeypatch.setattr(artifact_store, "_LEGACY_DIR", os.path.realpath(legacy_dir))
+    old, live, outside = legacy_dir / "tmpold.zip", legacy_dir / "tmplive.zip", store_dir / "outside.zip"
+    for path in (old, live, outside):
+        path.write_bytes(b"zip")
+    expired = _row(db, None, timedelta(seconds=-1), str(old))
+    kept = _row(db, None, zip_path=str(live))
+    foreign = _row(db, None, timedelta(seconds=-1), str(outside))
+
+    assert artifact_store.cleanup_artifacts(db)["removed_files"] == 1
+    assert (old.exists(), live.exists(), outside.exists()) == (False, True, True)
+    db.expire_all()
+    assert (expired.zip_path, kept.zip_path, foreign.zip_path) == ("", str(live), "")
+    assert artifact_store.cleanup_artifacts(db)["removed_files"] == 0
@@ -0,0 +1,50 @@
+import pandas as pd
+import pytest
+
+from app import compare_csv
+from app.compare_csv import read_compare_text, sniff_encoding
+
+CASES = {
+    "plain": "เลขวงจร,ลูกค้า,หมายเหตุ\n1001J0001,บริษัท ก,\n1001J0002,NA,\"a, b\"\n",
+    "repeated headers": "a,a,a.1,,\n1,2,3,4,5\n",
+    "quoted newline": "code,note\n1001J0001,\"line 1\nline 2\"\n1001J0002,null\n",
+    "header only": "code,note\n",
+    "short rows": "code,note\n1001J0001\n1001J0002,x\n",  # Arrow rejects these; pandas reads them
+}
+
+
+def _write(tmp_path, text, encoding):
+    path = tmp_path / "compare.csv"
+    path.write_bytes(text.encode(encoding))
+    return str(path)
+
+
+@pytest.mark.parametrize("encoding", ["utf-8", "utf-8-sig", "cp874"])
+@pytest.mark.parametrize("name", sorted(CASES))
+def test_matches_pandas(tmp_path, name, encoding):
+    path = _write(tmp_path, CASES[name], encoding)
+    expected_names, expected = compare_csv._read_pandas(path, compare_csv.detect_encoding(path))
+    names, joined = read_compare_text(path)
+    assert names == expected_names
+    assert joined.tolist() == expected.tolist()
+    if compare_csv.pa is not None and name != "short rows":
+        names, joined = compare_csv._read_arrow(path, compare_csv.detect_encoding(path))
+        assert (names, joined.tolist()) == (expected_names, expected.tolist())
+
+
+def test_header_names_match_pandas(tmp_path):
+    pytest.importorskip("pyarrow")
+    path = _write(tmp_path, CASES["repeated headers"], "utf-8")
+    names = compare_csv._header_names(path, "utf-8")
+    assert names == [str(c) for c in pd.read_csv(path, dtype=str).columns]
+    assert names == compare_csv._read_arrow(path, "utf-8")[0]
+
+
+@pytest.mark.parametrize("sample, encoding", [
+    (b"\xef\xbb\xbfcode\n", "utf-8-sig"),
+    ("ลูกค้า\n".encode("utf-8"), "utf-8"),
+    ("ลูกค้า\n".encode("utf-8")[:-2], "utf-8"),  # a character cut at the sample end
+    ("ลูกค้า\n".encode("cp874"), "cp874"),
+])
+def test_sniff_encoding(sample, encoding):
+    assert sniff_encoding(sample) == encoding
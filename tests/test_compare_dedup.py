@@ -0,0 +1,24 @@
+def test_identical_upload_returns_the_existing_job(upload_compare, master_codes):
+    codes = master_codes[:7] + ["9999X0001"]
+    first = upload_compare(codes, force=False)
+    again = upload_compare(codes, force=False, name="renamed.csv")
+    assert first["deduplicated"] is False
+    assert again["deduplicated"] is True
+    assert again["job_id"] == first["job_id"]
+    assert (again["matched_total"], again["unmatched_total"], again["total_records"]) == (7, 1, 8)
+
+    forced = upload_compare(codes, force=True)
+    assert forced["deduplicated"] is False and forced["job_id"] != first["job_id"]
+    other = upload_compare(codes[:-1], force=False)
+    assert other["deduplicated"] is False and other["job_id"] != first["job_id"]
+
+
+def test_reused_job_keeps_the_upload_totals(upload_compare, master_codes):
+    codes = master_codes[20:23] * 2 + ["9999X0002"]
+    first = upload_compare(codes, force=False)
+    again = upload_compare(codes, force=False)
+    assert again["job_id"] == first["job_id"]
+    totals = ("matched_total", "unmatched_total", "total_records", "master_version_id")
+    assert [again[k] for k in totals] == [first[k] for k in totals]
+    assert (first["matched_total"], first["unmatched_total"]) == (6, 1)
+    assert "distinct" not in again
@@ -0,0 +1,86 @@
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import sessionmaker
+
+from app import dimensions
+from app.db_models import Base as CompareBase, CompareResult, DIMENSION_FIELDS
+from app.dimensions import decode_rows, encode_rows
+from app.migrations import run_migrations
+
+LEGACY_SCHEMA = """
+CREATE TABLE compare_sessions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, created_at DATETIME, pinned BOOLEAN NOT NULL DEFAULT 0,
+    archived_at DATETIME, filename VARCHAR(255) NOT NULL);
+CREATE TABLE compare_results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, session_id INTEGER, created_at DATETIME,
+    customer VARCHAR(255), project_name VARCHAR(255), province VARCHAR(255), service_type VARCHAR(255),
+    service_category VARCHAR(255), sla VARCHAR(32), branch VARCHAR(255),
+    circuit_norm VARCHAR(255), circuit_raw TEXT, matched INTEGER);
+"""
+
+
+@pytest.fixture(autouse=True)
+def fresh_caches(monkeypatch):
+    # Ids are cached per process; each test has its own database.
+    monkeypatch.setattr(dimensions, "_id_cache", {})
+    monkeypatch.setattr(dimensions, "_label_cache", {})
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://")
+    CompareBase.metadata.create_all(bind=engine)
+    return engine
+
+
+def _row(**fields):
+    return {"session_id": 1, "circuit_norm": "1001J0001", "matched": 1, **fields}
+
+
+def test_encode_decode_round_trip(engine):
+    db = sessionmaker(bind=engine)()
+    values = [
+        {"customer": "บริษัท ก", "province": "กรุงเทพ", "sla": "99.9"},
+        {"customer": "บริษัท ก", "province": "", "sla": None},
+        {"customer": "Bangkok", "province": "bangkok", "branch": "x "},
+    ]
+    db.bulk_insert_mappings(CompareResult, encode_rows(db, [_row(**v) for v in values]))
+    db.commit()
+
+    stored = db.query(CompareResult).order_by(CompareResult.id).all()
+    expected = [{f: v.get(f) for f in DIMENSION_FIELDS} for v in values]
+    assert decode_rows(db, stored) == expected
+    # Repeated values share one dimension row; "" has its own, NULL has none.
+    assert stored[0].customer_id == stored[1].customer_id
+    assert stored[1].province_id is not None and stored[1].sla_id is None
+
+
+def test_ids_survive_a_new_process(engine):
+    db = sessionmaker(bind=engine)()
+    first = encode_rows(db, [_row(customer="Alpha", province="")])[0]
+    dimensions._id_cache.clear()
+    dimensions._label_cache.clear()
+    again = encode_rows(db, [_row(customer="Alpha", province="")])[0]
+    assert (again["customer_id"], again["province_id"]) == (first["customer_id"], first["province_id"])
+
+
+def test_legacy_rows_are_migrated_exactly():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        for statement in LEGACY_SCHEMA.split(";"):
+            if statement.strip():
+                conn.execute(text(statement))
+        conn.execute(text("INSERT INTO compare_sessions (filename) VALUES ('legacy.xlsx')"))
+        conn.execute(text("""
+            INSERT INTO compare_results (session_id, customer, province, sla, circuit_norm, circuit_raw, matched)
+            VALUES (1, 'Alpha', '', NULL, '1001J0001', 'raw', 1), (1, 'alpha', 'กรุงเทพ', '99.9', '1001J0002', 'raw', 0)
+        """))
+    CompareBase.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    run_migrations(engine)  # a second run changes nothing
+
+    cols = {c["name"] for c in inspect(engine).get_columns("compare_results")}
+    assert "circuit_raw" not in cols and "customer" not in cols and "customer_id" in cols
+    db = sessionmaker(bind=engine)()
+    rows = decode_rows(db, db.query(CompareResult).order_by(CompareResult.id).all())
+    assert [(r["customer"], r["province"], r["sla"]) for r in rows] == [("Alpha", "", None), ("alpha", "กรุงเทพ", "99.9")]
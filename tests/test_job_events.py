@@ -0,0 +1,74 @@
+import json
+import multiprocessing
+import os
+
+import pytest
+
+from app import event_stream, job_events
+from app.event_stream import EventFanout, format_sse
+
+
+@pytest.fixture
+def journal(tmp_path, monkeypatch):
+    path = str(tmp_path / "events.jsonl")
+    monkeypatch.setattr(job_events, "EVENTS_JOURNAL_FILE", path)
+    monkeypatch.setattr(event_stream, "EVENTS_JOURNAL_FILE", path)
+    monkeypatch.setattr(job_events, "_JOURNAL_MAX_BYTES", 64 * 1024)
+    return path
+
+
+def _events(path):
+    with open(path, "rb") as f:
+        return [json.loads(line) for line in f.read().splitlines()]
+
+
+def _publish(count):
+    for i in range(count):
+        job_events.publish_event("test", {"writer": os.getpid(), "i": i, "pad": "p" * 300})
+
+
+def test_fanout_reads_new_events_once(journal):
+    fanout = EventFanout()
+    job_events.publish_event("job-created", {"job_id": 1})
+    assert [e["data"] for e in fanout._read_journal()] == [{"job_id": 1}]
+    assert fanout._read_journal() == []
+    job_events.publish_event("job-deleted", {"job_id": 1})
+    assert [e["event"] for e in fanout._read_journal()] == ["job-deleted"]
+
+
+def test_trim_keeps_the_newest_events_and_the_fanout_follows(journal):
+    fanout = EventFanout()
+    _publish(100)
+    fanout._read_journal()
+    _publish(400)
+    kept = [e["data"]["i"] for e in _events(journal)]
+    assert os.path.getsize(journal) <= job_events._JOURNAL_MAX_BYTES
+    assert kept == list(range(kept[0], 400))
+    # The fan-out notices the replaced file and reads it from the start.
+    assert [e["data"]["i"] for e in fanout._read_journal()] == kept
+
+
+@pytest.mark.skipif(job_events.fcntl is None, reason="journal trims are coordinated with flock")
+def test_concurrent_writers_lose_nothing_but_trimmed_heads(journal):
+    ctx = multiprocessing.get_context("fork")
+    writers = [ctx.Process(target=_publish, args=(1500,)) for _ in range(4)]
+    for p in writers:
+        p.start()
+    for p in writers:
+        p.join()
+    by_writer = {}
+    for e in _events(journal):
+        by_writer.setdefault(e["data"]["writer"], []).append(e["data"]["i"])
+    assert by_writer
+    for kept in by_writer.values():
+        assert kept == list(range(kept[0], 1500))
+
+
+def test_format_sse():
+    assert format_sse({"id": 7, "event": "job-created", "data": {"name": "ก"}}) == \
+        'id: 7\nevent: job-created\ndata: {"name": "ก"}\n\n'
+    assert format_sse({"id": None, "event": "stats", "data": {}}) == "event: stats\ndata: {}\n\n"
+
+
+def test_event_stream_requires_a_token(client):
+    assert client.get("/events").status_code == 401
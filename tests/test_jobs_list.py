@@ -0,0 +1,38 @@
+def test_pages_follow_the_cursor(client, upload_compare, master_codes):
+    created = [upload_compare(master_codes[i:i + 1])["job_id"] for i in range(3)]
+    everything = [j["job_id"] for j in client.get("/jobs").json()]
+    assert everything == sorted(everything, reverse=True)
+    assert set(created) <= set(everything)
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2} if cursor is None else {"limit": 2, "cursor": cursor}
+        r = client.get("/jobs", params=params)
+        page = [j["job_id"] for j in r.json()]
+        assert len(page) <= 2
+        seen += page
+        cursor = r.headers.get("x-next-cursor")
+        if cursor is None:
+            break
+    assert seen == everything
+
+
+def test_totals_of_a_job(client, upload_compare, master_codes):
+    job_id = upload_compare(master_codes[:2] + ["9999J9999"])["job_id"]
+    job = next(j for j in client.get("/jobs").json() if j["job_id"] == job_id)
+    assert (job["total_records"], job["matched_total"], job["unmatched_total"]) == (3, 2, 1)
+
+
+def test_etag_changes_when_a_job_changes(client, upload_compare, master_codes):
+    first = client.get("/jobs/count")
+    etag = first.headers["etag"]
+    assert client.get("/jobs/count", headers={"If-None-Match": etag}).status_code == 304
+
+    job_id = upload_compare(master_codes[:1])["job_id"]
+    after_create = client.get("/jobs/count", headers={"If-None-Match": etag})
+    assert after_create.status_code == 200
+    assert after_create.json()["count"] == first.json()["count"] + 1
+
+    etag = after_create.headers["etag"]
+    assert client.post(f"/jobs/{job_id}/pin", json={"pinned": True}).status_code == 200
+    assert client.get("/jobs/count", headers={"If-None-Match": etag}).status_code == 200
@@ -0,0 +1,116 @@
+import os
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+
+from app import master_index
+from app.master_index import FIELDS, MasterIndex
+
+KEYS = ["2001J0002", "1001X0001", "3001Y0003", "1001J0001"]
+# Values are strings, as load_master reads the workbook with dtype=str.
+COLUMNS = {
+    "customer": ["Beta", "Alpha", None, "Alpha"],
+    "province": ["เชียงใหม่", "กรุงเทพ", "กรุงเทพ", float("nan")],
+    "sla": ["99.5", None, "99.9", "99.5"],
+}
+
+
+def _index():
+    return MasterIndex.build(KEYS, COLUMNS)
+
+
+def test_lookup_finds_every_key_and_only_those():
+    index = _index()
+    pos = index.lookup(KEYS + ["9999J9999", "1001J00011", "ก001J0001", ""])
+    assert (pos[:4] >= 0).all() and (pos[4:] == -1).all()
+    assert [index.keys[p].decode("ascii") for p in pos[:4]] == KEYS
+
+
+def test_column_values_follow_the_looked_up_rows():
+    index = _index()
+    pos = index.lookup(KEYS + ["9999J9999"])
+    assert index.column("customer", pos).tolist() == ["Beta", "Alpha", None, "Alpha", None]
+    assert index.column("province", pos, missing="").tolist() == ["เชียงใหม่", "กรุงเทพ", "กรุงเทพ", "", ""]
+    calls = []
+    index.column("sla", pos, lambda v: calls.append(v) or v)
+    assert sorted(calls) == ["99.5", "99.9"]  # fn runs once per distinct value
+
+
+def test_records_match_the_input_rows():
+    rows = dict(_index().records())
+    assert rows["2001J0002"]["customer"] == "Beta"
+    assert rows["1001J0001"]["province"] is None
+    assert rows["1001X0001"]["branch"] is None
+    assert set(rows["1001X0001"]) == set(FIELDS)
+
+
+def test_from_rows_is_build_by_key():
+    index = MasterIndex.from_rows({"1001J0001": {"customer": "Alpha"}, "0001J0001": {"customer": None}})
+    assert index.column("customer", index.lookup(["1001J0001", "0001J0001"])).tolist() == ["Alpha", None]
+
+
+def test_empty_index_matches_nothing():
+    index = MasterIndex.build([], {})
+    pos = index.lookup(["1001J0001"])
+    assert pos.tolist() == [-1]
+    assert index.column("customer", pos, missing="").tolist() == [""]
+    assert index.lookup([]).dtype == np.int64
+
+
+def _same(a, b, codes):
+    pa, pb = a.lookup(codes), b.lookup(codes)
+    assert pa.tolist() == pb.tolist()
+    for field in FIELDS:
+        assert a.column(field, pa).tolist() == b.column(field, pb).tolist()
+
+
+def test_save_and_open_round_trip(tmp_path):
+    index = _index()
+    path = str(tmp_path / "master.idx")
+    index.save(path)
+    opened = MasterIndex.open(path)
+    _same(index, opened, KEYS + ["9999J9999"])
+    assert dict(opened.records()) == dict(index.records())
+
+
+def test_empty_index_round_trip(tmp_path):
+    path = str(tmp_path / "empty.idx")
+    MasterIndex.build([], {}).save(path)
+    opened = MasterIndex.open(path)
+    assert len(opened) == 0
+    assert opened.lookup(["1001J0001"]).tolist() == [-1]
+
+
+def test_open_rejects_other_files(tmp_path):
+    path = tmp_path / "other.idx"
+    path.write_bytes(b"not an index")
+    with pytest.raises(ValueError):
+        MasterIndex.open(str(path))
+
+
+def test_shared_index_is_built_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(master_index, "MASTER_INDEX_DIR", str(tmp_path))
+    monkeypatch.setattr(master_index, "_opened", OrderedDict())
+    builds = []
+
+    def build():
+        builds.append(1)
+        return _index()
+
+    first = master_index.shared_master_index("a" * 64, build)
+    master_index._opened.clear()  # as another worker would see it
+    second = master_index.shared_master_index("a" * 64, build)
+    assert len(builds) == 1
+    _same(first, second, KEYS)
+
+
+def test_old_index_files_are_pruned(tmp_path, monkeypatch):
+    monkeypatch.setattr(master_index, "MASTER_INDEX_DIR", str(tmp_path))
+    monkeypatch.setattr(master_index, "MASTER_INDEX_KEEP", 2)
+    monkeypatch.setattr(master_index, "_opened", OrderedDict())
+    for i, sha in enumerate("abc"):
+        master_index.shared_master_index(sha * 64, _index)
+        os.utime(tmp_path / f"{sha * 64}.idx", (i, i))
+    master_index._prune_index_files()
+    assert sorted(os.listdir(tmp_path)) == ["b" * 64 + ".idx", "c" * 64 + ".idx"]
@@ -0,0 +1,70 @@
+import random
+
+import numpy as np
+import pytest
+
+from app.master_suggest import DeletionIndex
+
+
+def osa(a, b):
+    """Optimal string alignment distance, the textbook dynamic program."""
+    d = [[0] * (len(b) + 1) for _ in range(len(a) + 1)]
+    for i in range(len(a) + 1):
+        d[i][0] = i
+    for j in range(len(b) + 1):
+        d[0][j] = j
+    for i in range(1, len(a) + 1):
+        for j in range(1, len(b) + 1):
+            d[i][j] = min(d[i - 1][j] + 1, d[i][j - 1] + 1, d[i - 1][j - 1] + (a[i - 1] != b[j - 1]))
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                d[i][j] = min(d[i][j], d[i - 2][j - 2] + 1)
+    return d[len(a)][len(b)]
+
+
+def brute_force(keys, code, limit, max_distance):
+    near = [(osa(code, k), k) for k in keys]
+    return [(k, d) for d, k in sorted(near) if 1 <= d <= max_distance][:limit]
+
+
+def typo(code, rnd):
+    i = rnd.randrange(len(code) - 1)
+    kind = rnd.randrange(4)
+    if kind == 0:
+        return code[:i] + rnd.choice("0123456789JYX") + code[i + 1:]
+    if kind == 1:
+        return code[:i] + code[i + 1] + code[i] + code[i + 2:]
+    if kind == 2:
+        return code[:i] + code[i + 1:]
+    return code[:i] + rnd.choice("0123456789") + code[i:]
+
+
+@pytest.fixture(scope="module")
+def keys():
+    rnd = random.Random(50)
+    # Few distinct digits, so many keys are within one or two edits of each other.
+    codes = {f"{rnd.randrange(100):04d}{rnd.choice('JY')}{rnd.randrange(100):04d}" for _ in range(200)}
+    codes |= {"0000J0000", "0000J00", "12J3"}
+    return sorted(codes)
+
+
+@pytest.mark.parametrize("max_distance", [1, 2])
+def test_suggestions_match_brute_force(keys, max_distance):
+    rnd = random.Random(max_distance)
+    queries = [typo(rnd.choice(keys), rnd) for _ in range(80)]
+    queries += [typo(typo(rnd.choice(keys), rnd), rnd) for _ in range(30)]
+    queries += [rnd.choice(keys), "", "X", "0000J0000000", "๑๒J3"]
+    index = DeletionIndex(np.array(keys, dtype="S"), max_distance)
+    found = index.suggest(queries, limit=3, max_distance=max_distance)
+    for code, near in zip(queries, found):
+        assert near == brute_force(keys, code, 3, max_distance), code
+
+
+def test_distance_is_capped_at_the_index():
+    index = DeletionIndex(np.array(["1001J0001"], dtype="S"), 1)
+    assert index.suggest(["10J0001"], max_distance=2) == [[]]
+    assert DeletionIndex(np.array(["1001J0001"], dtype="S"), 2).suggest(["10J0001"], max_distance=2) == [[("1001J0001", 2)]]
+
+
+def test_empty_inputs():
+    assert DeletionIndex(np.array([], dtype="S1")).suggest(["1001J0001"]) == [[]]
+    assert DeletionIndex(np.array(["1001J0001"], dtype="S")).suggest([]) == []
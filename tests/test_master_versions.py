@@ -0,0 +1,35 @@
+from conftest import compare_csv_text, write_master
+
+
+def _compare(client, codes):
+    r = client.post("/compare-upload", params={"force": True},
+                    files={"compare_file": ("compare.csv", compare_csv_text(codes), "text/csv")})
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def test_compare_runs_against_the_active_version(client, admin_headers, import_master, master_xlsx,
+                                                 master_codes, tmp_path):
+    first = import_master(master_xlsx)
+    assert (first["row_count"], first["active"]) == (len(master_codes), True)
+    res = _compare(client, master_codes[:10] + ["9999X0001"])
+    assert res["master_version_id"] == first["version_id"]
+    assert (res["matched_total"], res["unmatched_total"]) == (10, 1)
+
+    smaller = import_master(write_master(tmp_path / "smaller.xlsx", rows=5))
+    assert smaller["row_count"] == 5
+    res = _compare(client, master_codes[:10])
+    assert (res["master_version_id"], res["matched_total"]) == (smaller["version_id"], 5)
+
+    versions = client.get("/admin/master/versions", headers=admin_headers).json()
+    assert [v["version_id"] for v in versions if v["active"]] == [smaller["version_id"]]
+    rolled_back = client.post("/admin/master/rollback", headers=admin_headers).json()
+    assert rolled_back["version_id"] == first["version_id"]
+    assert _compare(client, master_codes[:10])["matched_total"] == 10
+
+
+def test_import_needs_admin_and_a_workbook(client, admin_headers):
+    files = {"master_file": ("master.xlsx", b"not a workbook", "application/octet-stream")}
+    assert client.post("/admin/master/import", files=files).status_code == 401
+    assert client.post("/admin/master/import", headers=admin_headers, files=files).status_code == 400
+    assert client.post("/admin/master/versions/999999/activate", headers=admin_headers).status_code == 404
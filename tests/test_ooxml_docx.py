@@ -0,0 +1,64 @@
+import shutil
+import zipfile
+from pathlib import Path
+
+import pytest
+from docx import Document
+
+from app import ooxml_replace
+from app.replace_rules import single_needle
+from app.text_replace_engine import _replace_text_in_docx_safe
+
+
+@pytest.fixture(scope="module")
+def source(tmp_path_factory):
+    path = tmp_path_factory.mktemp("docx") / "source.docx"
+    doc = Document()
+    for _ in range(20):
+        p = doc.add_paragraph()
+        p.add_run("บริษัท ABC ").bold = True
+        p.add_run("จำกัด ")
+        p.add_run("AB")
+        p.add_run("C")
+        p.add_run(" Corp")
+    doc.add_table(rows=2, cols=2).cell(0, 0).text = "ABC in table"
+    doc.sections[0].header.paragraphs[0].text = "Header ABC"
+    doc.save(path)
+    return path
+
+
+def _texts(path):
+    doc = Document(path)
+    return ([p.text for p in doc.paragraphs]
+            + [doc.tables[0].cell(0, 0).text, doc.sections[0].header.paragraphs[0].text])
+
+
+@pytest.mark.parametrize("chunk_size", [7, 256 * 1024])
+@pytest.mark.parametrize("find_text, replace_text", [
+    ("ABC", "X&Y <z>"),    # markup in the replacement is escaped
+    ("ABC Corp", "Q"),     # a match spanning several runs
+    ("จำกัด ABC", " lead"),
+    ("Header", "H"),
+    ("zzz", "never"),
+])
+def test_stream_matches_legacy(source, tmp_path, monkeypatch, chunk_size, find_text, replace_text):
+    monkeypatch.setattr(ooxml_replace, "_CHUNK_SIZE", chunk_size)
+    stream_path, legacy_path = tmp_path / "stream.docx", tmp_path / "legacy.docx"
+    total, _ = ooxml_replace.replace_in_docx(str(source), str(stream_path), single_needle(find_text, replace_text))
+    shutil.copy(source, legacy_path)
+    legacy_total = _replace_text_in_docx_safe(Path(legacy_path), find_text, replace_text)
+
+    assert total == legacy_total
+    assert _texts(stream_path) == _texts(legacy_path)
+    with zipfile.ZipFile(stream_path) as z:
+        assert z.testzip() is None
+
+
+def test_unchanged_members_are_copied_raw(source, tmp_path):
+    out = tmp_path / "out.docx"
+    ooxml_replace.replace_in_docx(str(source), str(out), single_needle("ABC", "X"))
+    with zipfile.ZipFile(source) as a, zipfile.ZipFile(out) as b:
+        assert a.namelist() == b.namelist()
+        for info in a.infolist():
+            if not ooxml_replace.DOCX_TEXT_PARTS.match(info.filename):
+                assert b.read(info.filename) == a.read(info.filename)
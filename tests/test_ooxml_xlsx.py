@@ -0,0 +1,89 @@
+import shutil
+import zipfile
+from datetime import datetime, time
+from pathlib import Path
+
+import pytest
+from openpyxl import Workbook, load_workbook
+
+from app import ooxml_replace
+from app.replace_rules import single_needle
+from app.text_replace_engine import _replace_text_in_xlsx_safe
+
+INLINE_CELL = b'<c r="Z1" t="inlineStr"><is><r><t>AB</t></r><r><t>C &amp; inline</t></r></is></c></row>'
+
+
+@pytest.fixture(scope="module", params=["shared", "inline"])
+def source(request, tmp_path_factory):
+    folder = tmp_path_factory.mktemp("xlsx")
+    path = folder / "source.xlsx"
+    wb = Workbook()
+    ws = wb.active
+    for r in range(1, 51):
+        ws.cell(r, 1, f"ABC row {r}")
+        ws.cell(r, 2, r)
+        ws.cell(r, 3, '=A1&"ABC"')
+        ws.cell(r, 4, "shared ABC")
+    wb.save(path)
+    if request.param == "shared":
+        return path
+    # openpyxl writes shared strings only; add an inline string cell by hand.
+    inline = folder / "inline.xlsx"
+    with zipfile.ZipFile(path) as zin, zipfile.ZipFile(inline, "w", zipfile.ZIP_DEFLATED) as zout:
+        for info in zin.infolist():
+            data = zin.read(info)
+            if info.filename == "xl/worksheets/sheet1.xml":
+                data = data.replace(b"</row>", INLINE_CELL, 1)
+            zout.writestr(info, data)
+    return inline
+
+
+def _values(path):
+    wb = load_workbook(path)
+    return [[c.value for c in row] for ws in wb for row in ws.iter_rows()]
+
+
+@pytest.mark.parametrize("chunk_size", [5, 256 * 1024])
+@pytest.mark.parametrize("find_text, replace_text", [
+    ("ABC", "X<Y"),
+    ("1", "9"),        # numbers stay numbers
+    ("1", "x"),        # and become text when they no longer parse
+    ("row 1", " r "),
+    ("zzz", "q"),
+])
+def test_stream_matches_legacy(source, tmp_path, monkeypatch, chunk_size, find_text, replace_text):
+    monkeypatch.setattr(ooxml_replace, "_CHUNK_SIZE", chunk_size)
+    stream_path, legacy_path = tmp_path / "stream.xlsx", tmp_path / "legacy.xlsx"
+    total, _ = ooxml_replace.replace_in_xlsx(str(source), str(stream_path), single_needle(find_text, replace_text))
+    shutil.copy(source, legacy_path)
+    legacy_total = _replace_text_in_xlsx_safe(Path(legacy_path), find_text, replace_text)
+
+    assert total == legacy_total
+    assert _values(stream_path) == _values(legacy_path)
+
+
+def test_formulas_are_left_alone(source, tmp_path):
+    out = tmp_path / "out.xlsx"
+    ooxml_replace.replace_in_xlsx(str(source), str(out), single_needle("ABC", "Q"))
+    assert _values(out)[0][2] == '=A1&"ABC"'
+
+
+def test_dates_are_not_rewritten_as_serial_numbers(tmp_path):
+    source = tmp_path / "dates.xlsx"
+    wb = Workbook()
+    ws = wb.active
+    ws.append([datetime(2024, 1, 1), time(4, 30), 45, "45 days"])
+    ws["E1"] = 45292
+    ws["E1"].number_format = "dd/mm/yyyy"
+    wb.save(source)
+
+    stream_path, legacy_path = tmp_path / "stream.xlsx", tmp_path / "legacy.xlsx"
+    total, _ = ooxml_replace.replace_in_xlsx(str(source), str(stream_path), single_needle("45", "99"))
+    shutil.copy(source, legacy_path)
+    assert total == _replace_text_in_xlsx_safe(Path(legacy_path), "45", "99") == 2
+    assert _values(stream_path) == _values(legacy_path)
+    assert _values(stream_path)[0][:3] == [datetime(2024, 1, 1), time(4, 30), 99]
+
+    with open(source, "rb") as f:
+        scanned, _, _ = ooxml_replace.scan_xlsx(f, single_needle("45", "99"))
+    assert scanned == total
@@ -0,0 +1,28 @@
+import pytest
+
+from app.query_plans import HOT_QUERIES, check_query_plans, plan_problems
+
+
+@pytest.fixture(scope="module")
+def report():
+    return check_query_plans()
+
+
+@pytest.mark.parametrize("name", sorted(HOT_QUERIES))
+def test_hot_query_plan_uses_indexes(report, name):
+    plan = report[name]["plan"]
+    assert plan, f"no EXPLAIN QUERY PLAN output for {name}"
+    assert report[name]["problems"] == [], "\n".join(plan)
+
+
+def test_full_scan_is_a_problem():
+    assert plan_problems(["SCAN compare_results"]) == ["full scan: SCAN compare_results"]
+
+
+def test_allowed_scan_and_index_scan_pass():
+    plan = ["SCAN compare_dimensions", "SCAN compare_results USING INDEX ix_results_job"]
+    assert plan_problems(plan, ("compare_dimensions",)) == []
+
+
+def test_temp_sort_is_a_problem():
+    assert plan_problems(["USE TEMP B-TREE FOR ORDER BY"]) == ["temp sort: USE TEMP B-TREE FOR ORDER BY"]
@@ -0,0 +1,55 @@
+from sqlalchemy.orm import sessionmaker
+
+from app.database import engine
+from app.db_models import CompareResult, CompareSession
+from app.records_cache import ResponseCache, records_cache
+
+
+def test_lru_is_bounded_by_body_size():
+    cache = ResponseCache(4000)
+    for i in range(5):
+        cache.put((i, "page"), b"x" * 900)
+    assert cache.get((0, "page")) is None
+    assert cache.get((4, "page"))[0] == b"x" * 900
+    assert cache.stats()["bytes"] <= 4000 and cache.evictions == 1
+
+
+def test_oversized_bodies_are_not_cached():
+    cache = ResponseCache(4000)
+    etag = cache.put((1,), b"x" * 1001)
+    assert etag == ResponseCache.etag_for(b"x" * 1001)
+    assert cache.get((1,)) is None
+
+
+def test_invalidate_job_drops_only_that_job():
+    cache = ResponseCache(10_000)
+    cache.put((1, "a"), b"a")
+    cache.put((1, "b"), b"b")
+    cache.put((2, "a"), b"c")
+    cache.invalidate_job(1)
+    assert cache.get((1, "a")) is None and cache.get((1, "b")) is None
+    assert cache.get((2, "a"))[0] == b"c"
+    assert cache.stats()["bytes"] == 1
+
+
+def test_records_revalidate_with_etag(client, upload_compare, master_codes):
+    job_id = upload_compare(master_codes[:3] + ["9999J9999"])["job_id"]
+    first = client.get(f"/jobs/{job_id}/records")
+    assert first.status_code == 200
+    assert sorted(r["status"] for r in first.json()) == ["Found"] * 3 + ["Unmatched"]
+    hits = records_cache.hits
+    again = client.get(f"/jobs/{job_id}/records", headers={"If-None-Match": first.headers["etag"]})
+    assert again.status_code == 304
+    assert records_cache.hits == hits + 1
+
+
+def test_job_deleted_elsewhere_is_not_served(client, upload_compare, master_codes):
+    job_id = upload_compare(master_codes[5:6])["job_id"]
+    assert client.get(f"/jobs/{job_id}/records").status_code == 200
+    # As another worker would: straight in the database, bypassing this cache.
+    db = sessionmaker(bind=engine)()
+    db.query(CompareResult).filter(CompareResult.session_id == job_id).delete()
+    db.query(CompareSession).filter(CompareSession.id == job_id).delete()
+    db.commit()
+    db.close()
+    assert client.get(f"/jobs/{job_id}/records").status_code == 404
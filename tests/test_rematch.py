@@ -0,0 +1,32 @@
+from conftest import write_master
+
+
+def test_rematch_counts_distinct_circuits(client, upload_compare, import_master, master_codes, tmp_path):
+    codes = master_codes[:8] + master_codes[:2] + ["9999X0001"]
+    source = upload_compare(codes)
+    version = import_master(write_master(tmp_path / "smaller.xlsx", rows=4))
+
+    r = client.post(f"/jobs/{source['job_id']}/rematch")
+    assert r.status_code == 200, r.text
+    job = r.json()
+    assert job["source_job_id"] == source["job_id"] and job["job_id"] != source["job_id"]
+    assert job["distinct"] is True and job["master_version_id"] == version["version_id"]
+    assert (job["matched_total"], job["unmatched_total"], job["total_records"]) == (4, 5, 9)
+
+    listed = {j["job_id"]: j for j in client.get("/jobs").json()}
+    assert listed[job["job_id"]]["source_job_id"] == source["job_id"]
+    assert listed[source["job_id"]]["source_job_id"] is None
+
+
+def test_bulk_rematch_skips_missing_jobs(client, admin_headers, upload_compare, import_master, master_xlsx,
+                                         master_codes):
+    source = upload_compare(master_codes[:3])
+    import_master(master_xlsx)
+    assert client.post("/jobs/999999/rematch").status_code == 404
+
+    r = client.post("/admin/jobs/rematch", headers=admin_headers,
+                    json={"job_ids": [source["job_id"], 999999, source["job_id"]]})
+    body = r.json()
+    assert [j["source_job_id"] for j in body["rematched"]] == [source["job_id"]]
+    assert body["rematched"][0]["matched_total"] == 3
+    assert body["skipped"] == [{"job_id": 999999, "reason": "not_found"}]
@@ -0,0 +1,82 @@
+import random
+
+import pytest
+
+from app.replace_rules import (
+    AhoCorasick, compile_rules, parse_rules_csv, parse_rules_json, single_needle,
+)
+
+
+def leftmost_longest(rules, text):
+    """Reference matcher: at each position the longest rule wins, then skip past it."""
+    spans, i = [], 0
+    while i < len(text):
+        best = None
+        for idx, (find_text, replace_text) in enumerate(rules):
+            if text.startswith(find_text, i) and (best is None or len(find_text) > len(rules[best][0])):
+                best = idx
+        if best is None:
+            i += 1
+            continue
+        end = i + len(rules[best][0])
+        spans.append((i, end, rules[best][1], best))
+        i = end
+    return spans
+
+
+def test_longest_rule_wins():
+    rules = [("ABC", "x"), ("ABC Corp", "y"), ("Corp", "z")]
+    assert AhoCorasick(rules).find_spans("ABC Corp and ABC Corpus") == [
+        (0, 8, "y", 1), (13, 21, "y", 1),
+    ]
+
+
+def test_short_rule_inside_a_failed_long_match():
+    rules = [("abcd", "1"), ("bc", "2")]
+    assert AhoCorasick(rules).find_spans("abce") == [(1, 3, "2", 1)]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_matches_reference(seed):
+    rnd = random.Random(seed)
+    finds = {"".join(rnd.choice("abก") for _ in range(rnd.randint(1, 4))) for _ in range(rnd.randint(2, 8))}
+    rules = [(f, f"<{i}>") for i, f in enumerate(sorted(finds))]
+    text = "".join(rnd.choice("abกc") for _ in range(300))
+    assert AhoCorasick(rules).find_spans(text) == leftmost_longest(rules, text)
+
+
+def test_single_rule_behaves_like_str_replace():
+    find_spans = compile_rules([("aa", "b")])
+    text = "aaaaa"
+    spans = find_spans(text)
+    assert spans == single_needle("aa", "b")(text) == [(0, 2, "b", 0), (2, 4, "b", 0)]
+    out, last = [], 0
+    for start, end, repl, _ in spans:
+        out += [text[last:start], repl]
+        last = end
+    assert "".join(out) + text[last:] == text.replace("aa", "b")
+
+
+def test_parse_rules_json_forms():
+    assert parse_rules_json('[{"find": "a", "replace": "b"}, ["c", "d"]]') == [("a", "b"), ("c", "d")]
+    assert parse_rules_json('["a", {"find": "b"}]', require_replace=False) == [("a", ""), ("b", "")]
+
+
+@pytest.mark.parametrize("raw, message", [
+    ("{}", "JSON list"),
+    ("[]", "No replacement rules"),
+    ('[["a", "b"], ["a", "c"]]', "duplicate"),
+    ('[["a", " "]]', "cannot be empty"),
+    ('[["a", 1]]', "must be strings"),
+])
+def test_parse_rules_json_errors(raw, message):
+    with pytest.raises(ValueError, match=message):
+        parse_rules_json(raw)
+
+
+def test_parse_rules_csv():
+    content = "find,replace\nบริษัท ก,บริษัท ข\n\n\"a,b\",c\n".encode("utf-8-sig")
+    assert parse_rules_csv(content) == [("บริษัท ก", "บริษัท ข"), ("a,b", "c")]
+    assert parse_rules_csv("ก\n".encode("cp874"), require_replace=False) == [("ก", "")]
+    with pytest.raises(ValueError, match="expected find,replace"):
+        parse_rules_csv(b"only\n")
@@ -0,0 +1,74 @@
+import io
+import os
+import time
+import uuid
+import zipfile
+
+import pytest
+
+from app import result_cache
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(result_cache, "TEXT_REPLACE_CACHE_DIR", str(tmp_path / "cache"))
+    return tmp_path
+
+
+def _file(folder, name, content):
+    path = folder / name
+    path.write_bytes(content)
+    return str(path)
+
+
+def test_key_covers_engine_rules_and_bytes(cache_dir):
+    path = _file(cache_dir, "in.docx", b"input")
+    key = result_cache.cache_key(path, [("a", "b")], "stream-1")
+    assert key == result_cache.cache_key(path, [("a", "b")], "stream-1")
+    assert key != result_cache.cache_key(path, [("a", "c")], "stream-1")
+    assert key != result_cache.cache_key(path, [("a", "b")], "legacy-1")
+    assert key != result_cache.cache_key(_file(cache_dir, "other.docx", b"inpuT"), [("a", "b")], "stream-1")
+
+
+def test_put_then_fetch_restores_the_output(cache_dir):
+    path = _file(cache_dir, "in.docx", b"input")
+    key = result_cache.cache_key(path, [("a", "b")], "stream-1")
+    assert result_cache.fetch(key, path) is None
+    result_cache.put(key, _file(cache_dir, "out.docx", b"output"), 3, [2, 1])
+
+    assert result_cache.fetch(key, path) == (3, [2, 1])
+    with open(path, "rb") as f:
+        assert f.read() == b"output"
+    assert result_cache.fetch(None, path) is None
+    assert result_cache.stats()["entries"] == 1
+
+
+def test_prune_drops_least_recently_used(cache_dir):
+    out = _file(cache_dir, "out.docx", b"x" * 1000)
+    keys = [uuid.uuid4().hex for _ in range(3)]
+    for age, key in zip((30, 20, 10), keys):
+        result_cache.put(key, out, 1, [1])
+        entry = result_cache._entry_path(key)
+        os.utime(entry, (time.time() - age, time.time() - age))
+    # A hit refreshes the entry, so the oldest write survives.
+    assert result_cache.fetch(keys[0], _file(cache_dir, "in.docx", b"")) is not None
+
+    assert result_cache.prune(max_bytes=1500) == 2
+    assert [os.path.exists(result_cache._entry_path(k)) for k in keys] == [True, False, False]
+
+
+def test_repeated_request_is_served_from_cache(client, upload_files):
+    data = {"find_text": "ABC", "replace_text": f"X{uuid.uuid4().hex[:8]}"}
+    first = client.post("/text-replace/process", data=data, files=upload_files(["a.docx", "b.xlsx"])).json()
+    second = client.post("/text-replace/process", data=data, files=upload_files(["a.docx", "b.xlsx"])).json()
+    assert first["summary"]["cache_hits"] == 0
+    assert second["summary"]["cache_hits"] == 2
+    assert [f["cache_hit"] for f in second["results"]["successful"]] == [True, True]
+
+    # The cached output is the same document the first run produced.
+    documents = []
+    for run in (first, second):
+        download = client.get(f"/text-replace/download/{run['zip_id']}")
+        with zipfile.ZipFile(io.BytesIO(download.content)) as z:
+            documents.append((z.read("a.docx"), z.read("b.xlsx")))
+    assert documents[0] == documents[1]
@@ -0,0 +1,43 @@
+import io
+import zipfile
+
+from docx import Document
+
+
+def _archive(members):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as z:
+        for name, content in members.items():
+            z.writestr(name, content)
+    return [("archive", ("folder.zip", buf.getvalue(), "application/zip"))]
+
+
+def test_folder_paths_are_kept(client, documents):
+    members = {
+        "reports/2024/a.docx": documents["a.docx"],
+        "reports/b.xlsx": documents["b.xlsx"],
+        "reports/notes.txt": b"ABC",
+        "__MACOSX/reports/._a.docx": b"junk",
+        "reports/../escape.docx": documents["a.docx"],
+    }
+    r = client.post("/text-replace/process-archive", data={"find_text": "ABC", "replace_text": "XYZ"},
+                    files=_archive(members))
+    assert r.status_code == 200
+    results = r.json()["results"]
+    assert results["total_files"] == 4
+    assert sorted(f["original_name"] for f in results["failed"]) == ["reports/../escape.docx", "reports/notes.txt"]
+
+    download = client.get(f"/text-replace/download/{r.json()['zip_id']}")
+    with zipfile.ZipFile(io.BytesIO(download.content)) as z:
+        assert {"reports/2024/a.docx", "reports/b.xlsx"} <= set(z.namelist())
+        paragraphs = [p.text for p in Document(io.BytesIO(z.read("reports/2024/a.docx"))).paragraphs]
+    assert paragraphs == ["บริษัท XYZ จำกัด", "XYZ Corp"]
+
+
+def test_rejects_bad_archives(client):
+    bad = [("archive", ("folder.zip", b"not a zip", "application/zip"))]
+    r = client.post("/text-replace/process-archive", data={"find_text": "ABC", "replace_text": "XYZ"}, files=bad)
+    assert r.status_code == 400
+    r = client.post("/text-replace/process-archive", data={"find_text": "ABC", "replace_text": "XYZ"},
+                    files=_archive({"empty/": b""}))
+    assert r.status_code == 400
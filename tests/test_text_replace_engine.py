@@ -0,0 +1,41 @@
+import asyncio
+import os
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from app import text_replace_engine
+from app.text_replace_engine import _run_in_pool, get_process_pool
+
+
+@pytest.fixture
+def pool():
+    yield
+    with text_replace_engine._pool_lock:
+        pool, text_replace_engine._pool = text_replace_engine._pool, None
+    if pool is not None:
+        pool.shutdown(cancel_futures=True)
+
+
+def test_calls_run_in_the_pool(pool):
+    assert asyncio.run(_run_in_pool(os.getpid)) != os.getpid()
+
+
+def test_pool_is_replaced_after_a_worker_dies(pool):
+    async def run():
+        with pytest.raises(BrokenProcessPool):
+            await _run_in_pool(os._exit, 1)
+        return await _run_in_pool(pow, 2, 10)
+
+    first = get_process_pool()
+    assert asyncio.run(run()) == 1024
+    assert get_process_pool() is not first
+
+
+def test_pool_broken_before_submit_is_retried(pool):
+    broken = get_process_pool()
+    broken.shutdown()
+    # A shut down pool refuses work with RuntimeError; one whose worker died, with BrokenProcessPool.
+    broken._broken = "worker died"
+    assert asyncio.run(_run_in_pool(pow, 3, 2)) == 9
+    assert get_process_pool() is not broken
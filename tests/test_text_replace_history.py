@@ -0,0 +1,40 @@
+import uuid
+from datetime import datetime, timedelta
+
+from app.database import SessionLocal
+from app.models import TextReplaceHistory
+
+
+def _add_rows(created_at, count):
+    db = SessionLocal()
+    try:
+        for _ in range(count):
+            db.add(TextReplaceHistory(
+                zip_id=str(uuid.uuid4()), find_text="a", replace_text="b", total_files=1, successful=1, failed=0,
+                success_rate="100.0%", zip_path="", artifact_id=None, zip_available=False,
+                expires_at=created_at + timedelta(days=1), created_at=created_at))
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_cursor_pages_cover_history_once(client):
+    # Rows sharing a timestamp are split across pages by id.
+    now = datetime.now().replace(microsecond=0)
+    _add_rows(now - timedelta(minutes=1), 3)
+    _add_rows(now, 4)
+    expected = [row["id"] for row in client.get("/text-replace/history", params={"limit": 200}).json()["history"]]
+    assert len(expected) >= 7
+
+    seen, cursor = [], None
+    while True:
+        r = client.get("/text-replace/history", params={"limit": 2, **({"cursor": cursor} if cursor else {})})
+        page = r.json()
+        assert len(page["history"]) <= 2
+        seen += [row["id"] for row in page["history"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            assert "x-next-cursor" not in r.headers
+            break
+        assert r.headers["x-next-cursor"] == str(cursor)
+    assert seen == expected
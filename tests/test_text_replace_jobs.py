@@ -0,0 +1,96 @@
+import json
+import time
+
+import pytest
+
+from app import text_replace_jobs
+from app.text_replace_jobs import TextReplaceJob, fail_stale_jobs, load_job
+
+JOB_ID = "00000000-0000-4000-8000-000000000000"
+
+
+@pytest.fixture
+def events(tmp_path, monkeypatch):
+    published = []
+    monkeypatch.setattr(text_replace_jobs, "TEXT_REPLACE_JOBS_DIR", str(tmp_path))
+    monkeypatch.setattr(text_replace_jobs, "publish_event", lambda kind, data: published.append((kind, data)))
+    return published
+
+
+def _job(count=3):
+    files = [{"index": i, "original_name": f"{i}.docx", "error": None} for i in range(count)]
+    return TextReplaceJob(JOB_ID, files, [{"find": "a", "replace": "b"}])
+
+
+def _age(tmp_path, seconds):
+    path = tmp_path / f"{JOB_ID}.json"
+    state = json.loads(path.read_text(encoding="utf-8"))
+    state["updated_at"] -= seconds
+    path.write_text(json.dumps(state), encoding="utf-8")
+
+
+def test_file_updates_are_coalesced(events):
+    job = _job(100)
+    job.start()
+    for i in range(100):
+        job.update_file(i, status="done")
+    job.finish("zip", {"processed": 100})
+
+    progress = [data for kind, data in events if kind == "text-replace-progress"]
+    assert len(progress) < 10
+    assert sorted(f["index"] for data in progress for f in data["files"]) == list(range(100))
+    assert progress[-1]["counts"]["done"] == 100
+    assert load_job(JOB_ID)["files"][99]["status"] == "done"
+
+
+def test_stale_job_is_failed_on_load(tmp_path, events):
+    job = _job()
+    job.start()
+    job.update_file(0, status="done")
+    job._flush()
+    _age(tmp_path, text_replace_jobs.TEXT_REPLACE_JOB_STALE_SECONDS + 1)
+
+    state = load_job(JOB_ID)
+    assert state["status"] == "failed"
+    assert [f["status"] for f in state["files"]] == ["done", "failed", "failed"]
+    assert json.loads((tmp_path / f"{JOB_ID}.json").read_text(encoding="utf-8"))["status"] == "failed"
+    assert events[-1][0] == "text-replace-job" and events[-1][1]["status"] == "failed"
+
+
+def test_live_and_finished_jobs_are_left_alone(tmp_path, events):
+    job = _job()
+    job.start()
+    assert fail_stale_jobs() == 0
+    assert load_job(JOB_ID)["status"] == "processing"
+
+    job.finish("zip", {"processed": 3})
+    _age(tmp_path, text_replace_jobs.TEXT_REPLACE_JOB_STALE_SECONDS + 1)
+    assert fail_stale_jobs() == 0
+    assert load_job(JOB_ID)["status"] == "done"
+
+
+def test_startup_sweep_fails_stale_jobs(tmp_path, events):
+    _job().start()
+    _age(tmp_path, text_replace_jobs.TEXT_REPLACE_JOB_STALE_SECONDS + 1)
+    assert fail_stale_jobs() == 1
+    assert load_job(JOB_ID)["status"] == "failed"
+
+
+def test_job_mode_runs_in_the_background(client, upload_files):
+    r = client.post("/text-replace/process", data={"find_text": "ABC", "replace_text": "XYZ", "mode": "job"},
+                    files=upload_files(["a.docx", "b.xlsx"]))
+    assert r.status_code == 202
+    status_url = r.json()["status_url"]
+    for _ in range(200):
+        state = client.get(status_url).json()
+        if state["status"] not in ("queued", "processing"):
+            break
+        time.sleep(0.05)
+    assert state["status"] == "done"
+    assert [f["status"] for f in state["files"]] == ["done", "done"]
+    assert client.get(f"/text-replace/download/{state['zip_id']}").status_code == 200
+
+
+def test_unknown_job_is_404(client):
+    assert client.get(f"/text-replace/jobs/{JOB_ID}").status_code == 404
+    assert client.get("/text-replace/jobs/not-a-job-id").status_code == 404
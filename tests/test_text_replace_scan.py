@@ -0,0 +1,36 @@
+import pytest
+
+from app.text_replace_engine import _replace_file, scan_file
+
+RULES = [("ABC", "x"), ("Corp", "y"), ("absent", "z")]
+
+
+@pytest.mark.parametrize("name", ["a.docx", "b.xlsx"])
+def test_scan_counts_what_a_replace_would(tmp_path, documents, name):
+    ext = name.rsplit(".", 1)[1]
+    scanned = scan_file(documents[name], ext, [f for f, _ in RULES])
+    path = tmp_path / name
+    path.write_bytes(documents[name])
+    total, counts = _replace_file(str(path), ext, RULES)
+    assert (scanned["matches"], scanned["rule_counts"]) == (total, counts)
+    assert path.read_bytes() != documents[name]
+
+
+def test_scan_locations(documents):
+    docx = scan_file(documents["a.docx"], "docx", ["Corp"])
+    assert len(docx["locations"]) == 1 and not docx["locations_truncated"]
+    xlsx = scan_file(documents["b.xlsx"], "xlsx", ["ABC"])
+    assert [loc["cell"] for loc in xlsx["locations"]] == ["A1", "A2"]
+
+
+def test_scan_endpoint(client, upload_files, documents):
+    r = client.post("/text-replace/scan", data={"rules": '["ABC", "Corp"]'},
+                    files=upload_files(["a.docx", "b.xlsx", "bad.docx"], {"bad.docx": b"not a document"}))
+    assert r.status_code == 200
+    body = r.json()
+    a, b, bad = body["results"]
+    assert (a["matches"], a["rule_counts"]) == (3, [2, 1])
+    assert (b["matches"], b["rule_counts"]) == (2, [2, 0])
+    assert bad["error"]
+    assert body["summary"]["rules"] == [{"find": "ABC", "matches": 4}, {"find": "Corp", "matches": 1}]
+    assert body["summary"]["scanned"] == 2 and body["summary"]["failed"] == 1
@@ -0,0 +1,45 @@
+import io
+import json
+import zipfile
+
+from docx import Document
+
+
+def test_streamed_zip_matches_the_download(client, upload_files):
+    r = client.post("/text-replace/process", data={"find_text": "ABC", "replace_text": "XYZ", "stream": "true"},
+                    files=upload_files(["a.docx", "b.xlsx"]))
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "application/zip"
+    zip_id = r.headers["x-zip-id"]
+
+    with zipfile.ZipFile(io.BytesIO(r.content)) as z:
+        assert sorted(z.namelist()) == ["a.docx", "b.xlsx", "results.json"]
+        # Documents are already deflated, so they are stored as they are.
+        assert z.getinfo("a.docx").compress_type == zipfile.ZIP_STORED
+        manifest = json.loads(z.read("results.json"))
+        paragraphs = [p.text for p in Document(io.BytesIO(z.read("a.docx"))).paragraphs]
+    assert manifest["zip_id"] == zip_id
+    assert manifest["summary"]["successful"] == 2
+    assert paragraphs == ["บริษัท XYZ จำกัด", "XYZ Corp"]
+
+    download = client.get(f"/text-replace/download/{zip_id}")
+    assert download.status_code == 200 and download.content == r.content
+
+
+def test_failed_files_are_listed_in_the_manifest(client, upload_files):
+    r = client.post("/text-replace/process", data={"find_text": "ABC", "replace_text": "XYZ", "stream": "true"},
+                    files=upload_files(["a.docx", "bad.docx"], {"bad.docx": b"PK\x03\x04 not a document"}))
+    with zipfile.ZipFile(io.BytesIO(r.content)) as z:
+        assert "bad.docx" not in z.namelist()
+        manifest = json.loads(z.read("results.json"))
+    assert [f["original_name"] for f in manifest["results"]["failed"]] == ["bad.docx"]
+    assert manifest["summary"]["successful"] == 1
+
+
+def test_sync_zip_stores_documents(client, upload_files):
+    r = client.post("/text-replace/process", data={"find_text": "ABC", "replace_text": "Q"},
+                    files=upload_files(["a.docx", "b.xlsx"]))
+    assert r.status_code == 200
+    download = client.get(f"/text-replace/download/{r.json()['zip_id']}")
+    with zipfile.ZipFile(io.BytesIO(download.content)) as z:
+        assert {i.compress_type for i in z.infolist() if i.filename != "results.json"} == {zipfile.ZIP_STORED}
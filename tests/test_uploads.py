@@ -0,0 +1,103 @@
+import io
+import asyncio
+import hashlib
+import os
+
+import pytest
+from fastapi import UploadFile
+
+from app import uploads
+
+DATA = bytes(range(256)) * 40
+
+
+@pytest.fixture(autouse=True)
+def uploads_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOADS_DIR", str(tmp_path))
+    return tmp_path
+
+
+def _session(sha256=None):
+    return uploads.create_session("compare", "circuits.csv", len(DATA), sha256)
+
+
+def test_adjacent_chunks_merge_into_one_range():
+    session = _session()
+    uploads.write_chunk(session, 0, DATA[:1000])
+    uploads.write_chunk(session, 1000, DATA[1000:2500])
+    uploads.write_chunk(session, 4000, DATA[4000:5000])
+    assert uploads.received_ranges(session["upload_id"]) == [[0, 2500], [4000, 5000]]
+
+
+def test_resume_across_a_chunk_boundary():
+    session = _session(hashlib.sha256(DATA).hexdigest())
+    uploads.write_chunk(session, 0, DATA[:4096])
+    uploads.write_chunk(session, 8192, DATA[8192:])
+    with pytest.raises(ValueError, match="incomplete"):
+        uploads.complete_session(session)
+
+    # The client resumes with a chunk that overlaps what already arrived on both sides.
+    resumed = uploads.load_session(session["upload_id"])
+    uploads.write_chunk(resumed, 4000, DATA[4000:8200])
+    assert uploads.received_ranges(session["upload_id"]) == [[0, len(DATA)]]
+
+    staged = uploads.complete_session(resumed)
+    assert staged.sha256 == hashlib.sha256(DATA).hexdigest()
+    assert staged.head == DATA[:uploads.HEAD_SIZE]
+    with open(staged.path, "rb") as f:
+        assert f.read() == DATA
+    assert uploads.load_session(session["upload_id"])["status"] == "complete"
+
+
+def test_resent_chunk_is_harmless():
+    session = _session()
+    for _ in range(2):
+        uploads.write_chunk(session, 0, DATA)
+    assert uploads.received_ranges(session["upload_id"]) == [[0, len(DATA)]]
+    assert uploads.complete_session(session).sha256 == hashlib.sha256(DATA).hexdigest()
+
+
+def test_checksum_mismatch_is_rejected():
+    session = _session("0" * 64)
+    uploads.write_chunk(session, 0, DATA)
+    with pytest.raises(ValueError, match="Checksum"):
+        uploads.complete_session(session)
+
+
+def test_expired_sessions_are_cleaned_up(uploads_dir, monkeypatch):
+    session = _session()
+    monkeypatch.setattr(uploads, "UPLOAD_SESSION_TTL_HOURS", -1)
+    expired = _session()
+    assert uploads.load_session(expired["upload_id"]) is None
+    uploads.cleanup_sessions()
+    left = {name.split(".", 1)[0] for name in os.listdir(uploads_dir)}
+    assert left == {session["upload_id"]}
+
+
+def _upload(content):
+    return UploadFile(io.BytesIO(content), filename="circuits.csv")
+
+
+def test_save_upload_hashes_while_copying(tmp_path, monkeypatch):
+    monkeypatch.setattr(uploads, "CHUNK_SIZE", 1000)
+    monkeypatch.setattr(uploads, "HEAD_SIZE", 2500)
+    dest = str(tmp_path / "staged.csv")
+    staged = asyncio.run(uploads.save_upload(_upload(DATA), dest, len(DATA)))
+    assert staged == (dest, len(DATA), hashlib.sha256(DATA).hexdigest(), DATA[:2500])
+    with open(dest, "rb") as f:
+        assert f.read() == DATA
+
+
+def test_save_upload_stops_past_the_limit(tmp_path, monkeypatch):
+    monkeypatch.setattr(uploads, "CHUNK_SIZE", 1000)
+    dest = str(tmp_path / "staged.csv")
+    with pytest.raises(uploads.UploadTooLarge) as exc:
+        asyncio.run(uploads.save_upload(_upload(DATA), dest, 4500))
+    assert (exc.value.size, exc.value.limit) == (5000, 4500)
+    assert not os.path.exists(dest)
+
+
+def test_compare_upload_checks_the_staged_prefix(client):
+    r = client.post("/compare-upload", files={"compare_file": ("compare.xlsx", b"not a workbook", "application/vnd.ms-excel")})
+    assert r.status_code == 400
+    assert r.json()["detail"] == "Invalid file format"
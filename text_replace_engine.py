@@ -0,0 +1,315 @@
+from __future__ import annotations
+
+import io
+import os
+import asyncio
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from openpyxl import load_workbook
+from docx import Document
+from docx.oxml.ns import qn
+from docx.text.run import Run
+
+try:
+    from .config import TEXT_REPLACE_WORKERS, TEXT_REPLACE_ENGINE, TEXT_REPLACE_START_METHOD
+    from .ooxml_replace import replace_in_docx, replace_in_xlsx, scan_docx, scan_xlsx
+    from .replace_rules import compile_rules
+    from . import result_cache
+except Exception:
+    from config import TEXT_REPLACE_WORKERS, TEXT_REPLACE_ENGINE, TEXT_REPLACE_START_METHOD
+    from ooxml_replace import replace_in_docx, replace_in_xlsx, scan_docx, scan_xlsx
+    from replace_rules import compile_rules
+    import result_cache
+
+# Document rewriting is CPU-bound and lives here, free of import side effects,
+# so batches can run in a process pool without blocking the event loop.
+
+# Part of the result cache key; bump whenever either engine's output changes.
+ENGINE_VERSION = 1
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+def get_process_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=TEXT_REPLACE_WORKERS,
+                                        mp_context=multiprocessing.get_context(TEXT_REPLACE_START_METHOD))
+        return _pool
+
+def _reset_process_pool(broken: ProcessPoolExecutor) -> None:
+    """Drop a pool whose worker died, unless another caller already replaced it."""
+    global _pool
+    with _pool_lock:
+        if _pool is broken:
+            _pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+async def _run_in_pool(fn, *args):
+    """Run fn in the pool, replacing the pool if a worker has died.
+
+    A pool found broken at submit time is replaced and the call retried once.
+    A call whose own worker died (out of memory, a crash in a parser) fails
+    alone; the next call gets a fresh pool.
+    """
+    loop = asyncio.get_running_loop()
+    for attempt in range(2):
+        pool = get_process_pool()
+        try:
+            future = loop.run_in_executor(pool, fn, *args)
+        except BrokenProcessPool:
+            logging.warning("Text replace worker pool was broken, restarting it")
+            _reset_process_pool(pool)
+            if attempt:
+                raise
+            continue
+        try:
+            return await future
+        except BrokenProcessPool:
+            logging.warning("Text replace worker died, restarting the pool")
+            _reset_process_pool(pool)
+            raise
+
+def process_file(file_path: str, ext: str, rules: List[Tuple[str, str]]) -> Tuple[int, List[int], bool]:
+    """Rewrite one staged file in place.
+
+    Returns the total replacement count, the count for each rule and whether
+    the output was served from the result cache.
+    """
+    if ext not in ('docx', 'xlsx'):
+        raise ValueError(f"Unsupported extension: {ext}")
+    key = result_cache.cache_key(file_path, rules, f"{TEXT_REPLACE_ENGINE}-{ENGINE_VERSION}")
+    cached = result_cache.fetch(key, file_path)
+    if cached is not None:
+        return cached[0], cached[1], True
+    total, counts = _replace_file(file_path, ext, rules)
+    result_cache.put(key, file_path, total, counts)
+    return total, counts, False
+
+def _replace_file(file_path: str, ext: str, rules: List[Tuple[str, str]]) -> Tuple[int, List[int]]:
+    if TEXT_REPLACE_ENGINE == 'stream':
+        engine = replace_in_docx if ext == 'docx' else replace_in_xlsx
+        try:
+            total, rule_counts = _rewrite_in_place(engine, file_path, compile_rules(rules))
+            return total, [rule_counts.get(i, 0) for i in range(len(rules))]
+        except Exception as e:
+            logging.warning(f"Streaming {ext.upper()} engine failed for {os.path.basename(file_path)}, using legacy: {e}")
+
+    # The legacy engines take one pair at a time, so rules are applied in turn.
+    legacy = _replace_text_in_docx_safe if ext == 'docx' else _replace_text_in_xlsx_safe
+    counts = [legacy(Path(file_path), find_text, replace_text) for find_text, replace_text in rules]
+    return sum(counts), counts
+
+def _rewrite_in_place(engine, file_path: str, find_spans):
+    tmp_path = file_path + ".rewrite"
+    try:
+        result = engine(file_path, tmp_path, find_spans)
+        os.replace(tmp_path, file_path)
+        return result
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+async def process_file_async(file_path: Path, ext: str, rules: List[Tuple[str, str]]) -> Tuple[int, List[int], bool]:
+    return await _run_in_pool(process_file, str(file_path), ext, rules)
+
+def scan_file(content: bytes, ext: str, finds: List[str]) -> Dict[str, Any]:
+    """Count matches of each find text in an in-memory DOCX/XLSX without rewriting it."""
+    scan = scan_docx if ext == 'docx' else scan_xlsx
+    # Matched text is replaced by nothing, so every match changes its
+    # paragraph or cell and is counted exactly as a replace run would count it.
+    total, rule_counts, locations = scan(io.BytesIO(content), compile_rules([(f, "") for f in finds]))
+    return {
+        "matches": total,
+        "rule_counts": [rule_counts.get(i, 0) for i in range(len(finds))],
+        "locations": locations.items,
+        "locations_truncated": locations.truncated,
+    }
+
+async def scan_file_async(content: bytes, ext: str, finds: List[str]) -> Dict[str, Any]:
+    return await _run_in_pool(scan_file, content, ext, finds)
+
+def _replace_text_in_docx_safe(file_path: Path, find_text: str, replace_text: str) -> int:
+    """Replace text in DOCX file with cross-run replacement support and enforce TH SarabunPSK font"""
+    logging.debug(f"Processing DOCX: {file_path.name}")
+    logging.debug(f"Looking for: '{find_text}' -> '{replace_text}'")
+
+    try:
+        doc = Document(file_path)
+    except Exception as e:
+        raise ValueError(f"Cannot open DOCX file: {e}")
+
+
+
+    replacements_made = 0
+
+    def _clone_run_format(src: Run, dst: Run):
+        """Copy all formatting from src run to dst run"""
+        try:
+            dst.style = src.style
+            dst.bold = src.bold
+            dst.italic = src.italic
+            dst.underline = src.underline
+            
+            # Preserve original font
+            if src.font.name:
+                dst.font.name = src.font.name
+            
+            # Copy font properties
+            if src.font.size:
+                dst.font.size = src.font.size
+            if src.font.color and src.font.color.rgb:
+                dst.font.color.rgb = src.font.color.rgb
+            
+            dst.font.highlight_color = src.font.highlight_color
+            dst.font.all_caps = src.font.all_caps
+            dst.font.small_caps = src.font.small_caps
+            
+            # Copy font family settings
+            src_rPr = src._element.rPr
+            dst_rPr = dst._element.rPr
+            if src_rPr is not None and dst_rPr is not None:
+                src_fonts = src_rPr.rFonts
+                if src_fonts is not None:
+                    dst_rPr.rFonts.set(qn('w:ascii'), src_fonts.get(qn('w:ascii')))
+                    dst_rPr.rFonts.set(qn('w:hAnsi'), src_fonts.get(qn('w:hAnsi')))
+                    dst_rPr.rFonts.set(qn('w:eastAsia'), src_fonts.get(qn('w:eastAsia')))
+        except Exception as e:
+            logging.warning(f"Could not copy all formatting: {e}")
+
+    def _gather_paragraph_text_and_run_info(paragraph):
+        """Return concatenated paragraph text and a list of run info objects"""
+        full_text = ""
+        run_info = []
+        for r in paragraph.runs:
+            t = r.text or ""
+            full_text += t
+            run_info.append({'text': t, 'run': r})
+        return full_text, run_info
+
+    def _replace_in_paragraph_preserve_format(paragraph, needle, repl):
+        nonlocal replacements_made
+        if not paragraph.runs or not needle:
+            return 0
+        
+        full_text, run_info = _gather_paragraph_text_and_run_info(paragraph)
+        if needle not in full_text:
+            return 0
+
+        count = full_text.count(needle)
+        new_text = full_text.replace(needle, repl)
+        
+        # Get first run's formatting as template
+        template_run = paragraph.runs[0] if paragraph.runs else None
+        
+        # Clear all runs
+        for run in paragraph.runs[:]:
+            paragraph._element.remove(run._element)
+        
+        # Add new run with preserved formatting
+        new_run = paragraph.add_run(new_text)
+        if template_run:
+            _clone_run_format(template_run, new_run)
+        
+        replacements_made += count
+        return count
+
+    # Replace in body
+    for p in doc.paragraphs:
+        _replace_in_paragraph_preserve_format(p, find_text, replace_text)
+
+    # Replace in tables
+    for t in doc.tables:
+        for row in t.rows:
+            for cell in row.cells:
+                for p in cell.paragraphs:
+                    _replace_in_paragraph_preserve_format(p, find_text, replace_text)
+
+    # Replace in headers/footers
+    for section in doc.sections:
+        if section.header:
+            for p in section.header.paragraphs:
+                _replace_in_paragraph_preserve_format(p, find_text, replace_text)
+        if section.footer:
+            for p in section.footer.paragraphs:
+                _replace_in_paragraph_preserve_format(p, find_text, replace_text)
+
+    doc.save(file_path)
+    logging.debug(f"{replacements_made} total replacements made in {file_path.name}")
+    return replacements_made
+
+def _replace_text_in_xlsx_safe(file_path: Path, find_text: str, replace_text: str) -> int:
+    """Replace text in XLSX file with improved data type handling"""
+    logging.debug(f"Processing XLSX: {file_path.name}")
+    
+    try:
+        wb = load_workbook(file_path)
+    except Exception as e:
+        raise ValueError(f"Cannot open XLSX file: {e}")
+    
+    replacements_made = 0
+    
+    try:
+        for sheet_name in wb.sheetnames:
+            ws = wb[sheet_name]
+            
+            for row in ws.iter_rows():
+                for cell in row:
+                    try:
+                        if cell.value is None:
+                            continue
+                        
+                        if hasattr(cell, 'data_type') and cell.data_type == 'f':
+                            continue
+                        
+                        cell_str = str(cell.value)
+                        
+                        if find_text in cell_str:
+                            old_value = cell.value
+                            old_type = type(cell.value)
+                            
+                            new_str = cell_str.replace(find_text, replace_text)
+                            
+                            try:
+                                if isinstance(old_value, str):
+                                    cell.value = new_str
+                                elif isinstance(old_value, int):
+                                    try:
+                                        cell.value = int(new_str)
+                                    except ValueError:
+                                        try:
+                                            cell.value = float(new_str)
+                                        except ValueError:
+                                            cell.value = new_str
+                                elif isinstance(old_value, float):
+                                    try:
+                                        cell.value = float(new_str)
+                                    except ValueError:
+                                        cell.value = new_str
+                                else:
+                                    cell.value = new_str
+                                
+                                if old_value != cell.value:
+                                    replacements_made += 1
+                                    logging.debug(f"Replaced '{old_value}' -> '{cell.value}' in {sheet_name}")
+                                    
+                            except Exception as e:
+                                logging.warning(f"Error updating cell {cell.coordinate}: {e}")
+                                
+                    except Exception as e:
+                        logging.warning(f"Error processing cell: {e}")
+                        continue
+        
+        wb.save(file_path)
+        logging.debug(f"{replacements_made} total replacements made in {file_path.name}")
+        return replacements_made
+        
+    except Exception as e:
+        raise ValueError(f"Error processing XLSX: {e}")
\ No newline at end of file
@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+import os
+import re
+import asyncio
+import json
+import time
+import logging
+from typing import Any, Dict, List, Optional
+
+from .config import TEXT_REPLACE_JOBS_DIR, TEXT_REPLACE_FILE_RETENTION_DAYS, TEXT_REPLACE_JOB_STALE_SECONDS
+from .job_events import publish_event
+
+# State of background text-replace jobs. Each job is one small JSON file
+# replaced atomically on every change, so a poll served by any worker sees a
+# consistent snapshot; progress is also published on the SSE journal.
+
+# Per-file updates rewrite the whole state file and go to every SSE client,
+# which adds up for archive jobs with thousands of files; they are saved and
+# published together at most this often.
+_SAVE_INTERVAL_SECONDS = 0.5
+
+# Running jobs save at least this often, even while one large file is being
+# processed, so a job whose worker died can be told apart by its updated_at.
+_HEARTBEAT_SECONDS = 30
+
+_ACTIVE = ("queued", "processing")
+_INTERRUPTED = "Job was interrupted: its worker stopped before it finished"
+
+_JOB_ID = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$")
+
+def _job_path(job_id: str) -> Optional[str]:
+    if not _JOB_ID.match(job_id):
+        return None
+    return os.path.join(TEXT_REPLACE_JOBS_DIR, f"{job_id}.json")
+
+def _write_state(path: str, state: Dict[str, Any]) -> None:
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+def _fail_if_stale(path: str, state: Dict[str, Any]) -> Dict[str, Any]:
+    """Mark a job failed when it is still active but has not been saved for too long."""
+    if state.get("status") not in _ACTIVE or time.time() - state.get("updated_at", 0) < TEXT_REPLACE_JOB_STALE_SECONDS:
+        return state
+    for entry in state["files"]:
+        if entry["status"] in _ACTIVE:
+            entry.update(status="failed", error=_INTERRUPTED)
+    state.update(status="failed", error=_INTERRUPTED, updated_at=time.time())
+    try:
+        _write_state(path, state)
+    except OSError as e:
+        logging.warning(f"Failed to save text-replace job {state.get('job_id')}: {e}")
+    logging.warning(f"Text replace job {state.get('job_id')} marked failed: no update for {TEXT_REPLACE_JOB_STALE_SECONDS}s")
+    publish_event("text-replace-job", {
+        "job_id": state.get("job_id"),
+        "status": "failed",
+        "zip_id": None,
+        "summary": None,
+        "error": _INTERRUPTED,
+    })
+    return state
+
+def load_job(job_id: str) -> Optional[Dict[str, Any]]:
+    path = _job_path(job_id)
+    if path is None:
+        return None
+    try:
+        with open(path, encoding="utf-8") as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return None
+    return _fail_if_stale(path, state)
+
+def fail_stale_jobs() -> int:
+    """Mark failed every active job whose worker stopped saving it; run on startup."""
+    failed = 0
+    try:
+        entries = list(os.scandir(TEXT_REPLACE_JOBS_DIR))
+    except FileNotFoundError:
+        return 0
+    for entry in entries:
+        if not entry.name.endswith(".json"):
+            continue
+        try:
+            with open(entry.path, encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if state.get("status") in _ACTIVE:
+            failed += _fail_if_stale(entry.path, state)["status"] == "failed"
+    return failed
+
+def cleanup_jobs() -> int:
+    """Remove job state files past the file retention period."""
+    cutoff = time.time() - TEXT_REPLACE_FILE_RETENTION_DAYS * 86400
+    removed = 0
+    try:
+        entries = list(os.scandir(TEXT_REPLACE_JOBS_DIR))
+    except FileNotFoundError:
+        return 0
+    for entry in entries:
+        try:
+            if entry.name.endswith(".json") and entry.stat().st_mtime < cutoff:
+                os.unlink(entry.path)
+                removed += 1
+        except OSError:
+            pass
+    return removed
+
+class TextReplaceJob:
+    """Tracks one job; file statuses go queued -> processing -> done/failed."""
+
+    def __init__(self, job_id: str, file_results: List[Dict[str, Any]], rules: List[Dict[str, str]]):
+        self.job_id = job_id
+        self.state: Dict[str, Any] = {
+            "job_id": job_id,
+            "status": "queued",
+            "created_at": time.time(),
+            "updated_at": time.time(),
+            "rules": rules,
+            "total_files": len(file_results),
+            "files": [
+                {
+                    "index": fr["index"],
+                    "original_name": fr["original_name"],
+                    "status": "failed" if fr["error"] else "queued",
+                    "replacements": None,
+                    "rule_counts": None,
+                    "cache_hit": None,
+                    "error": fr["error"],
+                }
+                for fr in file_results
+            ],
+            "zip_id": None,
+            "summary": None,
+            "error": None,
+        }
+        self._pending: Dict[int, Dict[str, Any]] = {}
+        os.makedirs(TEXT_REPLACE_JOBS_DIR, exist_ok=True)
+        self._save()
+
+    def _save(self) -> None:
+        self.state["updated_at"] = self._saved_at = time.time()
+        try:
+            _write_state(_job_path(self.job_id), self.state)
+        except OSError as e:
+            logging.warning(f"Failed to save text-replace job {self.job_id}: {e}")
+
+    def _counts(self) -> Dict[str, int]:
+        counts = {"queued": 0, "processing": 0, "done": 0, "failed": 0}
+        for f in self.state["files"]:
+            counts[f["status"]] += 1
+        return counts
+
+    def start(self) -> None:
+        self.state["status"] = "processing"
+        self._save()
+        publish_event("text-replace-job", {"job_id": self.job_id, "status": "processing", "counts": self._counts()})
+
+    async def run(self, coro) -> None:
+        """Await the job's body, saving the state every heartbeat meanwhile"""
+        async def beat():
+            while True:
+                await asyncio.sleep(_HEARTBEAT_SECONDS)
+                self._save()
+
+        heartbeat = asyncio.create_task(beat())
+        try:
+            await coro
+        finally:
+            heartbeat.cancel()
+
+    def _flush(self) -> None:
+        self._save()
+        if self._pending:
+            publish_event("text-replace-progress", {
+                "job_id": self.job_id,
+                "files": [self._pending[i] for i in sorted(self._pending)],
+                "counts": self._counts(),
+            })
+            self._pending.clear()
+
+    def update_file(self, index: int, **fields: Any) -> None:
+        """Change one file's entry; the changes since the last flush go out as one event"""
+        entry = self.state["files"][index]
+        entry.update(fields)
+        self._pending[index] = entry
+        if time.time() - self._saved_at >= _SAVE_INTERVAL_SECONDS:
+            self._flush()
+
+    def finish(self, zip_id: Optional[str], summary: Optional[Dict[str, Any]], error: Optional[str] = None) -> None:
+        self.state.update({
+            "status": "failed" if error else "done",
+            "zip_id": zip_id,
+            "summary": summary,
+            "error": error,
+        })
+        self._flush()
+        publish_event("text-replace-job", {
+            "job_id": self.job_id,
+            "status": self.state["status"],
+            "zip_id": zip_id,
+            "summary": summary,
+            "error": error,
+            "counts": self._counts(),
+        })
@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+import io
+import os
+import re
+import json
+import time
+import uuid
+import shutil
+import hashlib
+from tempfile import NamedTemporaryFile
+from typing import Any, Dict, List, NamedTuple, Optional
+
+import pandas as pd
+from fastapi import UploadFile
+
+from .config import UPLOADS_DIR, UPLOAD_SESSION_TTL_HOURS
+from .compare_csv import sniff_encoding
+
+# Uploads are copied to disk a chunk at a time, hashing on the way, so a
+# request holds one chunk in memory whatever the file size. Format checks
+# look only at the first HEAD_SIZE bytes kept from the copy.
+
+CHUNK_SIZE = 1024 * 1024
+HEAD_SIZE = 64 * 1024
+
+XLSX_MAGIC = b'PK\x03\x04'
+XLS_MAGIC = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+
+class UploadTooLarge(ValueError):
+    def __init__(self, size: int, limit: int):
+        super().__init__(f"File exceeds size limit: {size} bytes")
+        self.size = size
+        self.limit = limit
+
+class StagedUpload(NamedTuple):
+    path: str
+    size: int
+    sha256: str
+    head: bytes
+
+async def save_upload(upload: UploadFile, dest: str, max_bytes: int) -> StagedUpload:
+    """Copy an upload to dest; raises UploadTooLarge (and removes dest) past max_bytes."""
+    h = hashlib.sha256()
+    head = b""
+    size = 0
+    try:
+        with open(dest, "wb") as f:
+            while True:
+                chunk = await upload.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(size, max_bytes)
+                if len(head) < HEAD_SIZE:
+                    head += chunk[:HEAD_SIZE - len(head)]
+                h.update(chunk)
+                f.write(chunk)
+    except BaseException:
+        if os.path.exists(dest):
+            os.unlink(dest)
+        raise
+    return StagedUpload(dest, size, h.hexdigest(), head)
+
+async def save_upload_temp(upload: UploadFile, max_bytes: int, suffix: str = "", prefix: str = "upload_",
+                           dir: Optional[str] = None) -> StagedUpload:
+    """save_upload into a new NamedTemporaryFile that the caller deletes."""
+    with NamedTemporaryFile(delete=False, suffix=suffix, prefix=prefix, dir=dir) as tf:
+        path = tf.name
+    return await save_upload(upload, path, max_bytes)
+
+def is_spreadsheet(head: bytes) -> bool:
+    return head.startswith(XLSX_MAGIC) or head.startswith(XLS_MAGIC)
+
+def looks_like_csv(head: bytes) -> bool:
+    """Whether pandas can parse a header and first row from the file prefix."""
+    # Cut at the last complete line so a truncated row or character is not judged.
+    end = head.rfind(b"\n")
+    sample = head[:end + 1] if end > 0 else head
+    try:
+        pd.read_csv(io.BytesIO(sample), nrows=1, encoding=sniff_encoding(sample))
+        return True
+    except (pd.errors.EmptyDataError, pd.errors.ParserError, UnicodeDecodeError, ValueError):
+        return False
+
+# Resumable upload sessions. A session is <id>.json (metadata, replaced
+# atomically), <id>.part<ext> (the file, preallocated to its final size and
+# written in place with pwrite) and <id>.ranges/, holding one empty marker
+# per stored chunk named "<start>-<end>". Chunks from different workers never
+# touch a shared record, so they need no lock.
+
+SESSION_MAX_BYTES = 50 * 1024 * 1024
+CHUNK_MAX_BYTES = 16 * 1024 * 1024
+SESSION_KINDS = ("compare", "master")
+
+_UPLOAD_ID = re.compile(r"^[0-9a-f]{32}$")
+_RANGE_NAME = re.compile(r"^(\d+)-(\d+)$")
+
+def _session_file(upload_id: str, suffix: str) -> Optional[str]:
+    if not _UPLOAD_ID.match(upload_id):
+        return None
+    return os.path.join(UPLOADS_DIR, upload_id + suffix)
+
+def _save_session(session: Dict[str, Any]) -> None:
+    path = _session_file(session["upload_id"], ".json")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(session, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+def create_session(kind: str, filename: str, size: int, sha256: Optional[str] = None) -> Dict[str, Any]:
+    """Start an upload of size bytes; the data file is allocated up front."""
+    os.makedirs(UPLOADS_DIR, exist_ok=True)
+    upload_id = uuid.uuid4().hex
+    now = time.time()
+    session = {
+        "upload_id": upload_id,
+        "kind": kind,
+        "filename": filename,
+        "size": size,
+        "sha256": sha256.lower() if sha256 else None,
+        "status": "open",
+        "created_at": now,
+        "expires_at": now + UPLOAD_SESSION_TTL_HOURS * 3600,
+    }
+    with open(upload_path(session), "wb") as f:
+        if hasattr(os, "posix_fallocate") and size:
+            os.posix_fallocate(f.fileno(), 0, size)
+        else:
+            f.truncate(size)
+    os.makedirs(_session_file(upload_id, ".ranges"))
+    _save_session(session)
+    return session
+
+def load_session(upload_id: str) -> Optional[Dict[str, Any]]:
+    path = _session_file(upload_id, ".json")
+    if path is None:
+        return None
+    try:
+        with open(path, encoding="utf-8") as f:
+            session = json.load(f)
+    except FileNotFoundError:
+        return None
+    if session["expires_at"] < time.time():
+        return None
+    return session
+
+def upload_path(session: Dict[str, Any]) -> str:
+    # The readers dispatch on the extension, so the data file keeps the original one.
+    return _session_file(session["upload_id"], ".part" + os.path.splitext(session["filename"])[1].lower())
+
+def received_ranges(upload_id: str) -> List[List[int]]:
+    """Stored byte ranges as merged, sorted [start, end) pairs."""
+    spans = []
+    try:
+        names = os.listdir(_session_file(upload_id, ".ranges"))
+    except FileNotFoundError:
+        return []
+    for name in names:
+        m = _RANGE_NAME.match(name)
+        if m:
+            spans.append((int(m.group(1)), int(m.group(2))))
+    merged: List[List[int]] = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+def write_chunk(session: Dict[str, Any], offset: int, data: bytes) -> None:
+    """Store data at offset; the range counts as received only once it is on disk."""
+    upload_id = session["upload_id"]
+    fd = os.open(upload_path(session), os.O_WRONLY)
+    try:
+        view = memoryview(data)
+        written = 0
+        while written < len(view):
+            written += os.pwrite(fd, view[written:], offset + written)
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    marker = os.path.join(_session_file(upload_id, ".ranges"), f"{offset}-{offset + len(data)}")
+    open(marker, "wb").close()
+
+def complete_session(session: Dict[str, Any]) -> StagedUpload:
+    """Check that every byte arrived and matches the declared hash; marks the session complete."""
+    if received_ranges(session["upload_id"]) != ([[0, session["size"]]] if session["size"] else []):
+        raise ValueError("Upload is incomplete")
+    path = upload_path(session)
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        head = f.read(HEAD_SIZE)
+        h.update(head)
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            h.update(chunk)
+    digest = h.hexdigest()
+    if session["sha256"] and session["sha256"] != digest:
+        raise ValueError("Checksum mismatch for the assembled file")
+    if session["status"] != "complete":
+        session.update(status="complete", sha256=digest)
+        _save_session(session)
+    return StagedUpload(path, session["size"], digest, head)
+
+def delete_session(upload_id: str) -> None:
+    path = _session_file(upload_id, "")
+    for name in os.listdir(UPLOADS_DIR):
+        if name.startswith(upload_id + ".") and not name.endswith(".ranges"):
+            try:
+                os.unlink(os.path.join(UPLOADS_DIR, name))
+            except FileNotFoundError:
+                pass
+    shutil.rmtree(path + ".ranges", ignore_errors=True)
+
+def cleanup_sessions() -> int:
+    """Delete sessions past their expiry, and files whose metadata is gone."""
+    now = time.time()
+    try:
+        entries = list(os.scandir(UPLOADS_DIR))
+    except FileNotFoundError:
+        return 0
+    expired = set()
+    with_metadata = {e.name[:-5] for e in entries if e.name.endswith(".json")}
+    for entry in entries:
+        upload_id = entry.name.split(".", 1)[0]
+        if not _UPLOAD_ID.match(upload_id) or upload_id in expired:
+            continue
+        try:
+            if entry.name.endswith(".json"):
+                with open(entry.path, encoding="utf-8") as f:
+                    if json.load(f)["expires_at"] < now:
+                        expired.add(upload_id)
+            elif upload_id not in with_metadata and entry.stat().st_mtime < now - 86400:
+                # Orphans of a crash between writes are left a day for safety.
+                expired.add(upload_id)
+        except (OSError, ValueError, KeyError):
+            continue
+    for upload_id in expired:
+        delete_session(upload_id)
+    return len(expired)